@@ -26,4 +26,18 @@
 # pylint: disable=W0611
 
 from ots.common.amqp.codec import pack_message, unpack_message
+from ots.common.amqp.codec import pack_batch, unpack_messages
+from ots.common.amqp.codec import header_dto
+from ots.common.amqp.codec import PICKLE_CONTENT_TYPE, DTO_CONTENT_TYPE
+from ots.common.amqp.codec import BATCH_CONTENT_TYPE
+from ots.common.amqp.codec import COMPRESSION_THRESHOLD, CONTENT_ENCODINGS
+from ots.common.amqp.codec import compression_threshold_for
+from ots.common.amqp.codec import CONTENT_TYPES, content_type_for
+from ots.common.amqp.codec import accepts_batches
+from ots.common.amqp.codec import TRANSIENT, PERSISTENT
+from ots.common.amqp.codec import set_delivery_mode, delivery_mode
+from ots.common.amqp.dto_codec import CodecError
 from ots.common.amqp.testrun_queue_name import testrun_queue_name
+from ots.common.amqp.testrun_queue_name import task_control_queue_name
+from ots.common.amqp.connection_pool import ConnectionPool, ConnectionPoolError
+from ots.common.amqp.connection_pool import CONNECTION_POOL
@@ -0,0 +1,102 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Compares the encode / decode times and the message sizes
+of the pickle and the DTO encodings
+
+usage: python benchmark_codec.py [-n ROUNDS]
+"""
+
+import time
+import logging
+from optparse import OptionParser
+
+from ots.common.dto.api import CommandMessage, StateChangeMessage
+from ots.common.dto.api import TaskCondition, Monitor, MonitorType
+from ots.common.dto.api import Results, Packages, OTSException
+from ots.common.amqp.codec import pack_message, unpack_message
+from ots.common.amqp.codec import PICKLE_CONTENT_TYPE, DTO_CONTENT_TYPE
+
+def _sample_dtos():
+    """
+    @rtype: C{list} of C{tuple} of C{str} and L{ots.common.dto}
+    @return: Named samples of the DTOs sent in a testrun
+    """
+    result_xml = "<case name='test_%s' result='PASS'/>\n" * 200
+    record = logging.LogRecord("ots.worker", logging.INFO, __file__, 1,
+                               "Running command: '%s'", ("conductor",), None)
+    return [("CommandMessage", CommandMessage(["conductor", "-u", "url"], 
+                                              "r1", "1234" * 8)),
+            ("StateChangeMessage", StateChangeMessage("1234" * 8, 
+                                                      TaskCondition.START)),
+            ("Monitor", Monitor(MonitorType.TEST_PACKAGE_STARTED,
+                                "worker1", "foo-tests")),
+            ("Results", Results("tatam_xml_testrunner_results_for_foo.xml", 
+                                result_xml, "foo-tests", "worker1", 
+                                "hardware")),
+            ("Packages", Packages("hardware", ["pkg%s-tests" % i 
+                                               for i in range(20)])),
+            ("OTSException", OTSException(100, "Flashing failed")),
+            ("LogRecord", record)]
+
+def _time(func, rounds):
+    """
+    @rtype: C{float}
+    @return: The mean time in microseconds of a call to func
+    """
+    start = time.time()
+    for i in xrange(rounds):
+        func()
+    return (time.time() - start) / rounds * 1e6
+
+def benchmark(rounds):
+    """
+    Print the comparison table
+
+    @type rounds: C{int}
+    @param rounds: The number of rounds per measurement
+    """
+    print "%-20s %-8s %10s %10s %10s" % ("DTO", "codec", "bytes", 
+                                         "pack us", "unpack us")
+    for name, dto in _sample_dtos():
+        for codec, content_type in [("pickle", PICKLE_CONTENT_TYPE),
+                                    ("dto", DTO_CONTENT_TYPE)]:
+            message = pack_message(dto, content_type)
+            pack_time = _time(lambda: pack_message(dto, content_type), rounds)
+            unpack_time = _time(lambda: unpack_message(message), rounds)
+            print "%-20s %-8s %10d %10.1f %10.1f" % (name, codec,
+                                                     len(message.body),
+                                                     pack_time, unpack_time)
+
+def main():
+    """Entry point"""
+    parser = OptionParser()
+    parser.add_option("-n", "--rounds",
+                      default = 10000,
+                      type = int,
+                      help = "the number of rounds per measurement")
+    options = parser.parse_args()[0]
+    benchmark(options.rounds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Size / CPU trade-off of compressing the Results payloads 
+at the different zlib levels
+
+usage: python benchmark_compression.py [-n ROUNDS]
+"""
+
+import os
+import time
+import zlib
+from optparse import OptionParser
+
+from ots.common.dto.api import Results
+from ots.common.amqp import codec
+from ots.common.amqp.codec import pack_message, unpack_message
+
+def _result_xml(cases):
+    """A testrunner-lite style result XML"""
+    lines = ["<?xml version='1.0' encoding='UTF-8'?>",
+             "<testresults version='1.0'>",
+             "<suite name='foo-tests'><set name='bar'>"]
+    for i in range(cases):
+        lines.append("<case name='test_%d' result='PASS' "
+                     "description='Checks feature %d'>" % (i, i))
+        lines.append("<step command='/usr/bin/foo-test %d' result='PASS'>"
+                     "<expected_result>0</expected_result>"
+                     "<return_code>0</return_code>"
+                     "<stdout>OK</stdout></step></case>" % (i))
+    lines.append("</set></suite></testresults>")
+    return "\n".join(lines)
+
+def _environment(lines):
+    """An environment details file"""
+    return "\n".join(["==== rpm -qa ====",] + 
+                     ["package-%d-1.0.%d-1.armv7l" % (i, i % 7) 
+                      for i in range(lines)])
+
+def _samples():
+    """
+    @rtype: C{list} of C{tuple} of C{str} and L{Results}
+    @return: Named sample payloads
+    """
+    return [("result xml 10 cases", Results("result.xml", _result_xml(10))),
+            ("result xml 1000 cases", Results("result.xml", 
+                                              _result_xml(1000))),
+            ("environment", Results("environment.txt", _environment(2000))),
+            ("random data", Results("core", os.urandom(65536)))]
+
+def _time(func, rounds):
+    """
+    @rtype: C{float}
+    @return: The mean time in milliseconds of a call to func
+    """
+    start = time.time()
+    for i in xrange(rounds):
+        func()
+    return (time.time() - start) / rounds * 1e3
+
+def benchmark(rounds):
+    """
+    Print the comparison table
+
+    @type rounds: C{int}
+    @param rounds: The number of rounds per measurement
+    """
+    print "%-22s %-6s %10s %10s %10s %10s" % ("payload", "level", "bytes", 
+                                              "ratio", "pack ms", "unpack ms")
+    default_level = codec.COMPRESSION_LEVEL
+    try:
+        for name, results in _samples():
+            raw_size = len(pack_message(results).body)
+            for level in [None, 1, 6, 9]:
+                threshold = None
+                if level is not None:
+                    threshold = 0
+                    codec.COMPRESSION_LEVEL = level
+                pack = lambda: pack_message(results, 
+                                            compression_threshold = threshold)
+                message = pack()
+                pack_time = _time(pack, rounds)
+                unpack_time = _time(lambda: unpack_message(message), rounds)
+                print "%-22s %-6s %10d %10.2f %10.3f %10.3f" % \
+                    (name, level or "-", len(message.body), 
+                     float(len(message.body)) / raw_size,
+                     pack_time, unpack_time)
+    finally:
+        codec.COMPRESSION_LEVEL = default_level
+
+def main():
+    """Entry point"""
+    parser = OptionParser()
+    parser.add_option("-n", "--rounds",
+                      default = 200,
+                      type = int,
+                      help = "the number of rounds per measurement")
+    options = parser.parse_args()[0]
+    benchmark(options.rounds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Broker throughput of persistent versus transient messages.
+
+Publishes Monitor events to a durable queue with both delivery modes
+and reports the rate at which the broker accepts them. 
+Needs a running broker.
+
+usage: python benchmark_delivery_mode.py [-s HOST] [-n MESSAGES]
+"""
+
+import time
+from optparse import OptionParser
+
+from amqplib import client_0_8 as amqp
+
+from ots.common.dto.api import Monitor, MonitorType
+from ots.common.amqp.codec import pack_message, TRANSIENT, PERSISTENT
+
+QUEUE = "ots_benchmark_delivery_mode"
+
+def _publish(channel, messages, mode):
+    """
+    Publish the messages and wait until the broker has queued them all
+
+    @rtype: C{float}
+    @return: The messages per second
+    """
+    channel.queue_purge(queue = QUEUE)
+    message = pack_message(Monitor(MonitorType.TASK_ONGOING, 
+                                   description = "benchmark"))
+    message.properties["delivery_mode"] = mode
+    start = time.time()
+    for i in xrange(messages):
+        channel.basic_publish(message, exchange = "", routing_key = QUEUE)
+    #The passive declare is synchronous so it returns only 
+    #once the broker has handled the publishes before it
+    while channel.queue_declare(queue = QUEUE, passive = True)[1] \
+            < messages:
+        time.sleep(0.01)
+    return messages / (time.time() - start)
+
+def benchmark(host, messages):
+    """
+    Print the comparison table
+
+    @type host: C{str}
+    @param host: The broker host
+
+    @type messages: C{int}
+    @param messages: The number of messages per measurement
+    """
+    connection = amqp.Connection(host = host,
+                                 userid = "guest",
+                                 password = "guest",
+                                 virtual_host = "/",
+                                 insist = False)
+    channel = connection.channel()
+    channel.queue_declare(queue = QUEUE, 
+                          durable = True, 
+                          exclusive = False,
+                          auto_delete = False)
+    try:
+        print "%-12s %12s" % ("mode", "msgs / s")
+        for name, mode in [("persistent", PERSISTENT), 
+                           ("transient", TRANSIENT)]:
+            print "%-12s %12.0f" % (name, _publish(channel, messages, mode))
+    finally:
+        channel.queue_delete(queue = QUEUE)
+        channel.close()
+        connection.close()
+
+def main():
+    """Entry point"""
+    parser = OptionParser()
+    parser.add_option("-s", "--server",
+                      default = "localhost",
+                      help = "the AMQP broker host")
+    parser.add_option("-n", "--messages",
+                      default = 20000,
+                      type = int,
+                      help = "the number of messages per measurement")
+    options = parser.parse_args()[0]
+    benchmark(options.server, options.messages)
+
+if __name__ == "__main__":
+    main()
@@ -23,42 +23,390 @@
 
 """
 The Methods for packing and unpacking the amqp messages
+
+The encoding of the body is named by the `content_type` 
+AMQP property. Messages without a `content_type` are pickled,
+that keeps peers that predate the property working.
+A receiver advertises the `CONTENT_TYPES` it decodes,
+`content_type_for` picks the encoding for it.
+
+Large bodies can be compressed by the sender. 
+Compression is flagged with the `content_encoding` property 
+and undone transparently by `unpack_message`. Older receivers 
+don't undo it, so a receiver advertises the `CONTENT_ENCODINGS` 
+it accepts and the sender compresses only if deflate is among them.
+
+Several packed messages can be sent in a single batch message.
+`unpack_messages` returns the DTOs of a batch in order.
+Older receivers can't unpack batches, so a sender batches only if 
+the receiver advertises the batch content type, see `accepts_batches`.
+
+The AMQP `delivery_mode` is chosen per DTO type from `DELIVERY_POLICY`.
+Commands and results are persistent, high rate telemetry and log 
+records, which are worthless after a broker restart, are transient.
+
+The DTO type and the body size travel in the AMQP `application_headers`.
+Small DTOs whose fields are all strings, state changes and monitor 
+events, are also put in the headers whole so that the receiver can 
+dispatch them with `header_dto` without decoding the body.
 """
 
+import zlib
+import logging
 from pickle import dumps, loads
 
 from amqplib import client_0_8 as amqp
 
-DELIVERY_MODE = 2
+from ots.common.amqp import dto_codec
+from ots.common.amqp.dto_codec import CodecError
+from ots.common.dto.api import Monitor, StateChangeMessage
+
+TRANSIENT = 1
+PERSISTENT = 2
+
+#The delivery mode of the types not in the DELIVERY_POLICY
+DELIVERY_MODE = PERSISTENT
+
+#DTO type -> delivery mode. Subclasses inherit the mode of the base class
+DELIVERY_POLICY = {Monitor : TRANSIENT,
+                   logging.LogRecord : TRANSIENT}
+
+PICKLE_CONTENT_TYPE = "application/x-python-pickle"
+DTO_CONTENT_TYPE = "application/x-ots-dto"
+BATCH_CONTENT_TYPE = "application/x-ots-batch"
+
+#The encoding used unless the sender asks for something else.
+#Pickle is understood by all the peers
+DEFAULT_CONTENT_TYPE = PICKLE_CONTENT_TYPE
+
+#The content types `unpack_messages` decodes
+CONTENT_TYPES = [PICKLE_CONTENT_TYPE, DTO_CONTENT_TYPE, BATCH_CONTENT_TYPE]
+
+DEFLATE_CONTENT_ENCODING = "deflate"
+
+#The content encodings `unpack_message` undoes
+CONTENT_ENCODINGS = [DEFLATE_CONTENT_ENCODING]
+
+#Bodies smaller than this (bytes) are not worth compressing
+COMPRESSION_THRESHOLD = 4096
+COMPRESSION_LEVEL = 6
+
+#Header names
+TYPE_HEADER = "ots_type"
+SIZE_HEADER = "ots_size"
+#Set when the whole DTO is in the headers
+DTO_HEADER = "ots_dto"
+
+#########################
+# HEADERS
+#########################
+
+def _state_change_message_headers(state_msg):
+    """Header fields of a StateChangeMessage"""
+    return {"task_id" : state_msg.task_id,
+            "condition" : state_msg.condition}
+
+def _state_change_message(headers):
+    """Rebuild a StateChangeMessage"""
+    return StateChangeMessage(headers["task_id"], headers["condition"])
+
+def _monitor_headers(monitor):
+    """Header fields of a Monitor"""
+    headers = {"event_type" : monitor.type,
+               "emitted" : repr(monitor.emitted)}
+    if monitor.sender is not None:
+        headers["sender"] = monitor.sender
+    if monitor.description is not None:
+        headers["description"] = monitor.description
+    return headers
+
+def _monitor(headers):
+    """Rebuild a Monitor"""
+    monitor = Monitor(headers["event_type"], 
+                      headers.get("sender"), 
+                      headers.get("description"))
+    #Preserve the timestamp of the sender
+    monitor._event_emitted = float(headers["emitted"])
+    return monitor
+
+#DTO type -> (header fields getter, constructor from the headers)
+HEADER_DTOS = {StateChangeMessage : (_state_change_message_headers,
+                                     _state_change_message),
+               Monitor : (_monitor_headers, _monitor)}
+
+def _is_ascii(value):
+    """
+    @rtype: C{bool}
+    @return: Whether the value is a C{str} of ASCII characters
+    """
+    if type(value) is not str:
+        return False
+    try:
+        value.decode("ascii")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def _headers(message, size):
+    """
+    @type message: C{ots.common.message_io.Message} 
+    @param message: The DTO
+
+    @type size: C{int}
+    @param size: The size of the encoded body before compression
+
+    @rtype: C{dict}
+    @return: The AMQP application headers for the DTO 
+    """
+    dto_type = type(message)
+    headers = {TYPE_HEADER : dto_type.__name__,
+               SIZE_HEADER : size}
+    if dto_type in HEADER_DTOS:
+        fields = HEADER_DTOS[dto_type][0](message)
+        #Only ASCII strings survive the AMQP table as they are
+        if not [value for value in fields.values() 
+                if not _is_ascii(value)]:
+            headers.update(fields)
+            headers[DTO_HEADER] = 1
+    return headers
+
+def header_dto(message):
+    """
+    Rebuild the DTO from the headers of the message if it is there 
+
+    @type message: amqplib.client_0_8.basic_message.Message
+    @param message: A message in AMQP message format
+
+    @rtype: C{ots.common.message_io.Message} or None
+    @return: The DTO or None if the body has to be unpacked
+    """
+    headers = getattr(message, "properties", {}).get("application_headers")
+    if not headers or not headers.get(DTO_HEADER):
+        return None
+    #The AMQP table gives back unicode
+    fields = {}
+    for key, value in headers.items():
+        if isinstance(value, unicode):
+            value = value.encode("ascii")
+        fields[str(key)] = value
+    for dto_type in HEADER_DTOS:
+        if dto_type.__name__ == fields.get(TYPE_HEADER):
+            return HEADER_DTOS[dto_type][1](fields)
+    return None
 
 #########################
 # PACK / UNPACK
 #########################
 
+def _decoded_body(message):
+    """
+    @type message: amqplib.client_0_8.basic_message.Message
+    @param message: A message in AMQP message format
+
+    @rtype: C{str}
+    @return: The body with the content encoding undone
+    """
+    properties = getattr(message, "properties", {})
+    content_encoding = properties.get("content_encoding")
+    data = message.body
+    if content_encoding == DEFLATE_CONTENT_ENCODING:
+        try:
+            data = zlib.decompress(data)
+        except zlib.error, error:
+            raise CodecError("Decompression failed: %s" % (error))
+    elif content_encoding is not None:
+        raise CodecError("Unknown content encoding '%s'" % (content_encoding))
+    return data
+
 def unpack_message(message):
     """
-    Unpack the message with Pickle
+    Unpack the message according to its content type
 
     @type message: amqplib.client_0_8.basic_message.Message
-    @param message: A pickled message in AMQP message format
+    @param message: A message in AMQP message format
 
     @rtype: C{ots.common.message_io.Message} 
     @return: The Message 
     """
-    body = loads(message.body)
+    properties = getattr(message, "properties", {})
+    content_type = properties.get("content_type", PICKLE_CONTENT_TYPE)
+    data = _decoded_body(message)
+    if content_type == DTO_CONTENT_TYPE:
+        body = dto_codec.decode(data)
+    elif content_type == PICKLE_CONTENT_TYPE:
+        body = loads(data)
+    else:
+        raise CodecError("Unknown content type '%s'" % (content_type))
     return body
 
-def pack_message(message):
+def unpack_messages(message):
     """
-    Packs the message for sending as AMQP with Pickle
+    Unpack all the DTOs in the message 
 
+    @type message: amqplib.client_0_8.basic_message.Message
+    @param message: A message in AMQP message format
+
+    @rtype: C{list} of C{ots.common.message_io.Message} 
+    @return: The Messages. A single one unless the message is a batch
+    """
+    properties = getattr(message, "properties", {})
+    if properties.get("content_type") != BATCH_CONTENT_TYPE:
+        return [unpack_message(message)]
+    messages = []
+    for content_type, content_encoding, body in \
+            dto_codec.decode_value(_decoded_body(message)):
+        inner_message = amqp.Message(body, content_type = content_type)
+        if content_encoding is not None:
+            inner_message.properties["content_encoding"] = content_encoding
+        messages.append(unpack_message(inner_message))
+    return messages
+
+def set_delivery_mode(dto_type, mode):
+    """
+    Set the delivery mode used for the DTO type
+
+    @type dto_type: C{type}
+    @param dto_type: The DTO class
+
+    @type mode: C{int}
+    @param mode: TRANSIENT or PERSISTENT 
+    """
+    if mode not in [TRANSIENT, PERSISTENT]:
+        raise ValueError("Invalid delivery mode '%s'" % (mode))
+    DELIVERY_POLICY[dto_type] = mode
+
+def delivery_mode(message):
+    """
     @type message: C{ots.common.message_io.Message} 
-    @param message: The AMQP message 
+    @param message: The DTO
+
+    @rtype: C{int}
+    @return: The delivery mode for the DTO 
+    """
+    for dto_type in getattr(type(message), "__mro__", [type(message)]):
+        if dto_type in DELIVERY_POLICY:
+            return DELIVERY_POLICY[dto_type]
+    return DELIVERY_MODE
 
+def _amqp_message(body, content_type, compression_threshold, 
+                  mode = DELIVERY_MODE, headers = None):
+    """
     @rtype: C{amqplib.client_0_8.basic_message.Message}
-    @return: A pickled message in AMQP message format
+    @return: The body in AMQP message format, compressed if over threshold
     """
-    message = dumps(message, True)
-    amqp_message = amqp.Message(message)
-    amqp_message.properties['delivery_mode'] = DELIVERY_MODE
+    properties = {"content_type" : content_type}
+    if headers:
+        properties["application_headers"] = headers
+    if compression_threshold is not None \
+            and len(body) >= compression_threshold:
+        compressed = zlib.compress(body, COMPRESSION_LEVEL)
+        #Incompressible data goes as is
+        if len(compressed) < len(body):
+            body = compressed
+            properties["content_encoding"] = DEFLATE_CONTENT_ENCODING
+    amqp_message = amqp.Message(body, **properties)
+    amqp_message.properties['delivery_mode'] = mode
     return amqp_message
+
+def content_type_for(content_types):
+    """
+    The content type to send to a receiver
+
+    @type content_types: C{list} of C{str} or None
+    @param content_types: The content types the receiver decodes 
+
+    @rtype: C{str}
+    @return: DTO_CONTENT_TYPE if the receiver decodes it, 
+             otherwise DEFAULT_CONTENT_TYPE
+    """
+    if content_types and DTO_CONTENT_TYPE in content_types:
+        return DTO_CONTENT_TYPE
+    return DEFAULT_CONTENT_TYPE
+
+def accepts_batches(content_types):
+    """
+    Can the receiver unpack batch messages
+
+    @type content_types: C{list} of C{str} or None
+    @param content_types: The content types the receiver decodes 
+
+    @rtype: C{bool}
+    @return: True if BATCH_CONTENT_TYPE is among the content types
+    """
+    return bool(content_types) and BATCH_CONTENT_TYPE in content_types
+
+def compression_threshold_for(content_encodings):
+    """
+    The compression threshold for a receiver
+
+    @type content_encodings: C{list} of C{str} or None
+    @param content_encodings: The content encodings the receiver accepts 
+
+    @rtype: C{int} or None
+    @return: The compression threshold, None if the receiver 
+             doesn't accept compressed bodies
+    """
+    if content_encodings and DEFLATE_CONTENT_ENCODING in content_encodings:
+        return COMPRESSION_THRESHOLD
+    return None
+
+def pack_message(message, content_type = None, compression_threshold = None):
+    """
+    Packs the message for sending as AMQP 
+
+    DTOs without a schema are always pickled.
+    Compression is only used if the receiver is known to support it
+    so it is off unless a threshold is given.
+
+    @type message: C{ots.common.message_io.Message} 
+    @param message: The AMQP message 
+
+    @type content_type: C{str}
+    @param content_type: The requested encoding, 
+                         defaults to DEFAULT_CONTENT_TYPE
+
+    @type compression_threshold: C{int} or None
+    @param compression_threshold: Compress bodies of at least this 
+                                  many bytes. None disables compression 
+
+    @rtype: C{amqplib.client_0_8.basic_message.Message}
+    @return: The message in AMQP message format
+    """
+    if content_type is None:
+        content_type = DEFAULT_CONTENT_TYPE
+    if content_type == DTO_CONTENT_TYPE and dto_codec.is_encodable(message):
+        body = dto_codec.encode(message)
+    elif content_type in [DTO_CONTENT_TYPE, PICKLE_CONTENT_TYPE]:
+        content_type = PICKLE_CONTENT_TYPE
+        body = dumps(message, True)
+    else:
+        raise CodecError("Unknown content type '%s'" % (content_type))
+    return _amqp_message(body, content_type, compression_threshold,
+                         delivery_mode(message), 
+                         _headers(message, len(body)))
+
+def pack_batch(messages, compression_threshold = None):
+    """
+    Packs already packed messages into a single batch message 
+
+    The batch is persistent if any of the messages is
+
+    @type messages: C{list} of C{amqplib.client_0_8.basic_message.Message}
+    @param messages: The packed messages
+
+    @type compression_threshold: C{int} or None
+    @param compression_threshold: Compress bodies of at least this 
+                                  many bytes. None disables compression 
+
+    @rtype: C{amqplib.client_0_8.basic_message.Message}
+    @return: The batch in AMQP message format
+    """
+    entries = [[message.properties.get("content_type", PICKLE_CONTENT_TYPE),
+                message.properties.get("content_encoding"),
+                message.body] for message in messages]
+    mode = max([message.properties.get("delivery_mode", DELIVERY_MODE)
+                for message in messages])
+    return _amqp_message(dto_codec.encode_value(entries), 
+                         BATCH_CONTENT_TYPE,
+                         compression_threshold,
+                         mode)
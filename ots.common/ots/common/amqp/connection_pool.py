@@ -0,0 +1,347 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+A process wide pool of AMQP connections
+
+Opening an AMQP connection costs several round trips to the broker. 
+The pool keeps connections open between uses and hands out a channel 
+on a leased connection. 
+
+amqplib connections are not thread safe, so a connection is leased 
+to one user at a time. Channels without consumers are kept open with 
+their connection, channels that consume are closed on release
+so that their auto delete queues go away as before.
+
+Idle connections are health checked before they are reused. 
+A cached channel is probed with a round trip to the broker, 
+a connection the broker has dropped is replaced by a new one.
+The number of connections and the number of idle ones are bounded.
+"""
+
+import os
+import time
+import socket
+import logging
+import threading
+
+from amqplib import client_0_8 as amqp
+from amqplib.client_0_8.exceptions import AMQPException
+
+LOGGER = logging.getLogger(__name__)
+
+#The maximum number of open connections
+MAX_SIZE = 16
+#The maximum number of idle connections kept open
+MAX_IDLE = 4
+#Idle connections older than this (seconds) are not reused
+MAX_IDLE_TIME = 60
+#Time (seconds) to wait for a connection when the pool is full 
+ACQUIRE_TIMEOUT = 30
+#Passively declared to probe a cached channel. Every broker has it
+PROBE_EXCHANGE = "amq.direct"
+
+class ConnectionPoolError(Exception):
+    """The pool is exhausted"""
+    pass
+
+
+class _Lease(object):
+    """
+    A pooled connection and the channel that comes with it
+    """
+
+    def __init__(self, key, connection, channel = None):
+        self.key = key
+        self.connection = connection
+        self.channel = channel
+        self.released_at = None
+
+    @property
+    def is_healthy(self):
+        """
+        @rtype: C{bool}
+        @return: Whether the connection can still be used
+        """
+        return self.connection.transport is not None
+
+    def close(self):
+        """
+        Silent close of the connection
+        """
+        try:
+            self.connection.close()
+        except (AMQPException, socket.error, IOError, AttributeError):
+            LOGGER.debug("Error closing pooled connection", exc_info = True)
+
+
+class ConnectionPool(object):
+    """
+    Leases AMQP channels on pooled connections 
+    """
+
+    def __init__(self, max_size = MAX_SIZE,
+                       max_idle = MAX_IDLE,
+                       max_idle_time = MAX_IDLE_TIME,
+                       connection_factory = amqp.Connection):
+        """
+        @type max_size: C{int}
+        @param max_size: The maximum number of open connections
+
+        @type max_idle: C{int}
+        @param max_idle: The maximum number of idle connections kept open
+
+        @type max_idle_time: C{float}
+        @param max_idle_time: Idle connections older than this 
+                              (seconds) are closed rather than reused
+
+        @type connection_factory: C{callable}
+        @param connection_factory: Creates the connections 
+        """
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_idle_time = max_idle_time
+        self._connection_factory = connection_factory
+        self._condition = threading.Condition()
+        self._idle = []
+        self._leases = {}
+        self._size = 0
+        self._pid = os.getpid()
+
+    @property
+    def size(self):
+        """
+        @rtype: C{int}
+        @return: The number of open connections
+        """
+        return self._size
+
+    @property
+    def idle(self):
+        """
+        @rtype: C{int}
+        @return: The number of idle connections
+        """
+        return len(self._idle)
+
+    def acquire(self, host, userid, password, virtual_host, 
+                      timeout = ACQUIRE_TIMEOUT):
+        """
+        Lease a channel 
+
+        @type host: C{str}
+        @param host: The AMQP host, optionally with the port 
+
+        @type userid: C{str}
+        @param userid: The AMQP userid
+
+        @type password: C{str}
+        @param password: The AMQP password
+
+        @type virtual_host: C{str}
+        @param virtual_host: The AMQP virtual host
+
+        @type timeout: C{float}
+        @param timeout: Seconds to wait if the pool is full
+
+        @rtype: C{amqplib.client_0_8.channel.Channel}
+        @return: An open channel. Give it back with `release`
+        """
+        key = (host, userid, password, virtual_host)
+        lease = self._take_idle(key, timeout)
+        while lease is not None:
+            channel = self._open_channel(lease)
+            if channel is not None:
+                return channel
+            self._discard(lease)
+            lease = self._take_idle(key, timeout)
+        try:
+            connection = self._connection_factory(host = host, 
+                                                  userid = userid,
+                                                  password = password,
+                                                  virtual_host = virtual_host, 
+                                                  insist = False)
+        except:
+            self._discard(None)
+            raise
+        lease = _Lease(key, connection)
+        channel = self._open_channel(lease)
+        if channel is None:
+            self._discard(lease)
+            raise ConnectionPoolError("Can't open a channel to %s" % (host))
+        return channel
+
+    def release(self, channel, discard = False):
+        """
+        Give a leased channel back to the pool
+
+        @type channel: C{amqplib.client_0_8.channel.Channel}
+        @param channel: A channel from `acquire` 
+
+        @type discard: C{bool}
+        @param discard: Close the connection rather than keep it.
+                        Use when the connection may be in a bad state
+        """
+        self._condition.acquire()
+        try:
+            lease = self._leases.pop(id(channel), None)
+        finally:
+            self._condition.release()
+        if lease is None:
+            LOGGER.warning("Released channel is not from this pool")
+            return
+        if discard or not lease.is_healthy:
+            self._discard(lease)
+            return
+        if not channel.is_open or channel.callbacks:
+            try:
+                if channel.is_open:
+                    channel.close()
+            except (AMQPException, socket.error, IOError):
+                self._discard(lease)
+                return
+            lease.channel = None
+        self._condition.acquire()
+        try:
+            lease.released_at = time.time()
+            self._idle.append(lease)
+            surplus = self._idle[:max(len(self._idle) - self.max_idle, 0)]
+            for idle_lease in surplus:
+                self._idle.remove(idle_lease)
+            self._condition.notify()
+        finally:
+            self._condition.release()
+        for idle_lease in surplus:
+            self._discard(idle_lease)
+
+    def close(self):
+        """
+        Close the idle connections. Leased ones are closed on release
+        """
+        self._condition.acquire()
+        try:
+            idle, self._idle = self._idle, []
+        finally:
+            self._condition.release()
+        for lease in idle:
+            self._discard(lease)
+
+    #################################
+    # HELPERS
+    #################################
+
+    def _check_fork(self):
+        """
+        Forget the connections of the parent process. 
+        The lock must be held
+        """
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle = []
+            self._leases = {}
+            self._size = 0
+
+    def _take_idle(self, key, timeout):
+        """
+        Take a healthy idle connection for the key,
+        or reserve room for a new one  
+
+        @rtype: L{_Lease} or None
+        @return: An idle lease or None if a new connection is to be made
+        """
+        deadline = time.time() + timeout
+        stale = []
+        self._condition.acquire()
+        try:
+            self._check_fork()
+            while True:
+                now = time.time()
+                for lease in self._idle[:]:
+                    if not lease.is_healthy or \
+                            now - lease.released_at > self.max_idle_time:
+                        self._idle.remove(lease)
+                        stale.append(lease)
+                for lease in reversed(self._idle):
+                    if lease.key == key:
+                        self._idle.remove(lease)
+                        return lease
+                if self._size - len(stale) < self.max_size:
+                    self._size += 1
+                    return None
+                if self._idle:
+                    #Make room by closing an idle connection to another host
+                    stale.append(self._idle.pop(0))
+                    continue
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise ConnectionPoolError("All %s connections in use" 
+                                              % (self.max_size))
+                self._condition.wait(remaining)
+        finally:
+            self._condition.release()
+            for lease in stale:
+                self._discard(lease)
+
+    def _open_channel(self, lease):
+        """
+        Reuse or open the channel of the lease and register the lease
+
+        @rtype: C{amqplib.client_0_8.channel.Channel} or None
+        @return: The channel or None if the connection is broken
+        """
+        channel = lease.channel
+        try:
+            if channel is None or not channel.is_open:
+                channel = lease.connection.channel()
+            else:
+                #Reusing a channel probes the broker with one round trip
+                #so that a dead connection isn't handed out
+                channel.exchange_declare(exchange = PROBE_EXCHANGE,
+                                         type = "direct",
+                                         passive = True)
+        except (AMQPException, socket.error, IOError), error:
+            LOGGER.debug("Pooled connection is broken: %s" % (error))
+            return None
+        lease.channel = channel
+        self._condition.acquire()
+        try:
+            self._leases[id(channel)] = lease
+        finally:
+            self._condition.release()
+        return channel
+
+    def _discard(self, lease):
+        """
+        Close the connection and free its place in the pool
+        """
+        if lease is not None:
+            lease.close()
+        self._condition.acquire()
+        try:
+            self._size = max(self._size - 1, 0)
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+
+#The pool shared by the whole process
+CONNECTION_POOL = ConnectionPool()
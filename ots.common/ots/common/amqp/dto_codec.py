@@ -0,0 +1,470 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+A compact, versioned binary encoding for the OTS DTOs
+
+Unlike pickle the wire format does not depend on the layout of
+the Python classes. Each DTO type has a schema: a type code and 
+an ordered list of field values. The field values are written 
+with a small tagged value encoding.
+
+Message layout::
+
+  | version (B) | type code (B) | field count (H) | fields ... |
+
+A schema grows only by appending fields. A decoder drops the trailing 
+fields it doesn't know and older senders leave out the last fields, 
+so the version only changes if a schema changes otherwise.
+"""
+
+import struct
+import logging
+from StringIO import StringIO
+
+from ots.common.dto.api import CommandMessage, StateChangeMessage
+from ots.common.dto.api import Monitor, Results, ResultsChunk, Packages
+from ots.common.dto.api import OTSException, CancelMessage
+from ots.common.testplan_store import TestPlanReference
+
+SCHEMA_VERSION = 1
+
+_HEADER = struct.Struct(">BBH")
+_LENGTH = struct.Struct(">I")
+_INT = struct.Struct(">q")
+_FLOAT = struct.Struct(">d")
+
+_MIN_INT = -2 ** 63
+_MAX_INT = 2 ** 63 - 1
+
+#Value tags
+
+_NONE = "N"
+_TRUE = "T"
+_FALSE = "F"
+_INTEGER = "i"
+_LONG = "L"
+_FLOATING = "d"
+_STRING = "s"
+_UNICODE = "u"
+_LIST = "l"
+_DICT = "m"
+
+#LogRecord attributes carried over the wire
+
+LOG_RECORD_FIELDS = ("name", "levelno", "levelname", "pathname",
+                     "filename", "module", "lineno", "funcName",
+                     "created", "msecs", "relativeCreated",
+                     "thread", "threadName", "process")
+
+class CodecError(Exception):
+    """Error in encoding or decoding a DTO"""
+    pass
+
+###########################
+# VALUES
+###########################
+
+def _encode_value(value, chunks):
+    """
+    Append the tagged encoding of the value to chunks
+
+    @type value: C{None}, C{bool}, C{int}, C{long}, C{float}, C{str},
+                 C{unicode}, C{list}, C{tuple} or C{dict}
+    @param value: The value
+
+    @type chunks: C{list} of C{str}
+    @param chunks: The output buffer
+    """
+    if value is None:
+        chunks.append(_NONE)
+    elif value is True:
+        chunks.append(_TRUE)
+    elif value is False:
+        chunks.append(_FALSE)
+    elif isinstance(value, (int, long)):
+        if _MIN_INT <= value <= _MAX_INT:
+            chunks.append(_INTEGER + _INT.pack(value))
+        else:
+            digits = str(value)
+            chunks.append(_LONG + _LENGTH.pack(len(digits)) + digits)
+    elif isinstance(value, float):
+        chunks.append(_FLOATING + _FLOAT.pack(value))
+    elif isinstance(value, str):
+        chunks.append(_STRING + _LENGTH.pack(len(value)))
+        chunks.append(value)
+    elif isinstance(value, unicode):
+        value = value.encode("utf-8")
+        chunks.append(_UNICODE + _LENGTH.pack(len(value)))
+        chunks.append(value)
+    elif isinstance(value, (list, tuple)):
+        chunks.append(_LIST + _LENGTH.pack(len(value)))
+        for item in value:
+            _encode_value(item, chunks)
+    elif isinstance(value, dict):
+        chunks.append(_DICT + _LENGTH.pack(len(value)))
+        for key, item in value.items():
+            _encode_value(key, chunks)
+            _encode_value(item, chunks)
+    else:
+        raise CodecError("Cannot encode value of type '%s'" 
+                         % (type(value).__name__))
+
+def _decode_value(data, offset):
+    """
+    Decode the tagged value starting at offset
+
+    @type data: C{str}
+    @param data: The encoded data
+
+    @type offset: C{int}
+    @param offset: The position of the tag
+
+    @rtype: C{tuple} of the value and C{int}
+    @return: The value and the offset of the next tag
+    """
+    tag = data[offset]
+    offset += 1
+    if tag == _NONE:
+        return None, offset
+    elif tag == _TRUE:
+        return True, offset
+    elif tag == _FALSE:
+        return False, offset
+    elif tag == _INTEGER:
+        return _INT.unpack_from(data, offset)[0], offset + _INT.size
+    elif tag == _FLOATING:
+        return _FLOAT.unpack_from(data, offset)[0], offset + _FLOAT.size
+    elif tag in (_STRING, _UNICODE, _LONG):
+        length = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        value = data[offset:offset + length]
+        if len(value) != length:
+            raise CodecError("Truncated message")
+        if tag == _UNICODE:
+            value = value.decode("utf-8")
+        elif tag == _LONG:
+            value = long(value)
+        return value, offset + length
+    elif tag == _LIST:
+        length = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        items = []
+        for i in range(length):
+            item, offset = _decode_value(data, offset)
+            items.append(item)
+        return items, offset
+    elif tag == _DICT:
+        length = _LENGTH.unpack_from(data, offset)[0]
+        offset += _LENGTH.size
+        items = {}
+        for i in range(length):
+            key, offset = _decode_value(data, offset)
+            items[key], offset = _decode_value(data, offset)
+        return items, offset
+    raise CodecError("Unknown value tag '%s'" % (tag))
+
+def encode_value(value):
+    """
+    Encode a plain value with the tagged value encoding
+
+    @type value: C{None}, C{bool}, C{int}, C{long}, C{float}, C{str},
+                 C{unicode}, C{list}, C{tuple} or C{dict}
+    @param value: The value
+
+    @rtype: C{str}
+    @return: The encoded value
+    """
+    chunks = []
+    _encode_value(value, chunks)
+    return "".join(chunks)
+
+def decode_value(data):
+    """
+    Decode a plain value encoded with `encode_value`
+
+    @type data: C{str}
+    @param data: The encoded value
+
+    @rtype: C{None}, C{bool}, C{int}, C{long}, C{float}, C{str},
+            C{unicode}, C{list} or C{dict}
+    @return: The value
+    """
+    try:
+        return _decode_value(data, 0)[0]
+    except (IndexError, struct.error):
+        raise CodecError("Truncated message")
+
+###########################
+# SCHEMAS
+###########################
+
+def _command_message_fields(cmd_msg):
+    """Fields of a CommandMessage"""
+    xml_file = None
+    testplan = None
+    if isinstance(cmd_msg.xml_file, TestPlanReference):
+        testplan = [cmd_msg.xml_file.name, cmd_msg.xml_file.digest]
+    elif cmd_msg.xml_file is not None:
+        xml_file = [getattr(cmd_msg.xml_file, "name", None), 
+                    cmd_msg.xml_file.getvalue()]
+    return [cmd_msg.command, cmd_msg.response_queue, cmd_msg.task_id,
+            cmd_msg.timeout, xml_file, cmd_msg.min_worker_version,
+            cmd_msg.heartbeat_interval, cmd_msg.attempt, 
+            testplan, cmd_msg.testplan_url, cmd_msg.content_encodings,
+            cmd_msg.content_types]
+
+def _command_message(command, response_queue, task_id, 
+                     timeout, xml_file, min_worker_version,
+                     heartbeat_interval = None, attempt = 1,
+                     testplan = None, testplan_url = None,
+                     content_encodings = None, content_types = None):
+    """Rebuild a CommandMessage. Older senders omit the last fields"""
+    if xml_file is not None:
+        name, content = xml_file
+        xml_file = StringIO(content)
+        xml_file.name = name
+    elif testplan is not None:
+        xml_file = TestPlanReference(*testplan)
+    #The command is already joined 
+    cmd_msg = CommandMessage([command], response_queue, task_id,
+                             timeout = timeout, 
+                             xml_file = xml_file,
+                             min_worker_version = min_worker_version,
+                             heartbeat_interval = heartbeat_interval,
+                             attempt = attempt,
+                             testplan_url = testplan_url,
+                             content_encodings = content_encodings,
+                             content_types = content_types)
+    return cmd_msg
+
+def _state_change_message_fields(state_msg):
+    """Fields of a StateChangeMessage"""
+    return [state_msg.task_id, state_msg.condition]
+
+def _cancel_message_fields(cancel_msg):
+    """Fields of a CancelMessage"""
+    return [cancel_msg.testrun_id]
+
+def _monitor_fields(monitor):
+    """Fields of a Monitor"""
+    return [monitor.type, monitor.sender, monitor.description, 
+            monitor.emitted, monitor.received]
+
+def _monitor(event_type, sender, description, emitted, received):
+    """Rebuild a Monitor"""
+    monitor = Monitor(event_type, sender, description)
+    #Preserve the timestamps of the sender
+    monitor._event_emitted = emitted
+    monitor._event_received = received
+    return monitor
+
+def _results_fields(results):
+    """Fields of a Results"""
+    return [results.name, results.content, results.package,
+            results.hostname, results.environment.environment,
+            results.task_id]
+
+def _results_chunk_fields(chunk):
+    """Fields of a ResultsChunk"""
+    return [chunk.transfer_id, chunk.sequence, chunk.data, chunk.name, 
+            chunk.package, chunk.hostname, chunk.environment, chunk.checksum,
+            chunk.task_id]
+
+def _packages_fields(packages):
+    """Fields of a Packages. The Task id, if any, is the last field"""
+    fields = [[env.environment, list(pkgs)] 
+              for env, pkgs in packages.items()]
+    if packages.task_id is not None:
+        fields.append(packages.task_id)
+    return fields
+
+def _packages(*items):
+    """Rebuild a Packages"""
+    task_id = None
+    if items and isinstance(items[-1], basestring):
+        task_id = items[-1]
+        items = items[:-1]
+    packages = None
+    for environment, pkgs in items:
+        if packages is None:
+            packages = Packages(environment, pkgs)
+        else:
+            packages.update(Packages(environment, pkgs))
+    if packages is None:
+        #An empty container
+        packages = Packages.__new__(Packages)
+        dict.__init__(packages)
+    packages.task_id = task_id
+    return packages
+
+def _ots_exception_fields(exception):
+    """Fields of an OTSException"""
+    return [exception.errno, exception.strerror, 
+            getattr(exception, "task_id", None)]
+
+def _ots_exception(errno, strerror, task_id):
+    """Rebuild an OTSException"""
+    exception = OTSException(errno, strerror)
+    if task_id is not None:
+        exception.task_id = task_id
+    return exception
+
+def _log_record_fields(record):
+    """
+    Fields of a LogRecord 
+
+    The message is formatted on the sender side 
+    as the arguments are not necessarily transferable
+    """
+    fields = [getattr(record, name, None) for name in LOG_RECORD_FIELDS]
+    fields.append(record.getMessage())
+    return fields
+
+def _log_record(*fields):
+    """Rebuild a LogRecord"""
+    attrs = dict(zip(LOG_RECORD_FIELDS, fields))
+    attrs["msg"] = fields[len(LOG_RECORD_FIELDS)]
+    attrs["args"] = None
+    return logging.makeLogRecord(attrs)
+
+
+#The schema registry:
+#type code : (class, fields getter, constructor, known fields)
+#
+#The known fields is the number of fields the constructor takes,
+#None if it takes any number
+#
+#The type codes are part of the wire format 
+#Never reuse or renumber a code, add new ones instead
+
+SCHEMAS = {1 : (CommandMessage, 
+                _command_message_fields, 
+                _command_message,
+                12),
+           2 : (StateChangeMessage, 
+                _state_change_message_fields, 
+                StateChangeMessage,
+                2),
+           3 : (Monitor, 
+                _monitor_fields, 
+                _monitor,
+                5),
+           4 : (Results, 
+                _results_fields, 
+                Results,
+                6),
+           5 : (Packages, 
+                _packages_fields, 
+                _packages,
+                None),
+           6 : (OTSException, 
+                _ots_exception_fields, 
+                _ots_exception,
+                3),
+           7 : (logging.LogRecord, 
+                _log_record_fields, 
+                _log_record,
+                len(LOG_RECORD_FIELDS) + 1),
+           8 : (ResultsChunk,
+                _results_chunk_fields,
+                ResultsChunk,
+                9),
+           9 : (CancelMessage,
+                _cancel_message_fields,
+                CancelMessage,
+                1)}
+
+_TYPE_CODES = dict([(schema[0], code) for code, schema in SCHEMAS.items()])
+
+###########################
+# ENCODE / DECODE
+###########################
+
+def is_encodable(dto):
+    """
+    Is there a schema for the DTO
+
+    @type dto: L{ots.common.dto}
+    @param dto: An OTS Data Transfer Object
+
+    @rtype: C{bool}
+    @return: True if the DTO can be encoded
+    """
+    return type(dto) in _TYPE_CODES
+
+def encode(dto):
+    """
+    Encode the DTO 
+
+    @type dto: L{ots.common.dto}
+    @param dto: An OTS Data Transfer Object
+
+    @rtype: C{str}
+    @return: The encoded DTO
+    """
+    try:
+        type_code = _TYPE_CODES[type(dto)]
+    except KeyError:
+        raise CodecError("No schema for '%s'" % (type(dto).__name__))
+    fields = SCHEMAS[type_code][1](dto)
+    chunks = [_HEADER.pack(SCHEMA_VERSION, type_code, len(fields))]
+    for field in fields:
+        _encode_value(field, chunks)
+    return "".join(chunks)
+
+def decode(data):
+    """
+    Decode the DTO
+
+    @type data: C{str}
+    @param data: The encoded DTO
+
+    @rtype: L{ots.common.dto}
+    @return: An OTS Data Transfer Object
+    """
+    try:
+        version, type_code, count = _HEADER.unpack_from(data)
+    except struct.error:
+        raise CodecError("Truncated message")
+    if version != SCHEMA_VERSION:
+        raise CodecError("Unsupported schema version %s" % (version))
+    try:
+        constructor, known_fields = SCHEMAS[type_code][2:]
+    except KeyError:
+        raise CodecError("Unknown type code %s" % (type_code))
+    offset = _HEADER.size
+    fields = []
+    try:
+        for i in range(count):
+            field, offset = _decode_value(data, offset)
+            fields.append(field)
+    except (IndexError, struct.error):
+        raise CodecError("Truncated message")
+    if known_fields is not None:
+        #Fields added by a newer sender
+        fields = fields[:known_fields]
+    try:
+        return constructor(*fields)
+    except (TypeError, ValueError), error:
+        raise CodecError("Cannot rebuild type code %s: %s" 
+                         % (type_code, error))
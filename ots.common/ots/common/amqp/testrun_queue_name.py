@@ -21,7 +21,7 @@
 # ***** END LICENCE BLOCK *****
 
 """
-The name of the AMQP Queue for the Testrun
+The names of the AMQP Queues for the Testrun and its Tasks
 """
 
 def testrun_queue_name(testrun_id):
@@ -36,3 +36,16 @@ def testrun_queue_name(testrun_id):
     @return: The queue name
     """
     return "r%s" % testrun_id
+
+def task_control_queue_name(task_id):
+    """
+    The queue on which the Worker running the Task 
+    listens for control messages 
+
+    @type task_id: C{str}
+    @param task_id: The task_id
+
+    @rtype: C{str}
+    @return: The queue name
+    """
+    return "c%s" % task_id
@@ -21,18 +21,212 @@
 # ***** END LICENCE BLOCK *****
 
 import unittest 
+import logging
+
+from pickle import dumps
 
 import ots.common
 
+from ots.common.dto.api import StateChangeMessage, TaskCondition
 from ots.common.amqp.codec import pack_message, unpack_message
+from ots.common.amqp.codec import PICKLE_CONTENT_TYPE, DTO_CONTENT_TYPE
+from ots.common.amqp.codec import COMPRESSION_THRESHOLD
+from ots.common.amqp.codec import compression_threshold_for
+from ots.common.amqp.codec import content_type_for, accepts_batches
+from ots.common.amqp.codec import pack_batch, unpack_messages
+from ots.common.amqp.codec import BATCH_CONTENT_TYPE
+from ots.common.amqp.codec import TRANSIENT, PERSISTENT, DELIVERY_POLICY
+from ots.common.amqp.codec import set_delivery_mode, delivery_mode
+from ots.common.dto.api import Monitor, MonitorType, CommandMessage
+from ots.common.dto.api import SpooledResults
+from ots.common.amqp.codec import header_dto
+
+from amqplib.client_0_8.serialization import AMQPWriter, AMQPReader
+from ots.common.amqp.dto_codec import CodecError
+from ots.common.dto.api import Results
+
+class AMQPMessageStub:
+    body = None
+
+def _through_broker(amqp_message):
+    """Round trip the headers through the AMQP table encoding"""
+    writer = AMQPWriter()
+    writer.write_table(amqp_message.properties["application_headers"])
+    reader = AMQPReader(writer.getvalue())
+    amqp_message.properties["application_headers"] = reader.read_table()
+    return amqp_message
+
+class Foo(object):
+    bar = 1
 
 class TestCodec(unittest.TestCase):
     
     def test_pack(self): 
-        pass
+        msg = StateChangeMessage("1", TaskCondition.START)
+        amqp_message = pack_message(msg)
+        self.assertEquals(PICKLE_CONTENT_TYPE, 
+                          amqp_message.properties["content_type"])
+        self.assertEquals(2, amqp_message.properties["delivery_mode"])
+
+    def test_pack_dto(self):
+        msg = StateChangeMessage("1", TaskCondition.START)
+        amqp_message = pack_message(msg, DTO_CONTENT_TYPE)
+        self.assertEquals(DTO_CONTENT_TYPE, 
+                          amqp_message.properties["content_type"])
+        self.assertTrue(len(amqp_message.body) < len(dumps(msg, True)))
+
+    def test_pack_dto_falls_back_to_pickle(self):
+        amqp_message = pack_message(Foo(), DTO_CONTENT_TYPE)
+        self.assertEquals(PICKLE_CONTENT_TYPE, 
+                          amqp_message.properties["content_type"])
+        self.assertEquals(1, unpack_message(amqp_message).bar)
+
+    def test_pack_unknown_content_type(self):
+        self.assertRaises(CodecError, pack_message, Foo(), "text/plain")
 
     def test_unpack(self):
-        pass
+        for content_type in [PICKLE_CONTENT_TYPE, DTO_CONTENT_TYPE]:
+            msg = StateChangeMessage("1", TaskCondition.FINISH)
+            msg = unpack_message(pack_message(msg, content_type))
+            self.assertEquals("1", msg.task_id)
+            self.assertTrue(msg.is_finish)
+
+    def test_pack_compressed(self):
+        content = "<xml>foo</xml>" * COMPRESSION_THRESHOLD
+        results = Results("foo.xml", content)
+        for content_type in [PICKLE_CONTENT_TYPE, DTO_CONTENT_TYPE]:
+            amqp_message = pack_message(results, content_type, 
+                                        COMPRESSION_THRESHOLD)
+            self.assertEquals("deflate", 
+                              amqp_message.properties["content_encoding"])
+            self.assertTrue(len(amqp_message.body) < len(content))
+            self.assertEquals(content, unpack_message(amqp_message).content)
+
+    def test_pack_below_threshold(self):
+        amqp_message = pack_message(Results("foo.xml", "<xml/>"), 
+                                    compression_threshold = 
+                                      COMPRESSION_THRESHOLD)
+        self.assertFalse("content_encoding" in amqp_message.properties)
+        self.assertEquals("<xml/>", unpack_message(amqp_message).content)
+
+    def test_content_type_for(self):
+        self.assertEquals(DTO_CONTENT_TYPE, 
+                          content_type_for([PICKLE_CONTENT_TYPE, 
+                                            DTO_CONTENT_TYPE]))
+        self.assertEquals(PICKLE_CONTENT_TYPE, content_type_for(None))
+        self.assertEquals(PICKLE_CONTENT_TYPE, content_type_for([""]))
+
+    def test_accepts_batches(self):
+        self.assertTrue(accepts_batches([PICKLE_CONTENT_TYPE, 
+                                         BATCH_CONTENT_TYPE]))
+        self.assertFalse(accepts_batches([PICKLE_CONTENT_TYPE, 
+                                          DTO_CONTENT_TYPE]))
+        self.assertFalse(accepts_batches(None))
+        self.assertFalse(accepts_batches([""]))
+
+    def test_compression_threshold_for(self):
+        self.assertEquals(COMPRESSION_THRESHOLD, 
+                          compression_threshold_for(["deflate"]))
+        self.assertEquals(None, compression_threshold_for(None))
+        self.assertEquals(None, compression_threshold_for([""]))
+
+    def test_unpack_unknown_encoding(self):
+        amqp_message = pack_message(Foo())
+        amqp_message.properties["content_encoding"] = "bzip2"
+        self.assertRaises(CodecError, unpack_message, amqp_message)
+
+    def test_unpack_without_content_type(self):
+        message = AMQPMessageStub()
+        message.body = dumps(Foo())
+        self.assertEquals(1, unpack_message(message).bar)
+
+    def test_pack_batch(self):
+        content = "<xml>foo</xml>" * COMPRESSION_THRESHOLD
+        messages = [pack_message(StateChangeMessage("1", TaskCondition.START)),
+                    pack_message(Results("foo.xml", content), 
+                                 DTO_CONTENT_TYPE, COMPRESSION_THRESHOLD),
+                    pack_message(Foo())]
+        amqp_message = pack_batch(messages)
+        self.assertEquals(BATCH_CONTENT_TYPE, 
+                          amqp_message.properties["content_type"])
+        dtos = unpack_messages(amqp_message)
+        self.assertEquals(3, len(dtos))
+        self.assertTrue(dtos[0].is_start)
+        self.assertEquals(content, dtos[1].content)
+        self.assertEquals(1, dtos[2].bar)
+
+    def test_unpack_messages_single(self):
+        amqp_message = pack_message(Foo())
+        self.assertEquals(1, unpack_messages(amqp_message)[0].bar)
+
+    def test_delivery_mode(self):
+        self.assertEquals(PERSISTENT, 
+                          delivery_mode(CommandMessage(["echo"], "q", 1)))
+        self.assertEquals(PERSISTENT, delivery_mode(Foo()))
+        self.assertEquals(TRANSIENT, 
+                          delivery_mode(Monitor(MonitorType.TASK_ONGOING)))
+        record = logging.LogRecord("foo", logging.INFO, "foo.py", 1, 
+                                   "bar", None, None)
+        self.assertEquals(TRANSIENT, pack_message(record).properties[
+                "delivery_mode"])
+
+    def test_delivery_mode_of_subclass(self):
+        results = SpooledResults("foo.xml", "/tmp/foo")
+        self.assertEquals(PERSISTENT, delivery_mode(results))
+        policy = DELIVERY_POLICY.copy()
+        try:
+            set_delivery_mode(Results, TRANSIENT)
+            self.assertEquals(TRANSIENT, delivery_mode(results))
+        finally:
+            DELIVERY_POLICY.clear()
+            DELIVERY_POLICY.update(policy)
+
+    def test_set_delivery_mode_invalid(self):
+        self.assertRaises(ValueError, set_delivery_mode, Foo, 3)
+
+    def test_pack_batch_delivery_mode(self):
+        monitor = pack_message(Monitor(MonitorType.TASK_ONGOING))
+        state = pack_message(StateChangeMessage("1", TaskCondition.START))
+        self.assertEquals(TRANSIENT, pack_batch([monitor, monitor]).properties[
+                "delivery_mode"])
+        self.assertEquals(PERSISTENT, pack_batch([monitor, state]).properties[
+                "delivery_mode"])
+
+    def test_headers(self):
+        amqp_message = pack_message(Results("foo.xml", "<xml/>"))
+        headers = amqp_message.properties["application_headers"]
+        self.assertEquals("Results", headers["ots_type"])
+        self.assertEquals(len(amqp_message.body), headers["ots_size"])
+        self.assertEquals(None, header_dto(_through_broker(amqp_message)))
+
+    def test_header_dto_state_change(self):
+        msg = StateChangeMessage("1", TaskCondition.FINISH)
+        amqp_message = _through_broker(pack_message(msg))
+        amqp_message.body = None
+        msg = header_dto(amqp_message)
+        self.assertEquals("1", msg.task_id)
+        self.assertTrue(isinstance(msg.task_id, str))
+        self.assertTrue(msg.is_finish)
+
+    def test_header_dto_monitor(self):
+        monitor = Monitor(MonitorType.TASK_ONGOING, "worker1")
+        amqp_message = _through_broker(pack_message(monitor))
+        msg = header_dto(amqp_message)
+        self.assertEquals(MonitorType.TASK_ONGOING, msg.type)
+        self.assertEquals("worker1", msg.sender)
+        self.assertEquals(None, msg.description)
+        self.assertEquals(monitor.emitted, msg.emitted)
+
+    def test_header_dto_needs_ascii(self):
+        monitor = Monitor(MonitorType.TASK_ONGOING, u"worker\xe4")
+        amqp_message = _through_broker(pack_message(monitor))
+        self.assertEquals(None, header_dto(amqp_message))
+        self.assertEquals(u"worker\xe4", unpack_message(amqp_message).sender)
+
+    def test_header_dto_without_headers(self):
+        message = AMQPMessageStub()
+        message.body = dumps(Foo())
+        self.assertEquals(None, header_dto(message))
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,160 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+import socket
+import unittest
+
+from ots.common.amqp.connection_pool import ConnectionPool 
+from ots.common.amqp.connection_pool import ConnectionPoolError
+
+class ChannelStub(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self.callbacks = {}
+        self.probes = 0
+
+    def close(self):
+        self.is_open = False
+
+    def exchange_declare(self, exchange, type, passive):
+        if not self.connection.is_alive:
+            raise socket.error("connection reset by peer")
+        self.probes += 1
+
+
+class ConnectionStub(object):
+
+    created = []
+
+    def __init__(self, host, userid, password, virtual_host, insist):
+        self.host = host
+        self.transport = "transport"
+        self.channels = 0
+        self.closed = False
+        #The broker end of the connection
+        self.is_alive = True
+        ConnectionStub.created.append(self)
+
+    def channel(self):
+        if self.transport is None:
+            raise socket.error("broken pipe")
+        self.channels += 1
+        return ChannelStub(self)
+
+    def close(self):
+        self.closed = True
+        self.transport = None
+
+
+ARGS = ("localhost", "guest", "guest", "/")
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        ConnectionStub.created = []
+        self.pool = ConnectionPool(max_size = 2, max_idle = 1,
+                                   connection_factory = ConnectionStub)
+
+    def test_reuse_channel(self):
+        channel = self.pool.acquire(*ARGS)
+        self.pool.release(channel)
+        self.assertEquals(1, self.pool.idle)
+        self.assertTrue(channel is self.pool.acquire(*ARGS))
+        self.assertEquals(1, len(ConnectionStub.created))
+        self.assertEquals(1, ConnectionStub.created[0].channels)
+        self.assertEquals(1, channel.probes)
+
+    def test_consuming_channel_is_closed(self):
+        channel = self.pool.acquire(*ARGS)
+        channel.callbacks["tag"] = None
+        self.pool.release(channel)
+        self.assertFalse(channel.is_open)
+        another = self.pool.acquire(*ARGS)
+        self.assertFalse(channel is another)
+        self.assertTrue(another.connection is channel.connection)
+
+    def test_broken_connection_is_replaced(self):
+        channel = self.pool.acquire(*ARGS)
+        self.pool.release(channel)
+        channel.connection.transport = None
+        another = self.pool.acquire(*ARGS)
+        self.assertFalse(another.connection is channel.connection)
+        self.assertEquals(1, self.pool.size)
+
+    def test_dead_connection_is_replaced(self):
+        channel = self.pool.acquire(*ARGS)
+        self.pool.release(channel)
+        #The broker has dropped the connection, the client doesn't know
+        channel.connection.is_alive = False
+        another = self.pool.acquire(*ARGS)
+        self.assertFalse(another.connection is channel.connection)
+        self.assertTrue(channel.connection.closed)
+        self.assertEquals(1, self.pool.size)
+
+    def test_discard(self):
+        channel = self.pool.acquire(*ARGS)
+        self.pool.release(channel, discard = True)
+        self.assertTrue(channel.connection.closed)
+        self.assertEquals(0, self.pool.size)
+        self.assertEquals(0, self.pool.idle)
+
+    def test_max_idle(self):
+        channels = [self.pool.acquire(*ARGS), self.pool.acquire(*ARGS)]
+        for channel in channels:
+            self.pool.release(channel)
+        self.assertEquals(1, self.pool.idle)
+        self.assertEquals(1, self.pool.size)
+        self.assertTrue(channels[0].connection.closed)
+
+    def test_max_size(self):
+        self.pool.acquire(*ARGS)
+        self.pool.acquire(*ARGS)
+        self.assertRaises(ConnectionPoolError, 
+                          self.pool.acquire, *ARGS, **{"timeout" : 0.01})
+
+    def test_full_pool_closes_idle_of_other_host(self):
+        channel = self.pool.acquire(*ARGS)
+        self.pool.acquire(*ARGS)
+        self.pool.release(channel)
+        other = self.pool.acquire("otherhost", "guest", "guest", "/")
+        self.assertEquals("otherhost", other.connection.host)
+        self.assertTrue(channel.connection.closed)
+        self.assertEquals(2, self.pool.size)
+
+    def test_idle_time(self):
+        self.pool.max_idle_time = -1
+        channel = self.pool.acquire(*ARGS)
+        self.pool.release(channel)
+        self.assertFalse(channel is self.pool.acquire(*ARGS))
+        self.assertTrue(channel.connection.closed)
+
+    def test_close(self):
+        channel = self.pool.acquire(*ARGS)
+        self.pool.release(channel)
+        self.pool.close()
+        self.assertTrue(channel.connection.closed)
+        self.assertEquals(0, self.pool.size)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+import unittest
+import logging
+
+from StringIO import StringIO
+
+from ots.common.dto.api import CommandMessage, StateChangeMessage
+from ots.common.dto.api import TaskCondition, Monitor, MonitorType
+from ots.common.dto.api import Results, ResultsChunk, Packages, Environment
+from ots.common.dto.api import OTSException, CancelMessage
+from ots.common.amqp.dto_codec import encode, decode, is_encodable
+from ots.common.amqp.dto_codec import CodecError, SCHEMA_VERSION
+from ots.common.amqp.dto_codec import encode_value
+from ots.common.amqp.dto_codec import _command_message_fields, _command_message
+from ots.common.testplan_store import TestPlanReference
+
+class Foo(object):
+    pass
+
+class TestDTOCodec(unittest.TestCase):
+
+    def test_command_message(self):
+        xml_file = StringIO("<xml/>")
+        xml_file.name = "plan.xml"
+        cmd_msg = CommandMessage(["echo", "foo"], "r1", "1234", 
+                                 timeout = 30,
+                                 xml_file = xml_file,
+                                 min_worker_version = "0.8",
+                                 heartbeat_interval = 10,
+                                 attempt = 2,
+                                 content_encodings = ["deflate"],
+                                 content_types = ["application/x-ots-dto"])
+        cmd_msg = decode(encode(cmd_msg))
+        self.assertEquals("echo foo", cmd_msg.command)
+        self.assertEquals("r1", cmd_msg.response_queue)
+        self.assertEquals("1234", cmd_msg.task_id)
+        self.assertEquals(30, cmd_msg.timeout)
+        self.assertEquals("plan.xml", cmd_msg.xml_file.name)
+        self.assertEquals("<xml/>", cmd_msg.xml_file.getvalue())
+        self.assertEquals("0.8", cmd_msg.min_worker_version)
+        self.assertEquals(10, cmd_msg.heartbeat_interval)
+        self.assertEquals(2, cmd_msg.attempt)
+        self.assertEquals(["deflate"], cmd_msg.content_encodings)
+        self.assertEquals(["application/x-ots-dto"], cmd_msg.content_types)
+        self.assertFalse(cmd_msg.is_quit)
+
+    def test_command_message_no_xml_file(self):
+        cmd_msg = decode(encode(CommandMessage(["quit"], "r1", "1")))
+        self.assertTrue(cmd_msg.is_quit)
+        self.assertEquals(None, cmd_msg.xml_file)
+        self.assertEquals(None, cmd_msg.heartbeat_interval)
+
+    def test_command_message_without_new_fields(self):
+        fields = _command_message_fields(CommandMessage(["ls"], "r1", "1"))
+        cmd_msg = _command_message(*fields[:-6])
+        self.assertEquals("ls", cmd_msg.command)
+        self.assertEquals(None, cmd_msg.heartbeat_interval)
+        self.assertEquals(1, cmd_msg.attempt)
+        self.assertEquals(None, cmd_msg.content_encodings)
+        self.assertEquals(None, cmd_msg.content_types)
+
+    def test_command_message_testplan_reference(self):
+        cmd_msg = CommandMessage(["ls"], "r1", "1", 
+                                 xml_file = TestPlanReference("plan.xml", 
+                                                              "a" * 40),
+                                 testplan_url = "http://ots/xmlrpc/")
+        cmd_msg = decode(encode(cmd_msg))
+        self.assertTrue(isinstance(cmd_msg.xml_file, TestPlanReference))
+        self.assertEquals("plan.xml", cmd_msg.xml_file.name)
+        self.assertEquals("a" * 40, cmd_msg.xml_file.digest)
+        self.assertEquals("http://ots/xmlrpc/", cmd_msg.testplan_url)
+
+    def test_state_change_message(self):
+        state_msg = StateChangeMessage("1", TaskCondition.START)
+        state_msg = decode(encode(state_msg))
+        self.assertEquals("1", state_msg.task_id)
+        self.assertTrue(state_msg.is_start)
+
+    def test_monitor(self):
+        monitor = Monitor(MonitorType.TASK_ONGOING, "worker", "1")
+        monitor.set_received(12.5)
+        decoded = decode(encode(monitor))
+        self.assertEquals(MonitorType.TASK_ONGOING, decoded.type)
+        self.assertEquals("worker", decoded.sender)
+        self.assertEquals("1", decoded.description)
+        self.assertEquals(monitor.emitted, decoded.emitted)
+        self.assertEquals(12.5, decoded.received)
+
+    def test_results(self):
+        results = Results("foo.xml", "<xml>\xe4</xml>", 
+                          package = "pkg-tests",
+                          hostname = "worker",
+                          environment = "hardware")
+        results = decode(encode(results))
+        self.assertEquals("foo.xml", results.name)
+        self.assertEquals("<xml>\xe4</xml>", results.content)
+        self.assertEquals("pkg-tests", results.package)
+        self.assertEquals("worker", results.hostname)
+        self.assertEquals(Environment("hardware"), results.environment)
+        self.assertEquals(None, results.task_id)
+
+    def test_results_task_id(self):
+        results = Results("foo.xml", "<xml/>", task_id = "1")
+        self.assertEquals("1", decode(encode(results)).task_id)
+
+    def test_results_chunk(self):
+        chunk = ResultsChunk("1", 3, "\x00data", "foo.xml", "pkg-tests", 
+                             "worker", "hardware", "abc", "2")
+        chunk = decode(encode(chunk))
+        self.assertEquals("1", chunk.transfer_id)
+        self.assertEquals(3, chunk.sequence)
+        self.assertEquals("\x00data", chunk.data)
+        self.assertEquals("foo.xml", chunk.name)
+        self.assertEquals("pkg-tests", chunk.package)
+        self.assertEquals("worker", chunk.hostname)
+        self.assertEquals("hardware", chunk.environment)
+        self.assertTrue(chunk.is_last)
+        self.assertEquals("2", chunk.task_id)
+
+    def test_packages(self):
+        packages = Packages("hardware", ["pkg1-tests", "pkg2-tests"])
+        packages.update(Packages("host.foo", ["pkg3-tests"]))
+        packages = decode(encode(packages))
+        self.assertEquals(["hardware", "host.foo"], packages.environments)
+        self.assertEquals(["pkg1-tests", "pkg2-tests"],
+                          packages.packages("hardware"))
+        self.assertEquals(["pkg3-tests"], packages.packages("host.foo"))
+        self.assertEquals(None, packages.task_id)
+
+    def test_packages_task_id(self):
+        packages = Packages("hardware", ["pkg1-tests"], task_id = "1")
+        packages = decode(encode(packages))
+        self.assertEquals(["hardware"], packages.environments)
+        self.assertEquals("1", packages.task_id)
+
+    def test_ots_exception(self):
+        exception = OTSException(123, u"fail \xe4")
+        exception.task_id = "1"
+        exception = decode(encode(exception))
+        self.assertEquals(123, exception.errno)
+        self.assertEquals(u"fail \xe4", exception.strerror)
+        self.assertEquals("1", exception.task_id)
+
+    def test_cancel_message(self):
+        cancel_msg = decode(encode(CancelMessage("1234")))
+        self.assertTrue(isinstance(cancel_msg, CancelMessage))
+        self.assertEquals("1234", cancel_msg.testrun_id)
+
+    def test_log_record(self):
+        record = logging.LogRecord("foo", logging.INFO, "/foo.py", 10,
+                                   "hello %s", ("world",), None)
+        record = decode(encode(record))
+        self.assertEquals("foo", record.name)
+        self.assertEquals(logging.INFO, record.levelno)
+        self.assertEquals(10, record.lineno)
+        self.assertEquals("hello world", record.getMessage())
+
+    def test_large_numbers(self):
+        state_msg = decode(encode(StateChangeMessage(2 ** 70, -1.5)))
+        self.assertEquals(2 ** 70, state_msg.task_id)
+        self.assertEquals(-1.5, state_msg.condition)
+
+    def test_is_encodable(self):
+        self.assertTrue(is_encodable(StateChangeMessage("1", "start")))
+        self.assertFalse(is_encodable(Foo()))
+        self.assertRaises(CodecError, encode, Foo())
+
+    def test_decode_errors(self):
+        data = encode(StateChangeMessage("1", "start"))
+        self.assertRaises(CodecError, decode, data[:-3])
+        self.assertRaises(CodecError, decode, data[:2])
+        self.assertRaises(CodecError, decode, 
+                          chr(SCHEMA_VERSION + 1) + data[1:])
+        self.assertRaises(CodecError, decode, data[:1] + chr(255) + data[2:])
+
+    def test_newer_sender_fields_are_dropped(self):
+        data = encode(CancelMessage("1"))
+        #A field appended to the schema by a newer sender
+        data = data[:2] + "\x00\x02" + data[4:] + encode_value([1, 2])
+        self.assertEquals("1", decode(data).testrun_id)
+
+    def test_missing_fields(self):
+        data = encode(StateChangeMessage("1", "start"))
+        data = data[:2] + "\x00\x01" + data[4:10]
+        self.assertRaises(CodecError, decode, data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,11 +24,15 @@
 import unittest
 
 from ots.common.amqp.testrun_queue_name import testrun_queue_name
+from ots.common.amqp.testrun_queue_name import task_control_queue_name
 
 class TestTestRunQueueName(unittest.TestCase):
 
     def test_queue_name(self):
         self.assertEquals("r1", testrun_queue_name(1))
 
+    def test_task_control_queue_name(self):
+        self.assertEquals("cabc", task_control_queue_name("abc"))
+
 if __name__ == "__main__":
     unittest.main()
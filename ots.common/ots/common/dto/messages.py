@@ -39,6 +39,8 @@ class TaskCondition(object):
 
     START = 'start'
     FINISH = 'finish'
+    #The Task is still running, it doesn't change the state
+    HEARTBEAT = 'heartbeat'
 
 
 ###########################
@@ -62,8 +64,17 @@ class CommandMessage(MessageBase):
     QUIT = 'quit'
     IGNORE = 'ignore'
 
+    #Messages pickled by older servers don't have the attributes
+    heartbeat_interval = None
+    attempt = 1
+    testplan_url = None
+    content_encodings = None
+    content_types = None
+
     def __init__(self, command, response_queue, task_id, 
-                 timeout = 60, xml_file = None, min_worker_version = None):
+                 timeout = 60, xml_file = None, min_worker_version = None,
+                 heartbeat_interval = None, attempt = 1, testplan_url = None,
+                 content_encodings = None, content_types = None):
         """
         @type command: C{list}
         @param command: The CL params
@@ -77,11 +88,32 @@ class CommandMessage(MessageBase):
         @type task_id : C{int}
         @param task_id : The Task ID
         
-        @type xml_file : C{StringIO}
-        @param xml_file : XML test plan
+        @type xml_file : C{StringIO} or 
+                         L{ots.common.testplan_store.TestPlanReference}
+        @param xml_file : XML test plan or a reference to a stored one
 
         @type min_worker_version: C{str}
         @param min_worker_version: The minimum acceptable worker version 
+
+        @type heartbeat_interval: C{int} or None
+        @param heartbeat_interval: Seconds between the heartbeats of 
+                                   the running Task, None for no heartbeats
+
+        @type attempt: C{int}
+        @param attempt: 1 for the first run of the command, 
+                        then counts the requeues of a lost Task
+
+        @type testplan_url: C{str} or None
+        @param testplan_url: The XML-RPC URL the Worker fetches 
+                             a referenced test plan from
+
+        @type content_encodings: C{list} of C{str} or None
+        @param content_encodings: The content encodings the server 
+                                  accepts on the response queue
+
+        @type content_types: C{list} of C{str} or None
+        @param content_types: The content types the server 
+                              decodes on the response queue
         """
         self.command = " ".join(command)
         self.response_queue = response_queue
@@ -89,6 +121,11 @@ class CommandMessage(MessageBase):
         self.timeout = timeout
         self.xml_file = xml_file
         self.min_worker_version = min_worker_version
+        self.heartbeat_interval = heartbeat_interval
+        self.attempt = attempt
+        self.testplan_url = testplan_url
+        self.content_encodings = content_encodings
+        self.content_types = content_types
 
     @property    
     def is_quit(self):
@@ -107,6 +144,24 @@ class CommandMessage(MessageBase):
         #FIXME: Explain the point of this
         return self.command == self.IGNORE
 
+################################
+# CANCEL MESSAGE
+################################
+
+class CancelMessage(MessageBase):
+    """
+    Cancels a Testrun. 
+    Sent to the TaskRunner of the Testrun 
+    and by the TaskRunner to the Workers running its Tasks
+    """
+
+    def __init__(self, testrun_id):
+        """
+        @type testrun_id: C{str}
+        @param testrun_id: The id of the Testrun to cancel
+        """
+        self.testrun_id = testrun_id
+
 ################################
 # STATE CHANGE MESSAGE
 ################################
@@ -135,3 +190,11 @@ class StateChangeMessage(MessageBase):
         @rtype: C{bool}
         """
         return self.condition == TaskCondition.FINISH
+
+    @property
+    def is_heartbeat(self):
+        """
+        Is this a heartbeat of a running Task
+        @rtype: C{bool}
+        """
+        return self.condition == TaskCondition.HEARTBEAT
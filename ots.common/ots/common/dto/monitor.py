@@ -35,7 +35,7 @@ class MonitorType(object):
     TESTRUN_REQUESTED = "Testrun requested"
 
     # Emitted in taskrunner when tasks are added to queue
-    # Description: task.id
+    # Description: the task.ids of the testrun separated by commas
     TASK_INQUEUE = "Task in queue"
 
     # OTS worker sends this event when processes a task
@@ -48,9 +48,21 @@ class MonitorType(object):
     # Sender: host name
     TASK_ENDED = "Task is ended"
 
+    # Emitted in taskrunner when the server side deadline of a task passes
+    # Description: task.id
+    TASK_TIMED_OUT = "Task timed out"
+
+    # Emitted in taskrunner when the worker of a task stops sending heartbeats
+    # Description: task.id
+    TASK_LOST = "Task lost"
+
     # Emitted in taskrunner when tasks are added to queue
     TESTRUN_ENDED = "Testrun ended"
 
+    # Emitted in taskrunner when the testrun is cancelled
+    # Description: the task.ids of the cancelled tasks separated by commas
+    TESTRUN_CANCELLED = "Testrun cancelled"
+
     # Conductor sends this event when starts flashing
     # Description: image url
     DEVICE_FLASH = "Device flashing"
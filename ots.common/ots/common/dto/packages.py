@@ -32,7 +32,10 @@ class Packages(dict):
     the logic for amalgamating the data
     """
 
-    def __init__(self, environment, packages):
+    # Packages pickled before the Task id was carried have no task_id
+    task_id = None
+
+    def __init__(self, environment, packages, task_id = None):
         """
         @type environment : L{ots.common.dto.environment.Environment} or
                             C{str}
@@ -40,11 +43,15 @@ class Packages(dict):
 
         @type packages: C{list} of C{str}
         @param packages: The test packages
+
+        @type task_id : C{str} or None
+        @param task_id : The id of the Task that executed the packages
         """
         if isinstance(environment, str):
             environment = Environment(environment)
         dict.__init__(self)
         self[environment] = packages
+        self.task_id = task_id
 
     @property
     def environments(self):
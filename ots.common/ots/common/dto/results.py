@@ -22,6 +22,9 @@
 
 """
 The Container for a the Result file
+
+Large files are transferred as a sequence of `ResultsChunk`s 
+and reassembled into a spool file held by `SpooledResults`
 """
 from StringIO import StringIO
 from ots.common.dto.environment import Environment
@@ -34,8 +37,12 @@ class Results(object):
     The Result file and associated metadata
     """
 
+    # Results pickled before the Task id was carried have no task_id
+    task_id = None
+
     def __init__(self, name, content, 
-                       package = None, hostname = None, environment = None):
+                       package = None, hostname = None, environment = None,
+                       task_id = None):
         """
         @type name : C{str}
         @param name : The name of the result file
@@ -51,12 +58,16 @@ class Results(object):
 
         @type environment : C{str}
         @param environment : The name of the Environment
+
+        @type task_id : C{str} or None
+        @param task_id : The id of the Task that produced the file
         """
         self.data = StringIO(content)
         self.data.name = name
         self.package = package
         self.hostname = hostname
         self.environment = Environment(environment)
+        self.task_id = task_id
 
     @property
     def name(self):
@@ -92,3 +103,130 @@ class Results(object):
             return True
         else:
             return False
+
+
+class SpooledResults(Results):
+    """
+    Results with the content kept in a spool file rather than in memory
+    """
+
+    # Disabling "__init__ method from base class is not called".
+    # The base class reads the content into memory
+    # pylint: disable=W0231
+
+    def __init__(self, name, path,
+                       package = None, hostname = None, environment = None,
+                       task_id = None):
+        """
+        @type name : C{str}
+        @param name : The name of the result file
+
+        @type path : C{str}
+        @param path : The path of the spool file holding the content
+
+        @type package : C{str}
+        @param package : The associated package
+
+        @type hostname : C{str}
+        @param hostname : The hostname of the machine conducting the tests
+
+        @type environment : C{str}
+        @param environment : The name of the Environment
+
+        @type task_id : C{str} or None
+        @param task_id : The id of the Task that produced the file
+        """
+        self._name = name
+        self.path = path
+        self.package = package
+        self.hostname = hostname
+        self.environment = Environment(environment)
+        self.task_id = task_id
+
+    @property
+    def name(self):
+        """
+        Name of the result file
+        @rtype: C{str}
+        """
+        return self._name
+
+    @property
+    def data(self):
+        """
+        The spool file opened for reading
+        @rtype: C{file}
+        """
+        return open(self.path, "rb")
+
+    @property
+    def content(self):
+        """
+        Convenience method for accessing the data 
+        Note. This reads the whole file into memory
+        """
+        spool_file = self.data
+        try:
+            return spool_file.read()
+        finally:
+            spool_file.close()
+
+
+class ResultsChunk(object):
+    """
+    A piece of a Result file sent in a chunked transfer
+
+    The chunks of a transfer are numbered from 0. 
+    The last chunk carries the md5 checksum of the whole file
+    """
+
+    task_id = None
+
+    def __init__(self, transfer_id, sequence, data, name, 
+                       package = None, hostname = None, environment = None,
+                       checksum = None, task_id = None):
+        """
+        @type transfer_id : C{str}
+        @param transfer_id : Identifies the chunks of a file
+
+        @type sequence : C{int}
+        @param sequence : The sequence number of the chunk 
+
+        @type data : C{str}
+        @param data : The piece of the file content
+
+        @type name : C{str}
+        @param name : The name of the result file
+
+        @type package : C{str}
+        @param package : The associated package
+
+        @type hostname : C{str}
+        @param hostname : The hostname of the machine conducting the tests
+
+        @type environment : C{str}
+        @param environment : The name of the Environment
+
+        @type checksum : C{str} or None
+        @param checksum : md5 hexdigest of the file. Set on the last chunk
+
+        @type task_id : C{str} or None
+        @param task_id : The id of the Task that produced the file
+        """
+        self.transfer_id = transfer_id
+        self.sequence = sequence
+        self.data = data
+        self.name = name
+        self.package = package
+        self.hostname = hostname
+        self.environment = environment
+        self.checksum = checksum
+        self.task_id = task_id
+
+    @property
+    def is_last(self):
+        """
+        Is this the last chunk of the transfer
+        @rtype: C{bool}
+        """
+        return self.checksum is not None
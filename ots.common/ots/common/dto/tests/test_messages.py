@@ -52,6 +52,12 @@ class TestMessages(unittest.TestCase):
         self.assertTrue(state_msg.is_finish)
         self.assertFalse(state_msg.is_start)
 
+    def test_state_change_message_heartbeat(self):
+        state_msg = StateChangeMessage(1, 'heartbeat')
+        self.assertTrue(state_msg.is_heartbeat)
+        self.assertFalse(state_msg.is_start)
+        self.assertFalse(state_msg.is_finish)
+
 
 if __name__ == "__main__":
     unittest.main()
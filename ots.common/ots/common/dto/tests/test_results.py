@@ -20,9 +20,11 @@
 # 02110-1301 USA
 # ***** END LICENCE BLOCK *****
 
+import os
 import unittest 
+import tempfile
 
-from ots.common.dto.results import Results
+from ots.common.dto.results import Results, SpooledResults, ResultsChunk
 
 class TestResults(unittest.TestCase):
 
@@ -80,6 +82,30 @@ class TestResults(unittest.TestCase):
                           environment = "meego")
         self.assertFalse(results.is_result_xml)
 
+    def test_spooled_results(self):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, "<result>pass</result>")
+        os.close(fd)
+        try:
+            results = SpooledResults("tatam_xml_testrunner_results_for_a.xml",
+                                     path,
+                                     package = "pkg1", 
+                                     hostname = "unittest", 
+                                     environment = "meego")
+            self.assertTrue(isinstance(results, Results))
+            self.assertTrue(results.is_result_xml)
+            self.assertEquals("tatam_xml_testrunner_results_for_a.xml",
+                              results.name)
+            self.assertEquals("<result>pass</result>", results.data.read())
+            self.assertEquals("<result>pass</result>", results.content)
+        finally:
+            os.remove(path)
+
+    def test_results_chunk(self):
+        chunk = ResultsChunk("1", 0, "<res", "foo.xml")
+        self.assertFalse(chunk.is_last)
+        chunk = ResultsChunk("1", 1, "ult/>", "foo.xml", checksum = "abc")
+        self.assertTrue(chunk.is_last)
 
         
 if __name__ == "__main__":
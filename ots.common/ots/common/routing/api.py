@@ -31,3 +31,8 @@ from ots.common.routing.routing import DEVICE_GROUP, DEVICE_NAME, DEVICE_ID
 from ots.common.routing.routing import VALID_PROPERTIES
 from ots.common.routing.routing import get_routing_key
 from ots.common.routing.routing import get_queues
+from ots.common.routing.routing import get_priority_queue, get_priority_queues
+from ots.common.routing.routing import get_sub_queues
+from ots.common.routing.routing import PRIORITY_HIGH, PRIORITY_NORMAL
+from ots.common.routing.routing import PRIORITY_LOW, PRIORITIES
+from ots.common.routing.routing import PRIORITY_SEPARATOR
@@ -57,14 +57,33 @@ DEVICE_ID = "deviceid"
 
 VALID_PROPERTIES = (DEVICE_GROUP, DEVICE_NAME, DEVICE_ID)
 
+# The priority lanes, highest first.
+# Every queue has a sub-queue for each priority but the normal one. 
+# The normal priority uses the queue itself
+
+PRIORITY_HIGH = "high"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+
+PRIORITIES = (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+# Not a valid character in the Name Spaces
+PRIORITY_SEPARATOR = ":"
+
+# Separates the Name Spaces of a routing key
+NAME_SPACE_SEPARATOR = "."
+
 ######################################
                 
-def get_routing_key(device_properties):
+def get_routing_key(device_properties, priority = None):
     """
     Defines the routing key based on the key format and device_properties
     
     @param device_properties: Contains the input device_properties for the key
     @type device_properties: c{dictionary} 
+
+    @param priority: One of the PRIORITIES, None for the normal priority
+    @type priority: c{string} 
         
     @return: The generated routing key as a string
     @rtype: c{string}
@@ -76,7 +95,55 @@ def get_routing_key(device_properties):
     for key in VALID_PROPERTIES:
         if key in device_properties.keys():
             routing_key = routing_key+"."+device_properties[key]
-    return routing_key.lstrip(".") # Remove the first dot
+    routing_key = routing_key.lstrip(".") # Remove the first dot
+    return get_priority_queue(routing_key, priority)
+
+def get_priority_queue(queue, priority):
+    """
+    The sub-queue of the queue for the priority
+
+    @param queue: The name of the queue
+    @type queue: c{string} 
+
+    @param priority: One of the PRIORITIES, None for the normal priority
+    @type priority: c{string} 
+        
+    @return: The name of the sub-queue 
+    @rtype: c{string}
+    """
+    if priority is None or priority == PRIORITY_NORMAL:
+        return queue
+    if priority not in PRIORITIES:
+        raise Exception("Unknown priority '%s', use one of %s" % 
+                        (priority, ", ".join(PRIORITIES)))
+    return queue + PRIORITY_SEPARATOR + priority
+
+
+def get_sub_queues(routing_key, devicenames):
+    """
+    The queues a Task for the routing key can be published to.
+    A devicegroup routing key can also go to the devicename 
+    sub-queues of the group, in the same priority lane. 
+    More specific routing keys have only their own queue
+
+    @param routing_key: The routing key of the Testrun
+    @type routing_key: c{string} 
+
+    @param devicenames: The devicenames of the devicegroup
+    @type devicenames: c{list} of c{string} 
+        
+    @return: The routing key followed by its sub-queues
+    @rtype: c{list} of c{string}
+    """
+    queue, priority = routing_key, None
+    if PRIORITY_SEPARATOR in routing_key:
+        queue, priority = routing_key.split(PRIORITY_SEPARATOR, 1)
+    if NAME_SPACE_SEPARATOR in queue:
+        return [routing_key]
+    return [routing_key] + \
+        [get_priority_queue(queue + NAME_SPACE_SEPARATOR + devicename, 
+                            priority)
+         for devicename in devicenames]
 
 
 def _check_input(device_properties):
@@ -130,3 +197,20 @@ def get_queues(device_properties):
         
     return queues
     
+
+def get_priority_queues(device_properties):
+    """
+    Returns the queues the worker should consume from for each priority.
+    The priorities are ordered from the highest, the queues of a priority 
+    as in `get_queues`
+
+    @param device_properties: The Device properties of the worker
+    @type device_properties: c{dictionary}
+
+    @rtype: C{list} of (C{str}, C{list}) 
+    @return: The priorities with their queues
+    """
+    queues = get_queues(device_properties)
+    return [(priority, [get_priority_queue(queue, priority) 
+                        for queue in queues])
+            for priority in PRIORITIES]
@@ -24,6 +24,8 @@
 
 import unittest
 from ots.common.routing.routing import get_queues, get_routing_key
+from ots.common.routing.routing import get_priority_queues
+from ots.common.routing.routing import get_sub_queues
 
 class TestRouting(unittest.TestCase):
     
@@ -95,6 +97,34 @@ class TestRouting(unittest.TestCase):
         properties = dict()
         self.assertRaises(Exception, get_routing_key, properties)
 
+    def test_get_routing_key_priority(self):
+        properties = dict()
+        properties["devicegroup"] = "test"
+        properties["devicename"] = "testname"
+        self.assertEquals("test.testname:high", 
+                          get_routing_key(properties, "high"))
+        self.assertEquals("test.testname", 
+                          get_routing_key(properties, "normal"))
+        self.assertRaises(Exception, get_routing_key, properties, "urgent")
+
+    def test_get_priority_queues(self):
+        properties = dict()
+        properties["devicegroup"] = "test"
+        properties["devicename"] = "testname"
+        lanes = get_priority_queues(properties)
+        self.assertEquals([("high", ["test.testname:high", "test:high"]),
+                           ("normal", ["test.testname", "test"]),
+                           ("low", ["test.testname:low", "test:low"])],
+                          lanes)
+
+    def test_get_sub_queues(self):
+        self.assertEquals(["test", "test.a", "test.b"],
+                          get_sub_queues("test", ["a", "b"]))
+        self.assertEquals(["test:low", "test.a:low"],
+                          get_sub_queues("test:low", ["a"]))
+        self.assertEquals(["test.a"], get_sub_queues("test.a", ["b"]))
+        self.assertEquals(["test"], get_sub_queues("test", []))
+
 
 
         
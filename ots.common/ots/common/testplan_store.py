@@ -0,0 +1,186 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Content addressed storage for test plans.
+
+A test plan is stored once under the SHA-1 of its content. 
+Requests and commands refer to it with a reference string 
+instead of carrying the whole plan
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+
+#The prefix of a test plan reference
+REFERENCE_PREFIX = "sha1:"
+
+_DIGEST_PATTERN = re.compile("^[0-9a-f]{40}$")
+
+class TestPlanStoreError(Exception):
+    """Test Plan Store Error"""
+    pass
+
+def plan_digest(data):
+    """
+    @type data: C{str}
+    @param data: The content of a test plan
+
+    @rtype: C{str}
+    @return: The hex SHA-1 of the content
+    """
+    return hashlib.sha1(data).hexdigest()
+
+def plan_reference(digest):
+    """
+    @type digest: C{str}
+    @param digest: The digest of a test plan
+
+    @rtype: C{str}
+    @return: The reference to the test plan
+    """
+    return REFERENCE_PREFIX + digest
+
+def parse_reference(value):
+    """
+    @type value: C{object}
+    @param value: The test plan data or a reference to it
+
+    @rtype: C{str} or None
+    @return: The digest if the value is a reference
+    """
+    if not isinstance(value, basestring) \
+            or not value.startswith(REFERENCE_PREFIX):
+        return None
+    digest = value[len(REFERENCE_PREFIX):]
+    if not is_digest(digest):
+        return None
+    return digest
+
+def is_digest(digest):
+    """
+    @type digest: C{str}
+    @param digest: A test plan digest
+
+    @rtype: C{bool}
+    @return: Whether the digest is well formed
+    """
+    return isinstance(digest, basestring) \
+        and _DIGEST_PATTERN.match(digest) is not None
+
+
+class TestPlanReference(object):
+    """
+    A test plan held in a TestPlanStore. 
+    Takes the place of the StringIO of an inline test plan
+    """
+
+    def __init__(self, name, digest):
+        """
+        @type name: C{str}
+        @param name: The file name of the test plan
+
+        @type digest: C{str}
+        @param digest: The digest of its content
+        """
+        self.name = name
+        self.digest = digest
+
+    def __repr__(self):
+        return "TestPlanReference(%r, %r)" % (self.name, self.digest)
+
+
+class TestPlanStore(object):
+    """
+    A directory of test plans named by their digest
+    """
+
+    def __init__(self, directory):
+        """
+        @type directory: C{str}
+        @param directory: The directory of the store
+        """
+        self.directory = directory
+
+    def path(self, digest):
+        """
+        @type digest: C{str}
+        @param digest: The digest of a test plan
+
+        @rtype: C{str}
+        @return: The path of the test plan file
+        """
+        if not is_digest(digest):
+            raise TestPlanStoreError("Invalid test plan digest '%s'" % digest)
+        return os.path.join(self.directory, digest + ".xml")
+
+    def __contains__(self, digest):
+        return is_digest(digest) and os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """
+        Store the test plan unless it is already there.
+        The file appears atomically so readers never see a partial plan
+
+        @type data: C{str}
+        @param data: The content of the test plan
+
+        @rtype: C{str}
+        @return: The digest of the test plan
+        """
+        digest = plan_digest(data)
+        if digest in self:
+            return digest
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        fd, tmp_path = tempfile.mkstemp(dir = self.directory, 
+                                        suffix = ".tmp")
+        try:
+            tmp_file = os.fdopen(fd, "wb")
+            try:
+                tmp_file.write(data)
+            finally:
+                tmp_file.close()
+            os.rename(tmp_path, self.path(digest))
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest):
+        """
+        @type digest: C{str}
+        @param digest: The digest of a test plan
+
+        @rtype: C{str}
+        @return: The content of the test plan. Raises KeyError if missing
+        """
+        if digest not in self:
+            raise KeyError(digest)
+        plan_file = open(self.path(digest), "rb")
+        try:
+            return plan_file.read()
+        finally:
+            plan_file.close()
@@ -0,0 +1,74 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""Unit tests for ots.common.testplan_store"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ots.common import testplan_store
+from ots.common.testplan_store import TestPlanStore, TestPlanStoreError
+from ots.common.testplan_store import parse_reference
+
+PLAN = "<testdefinition/>"
+
+class TestTestPlanStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = TestPlanStore(os.path.join(self.directory, "plans"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_get(self):
+        digest = self.store.put(PLAN)
+        self.assertEquals(testplan_store.plan_digest(PLAN), digest)
+        self.assertTrue(digest in self.store)
+        self.assertEquals(PLAN, self.store.get(digest))
+        #Stored once
+        self.assertEquals(digest, self.store.put(PLAN))
+        self.assertEquals([digest + ".xml"], 
+                          os.listdir(self.store.directory))
+
+    def test_missing(self):
+        digest = testplan_store.plan_digest(PLAN)
+        self.assertFalse(digest in self.store)
+        self.assertRaises(KeyError, self.store.get, digest)
+
+    def test_invalid_digest(self):
+        self.assertFalse("../../etc/passwd" in self.store)
+        self.assertRaises(TestPlanStoreError, self.store.path, "../x")
+        self.assertRaises(KeyError, self.store.get, "../x")
+
+    def test_reference(self):
+        digest = testplan_store.plan_digest(PLAN)
+        self.assertEquals(digest, parse_reference(
+                testplan_store.plan_reference(digest)))
+        self.assertEquals(None, parse_reference(PLAN))
+        self.assertEquals(None, parse_reference("sha1:foo"))
+        self.assertEquals(None, parse_reference(None))
+
+if __name__ == "__main__":
+    unittest.main()
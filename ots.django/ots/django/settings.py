@@ -128,4 +128,8 @@ XMLRPC_METHODS = (
     # Methods available in xmlrpc interface (<method path>, <xml-rpc name>,)
     ('ots.server.xmlrpc.public.request_sync', 'request_sync'),
     ('ots.server.xmlrpc.public.latest_logs', 'latest_logs'),
+    ('ots.server.xmlrpc.public.cancel_testrun', 'cancel_testrun'),
+    ('ots.server.xmlrpc.public.has_testplan', 'has_testplan'),
+    ('ots.server.xmlrpc.public.upload_testplan', 'upload_testplan'),
+    ('ots.server.xmlrpc.public.get_testplan', 'get_testplan'),
     )
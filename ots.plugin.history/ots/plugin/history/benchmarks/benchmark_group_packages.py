@@ -0,0 +1,80 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Groups random package runtimes and reports the time spent and 
+the longest group against its lower bound
+
+usage: python benchmark_group_packages.py [-n PACKAGES] [-g GROUPS] [-r RUNTIME]
+"""
+
+import time
+import random
+from optparse import OptionParser
+
+from ots.plugin.history.schedule_algo import group_packages
+
+def benchmark(packages, max_groups, max_runtime):
+    """
+    Print the time to group the packages and the quality of the groups
+
+    @type packages: C{int}
+    @param packages: The number of packages
+
+    @type max_groups: C{int}
+    @param max_groups: The maximum number of groups
+
+    @type max_runtime: C{int}
+    @param max_runtime: The target runtime of a group
+    """
+    rand = random.Random(packages)
+    runtimes = dict(("package%d" % i, rand.randint(1, 120))
+                    for i in xrange(packages))
+    start = time.time()
+    groups = group_packages(runtimes, max_runtime, max_groups)
+    elapsed = time.time() - start
+    longest = max(sum(runtimes[p] for p in group) for group in groups)
+    lower_bound = max(float(sum(runtimes.values())) / len(groups),
+                      max(runtimes.values()))
+    print "%d packages, %d groups in %.1f ms, longest %d, %.3f of bound" % \
+        (packages, len(groups), elapsed * 1e3, longest, longest / lower_bound)
+
+def main():
+    """Entry point"""
+    parser = OptionParser()
+    parser.add_option("-n", "--packages",
+                      default = 10000,
+                      type = int,
+                      help = "the number of packages")
+    parser.add_option("-g", "--groups",
+                      default = 100,
+                      type = int,
+                      help = "the maximum number of groups")
+    parser.add_option("-r", "--runtime",
+                      default = 60,
+                      type = int,
+                      help = "the target runtime of a group")
+    options = parser.parse_args()[0]
+    benchmark(options.packages, options.groups, options.runtime)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Publishes the History of a testrun into a sqlite database file
+and reports the time spent
+
+usage: python benchmark_publish.py [-n PACKAGES] [-r TESTRUNS]
+"""
+
+import os
+import time
+import shutil
+import tempfile
+from optparse import OptionParser
+
+from django.conf import settings
+
+def _configure(directory):
+    """
+    @type directory: C{str}
+    @param directory: The directory of the database file
+    """
+    settings.configure(
+        DEBUG = True,
+        DATABASES = {"default" : 
+                     {"ENGINE" : "django.db.backends.sqlite3",
+                      "NAME" : os.path.join(directory, "history.db")}},
+        INSTALLED_APPS = ("ots.plugin.history",))
+    from django.core.management import call_command
+    call_command("syncdb", verbosity = 0, interactive = False)
+
+def _plugin(testrun, packages):
+    """
+    @type testrun: C{int}
+    @param testrun: The number of the testrun
+
+    @type packages: C{int}
+    @param packages: The number of packages
+
+    @rtype: L{HistoryPlugin}
+    @return: A HistoryPlugin with the packages executed
+    """
+    from ots.common.dto.monitor import Monitor, MonitorType
+    from ots.plugin.history.history_plugin import HistoryPlugin
+    plugin = HistoryPlugin(str(testrun), "%032d" % testrun, "product", 
+                           "image", device = {"devicegroup" : "benchmark"})
+    for event_type in [MonitorType.TEST_PACKAGE_STARTED,
+                       MonitorType.TEST_PACKAGE_ENDED]:
+        for i in xrange(packages):
+            plugin.add_monitor_event(Monitor(event_type = event_type,
+                                             sender = "worker",
+                                             description = "package%d" % i))
+    return plugin
+
+def benchmark(packages, testruns):
+    """
+    Print the time to publish the History of the testruns
+
+    @type packages: C{int}
+    @param packages: The number of packages per testrun
+
+    @type testruns: C{int}
+    @param testruns: The number of testruns
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        _configure(directory)
+        from django.db import connection, reset_queries
+        for testrun in xrange(testruns):
+            plugin = _plugin(testrun, packages)
+            reset_queries()
+            start = time.time()
+            plugin.publish()
+            elapsed = time.time() - start
+            print "testrun %d: %d packages in %.1f ms, %d statements" % \
+                (testrun, packages, elapsed * 1e3, len(connection.queries))
+    finally:
+        shutil.rmtree(directory)
+
+def main():
+    """Entry point"""
+    parser = OptionParser()
+    parser.add_option("-n", "--packages",
+                      default = 1000,
+                      type = int,
+                      help = "the number of packages per testrun")
+    parser.add_option("-r", "--testruns",
+                      default = 3,
+                      type = int,
+                      help = "the number of testruns")
+    options = parser.parse_args()[0]
+    benchmark(options.packages, options.testruns)
+
+if __name__ == "__main__":
+    main()
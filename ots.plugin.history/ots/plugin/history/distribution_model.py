@@ -23,8 +23,9 @@
 """ OTS distribution model : optimized """
 
 from ots.server.allocator.conductor_command import conductor_command
-from ots.plugin.history.models import Package, History
 from ots.plugin.history.schedule_algo import group_packages
+from ots.plugin.history.package_stats import get_device_group_stats
+from ots.plugin.history.package_stats import get_device_group, ALL_DEVICE_GROUPS
 from ots.server.distributor.task import Task
 import logging
 import string
@@ -36,39 +37,99 @@ REQUEST_OPTIONS = None
 DEFAULT_RUNTIME = 60
 DEFAULT_GROUPS = 1000
 
-def get_test_package_history(test_packages):
+def get_test_package_stats(test_packages, device_group = ALL_DEVICE_GROUPS):
     """
-    Returns dictionary of test packages and their latest execution
+    Returns dictionary of test packages and the statistics of their
+    execution times on the device group, or over all device groups
+    where the device group has too few. If there is no history, 
+    then it is none
+
+    @type test_packages: C{list}
+    @param test_packages: List of test packages
+
+    @type device_group: C{str}
+    @param device_group: The device group the packages are executed on
+
+    @rtype: C{dict}
+    @return: Dictionary of test package names and L{DurationStats}
+    """
+    return get_device_group_stats(test_packages, device_group)
+
+def _minutes(stats):
+    """
+    @type stats: L{DurationStats} or None
+    @param stats: The statistics of a test package
+
+    @rtype: C{int} or None
+    @return: The estimated execution time in minutes, at least one
+    """
+    if stats is None:
+        return None
+    return max(int(stats.estimate) / 60, 1)
+
+def get_test_package_history(test_packages, stats = None):
+    """
+    Returns dictionary of test packages and their estimated execution
     time. If time not available, then it is none
     
     @type test_packages: C{list}
     @param test_packages: List of test packages
+
+    @type stats: C{dict} or None
+    @param stats: The result of L{get_test_package_stats} if fetched already
     
     @rtype: C{dict}
     @return: Dictionary of test package names and execution times (in minute)
     
     """
-    
-    history_list = dict()
-    
+    if stats is None:
+        stats = get_test_package_stats(test_packages)
+    return dict((package, _minutes(stats[package]))
+                for package in test_packages)
+
+def get_test_package_percentiles(test_packages, percent, stats = None):
+    """
+    Returns dictionary of test packages and a percentile of their 
+    recent execution times. If there is no history, then it is none
+
+    @type test_packages: C{list}
+    @param test_packages: List of test packages
+
+    @type percent: C{float}
+    @param percent: The percentile between 0 and 100
+
+    @type stats: C{dict} or None
+    @param stats: The result of L{get_test_package_stats} if fetched already
+
+    @rtype: C{dict}
+    @return: Dictionary of test package names and execution times (in seconds)
+    """
+    if stats is None:
+        stats = get_test_package_stats(test_packages)
+    percentiles = dict()
     for package in test_packages:
-        
-        db_package = Package.objects.filter(package_name = package)
-        duration = None
-        
-        if db_package.count() > 0:
-            db_package = db_package[0]
-            history = History.objects.filter(package_id = db_package.id).\
-                        order_by("-start_time")[:1]
-            duration = history[0].duration / 60
-            
-            if duration == 0:
-                duration = 1
-        
-        history_list[package] = duration
-    
-    return history_list
-            
+        percentiles[package] = None
+        if stats[package] is not None:
+            percentiles[package] = stats[package].percentile(percent)
+    return percentiles
+
+def _expected_duration(group, percentiles):
+    """
+    @type group: C{list} of C{str}
+    @param group: The test packages of a Task
+
+    @type percentiles: C{dict} or None
+    @param percentiles: The percentiles of the execution times
+
+    @rtype: C{int} or None
+    @return: The seconds after which the Task is a straggler
+    """
+    if percentiles is None:
+        return None
+    durations = [percentiles.get(package) for package in group]
+    if None in durations:
+        return None
+    return sum(durations)
 
 def history_model(test_list, options):
     """
@@ -91,22 +152,31 @@ def history_model(test_list, options):
     
     max_runtime = int(req_options.get("target_execution_time", DEFAULT_RUNTIME))
     max_groups = int(req_options.get("max_worker_amount", DEFAULT_GROUPS))
+    # Tasks running past this percentile of their history may get a twin
+    speculation_percentile = req_options.get("speculation_percentile")
+    device_group = get_device_group(req_options.get("device"))
     
     if not test_list:
         raise ValueError("test_list not defined for distribution model")
 
     if 'device' in test_list:
         test_packages = test_list['device'].split(",")
-        test_history = get_test_package_history(test_packages)
+        stats = get_test_package_stats(test_packages, device_group)
+        test_history = get_test_package_history(test_packages, stats)
         LOG.debug(test_history)
         package_groups = group_packages(test_history, max_runtime, max_groups)
         LOG.debug(package_groups)
+        percentiles = None
+        if speculation_percentile:
+            percentiles = get_test_package_percentiles(
+                test_packages, float(speculation_percentile), stats)
         for group in package_groups:
             options['test_packages'] = string.join(group, ",")
             cmd = conductor_command(options, 
                                     host_testing = False,
                                     chroot_testing = False)
-            commands.append(Task(cmd))
+            commands.append(Task(cmd, expected_duration = 
+                                 _expected_duration(group, percentiles)))
         
         # Rest groups are for host based packages
         max_groups = max_groups - len(package_groups)
@@ -115,19 +185,25 @@ def history_model(test_list, options):
     # Lets use rest of the groups for them
     if 'host' in test_list:
         test_packages = test_list['host'].split(",")
-        test_history = get_test_package_history(test_packages)
+        stats = get_test_package_stats(test_packages, device_group)
+        test_history = get_test_package_history(test_packages, stats)
         LOG.debug(test_history)
         if max_groups <= 0:
             max_groups = 1
         LOG.debug(max_groups)
         package_groups = group_packages(test_history, max_runtime, max_groups)
         LOG.debug(package_groups)
+        percentiles = None
+        if speculation_percentile:
+            percentiles = get_test_package_percentiles(
+                test_packages, float(speculation_percentile), stats)
         for group in package_groups:
             options['test_packages'] = string.join(group, ",")
             cmd = conductor_command(options, 
                                     host_testing = True,
                                     chroot_testing = False)
-            commands.append(Task(cmd))
+            commands.append(Task(cmd, expected_duration = 
+                                 _expected_duration(group, percentiles)))
 
     return commands
     
@@ -0,0 +1,170 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Robust estimates of test package execution times from their history
+"""
+
+import math
+from collections import deque
+
+#The number of latest executions a DurationStats keeps
+HISTORY_WINDOW = 20
+#The weight of the latest execution in the moving average
+EWMA_ALPHA = 0.3
+
+def percentile(values, percent):
+    """
+    @type values: C{list} of C{int}
+    @param values: The values
+
+    @type percent: C{float}
+    @param percent: The percentile between 0 and 100
+
+    @rtype: C{int}
+    @return: The nearest rank percentile of the values
+    """
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+class DurationStats(object):
+    """
+    Execution time estimator of a test package.
+
+    Fed the durations oldest first, it keeps the latest 
+    HISTORY_WINDOW of them. The median of those is the estimate, 
+    so a single outlier run does not move the plan.
+    """
+
+    def __init__(self, window = HISTORY_WINDOW, alpha = EWMA_ALPHA):
+        """
+        @type window: C{int}
+        @param window: The number of latest durations kept
+
+        @type alpha: C{float}
+        @param alpha: The weight of the latest duration in the ewma
+        """
+        self._durations = deque(maxlen = window)
+        self._alpha = alpha
+        self.count = 0
+        self.ewma = None
+
+    @classmethod
+    def restore(cls, durations, count, ewma, window = HISTORY_WINDOW):
+        """
+        @type durations: C{list} of C{int}
+        @param durations: The latest durations, oldest first
+
+        @type count: C{int}
+        @param count: The number of durations ever added
+
+        @type ewma: C{float} or None
+        @param ewma: The moving average of the durations
+
+        @rtype: L{DurationStats}
+        @return: The estimator in the state it was saved in
+        """
+        stats = cls(window)
+        stats._durations.extend(durations)
+        stats.count = count
+        stats.ewma = ewma
+        return stats
+
+    def add(self, duration):
+        """
+        @type duration: C{int}
+        @param duration: The duration of the latest execution in seconds
+        """
+        self._durations.append(duration)
+        self.count += 1
+        if self.ewma is None:
+            self.ewma = float(duration)
+        else:
+            self.ewma += self._alpha * (duration - self.ewma)
+
+    @property
+    def durations(self):
+        """
+        @rtype: C{list} of C{int}
+        @return: The kept durations, oldest first
+        """
+        return list(self._durations)
+
+    @property
+    def median(self):
+        """
+        @rtype: C{float} or None
+        @return: The median of the kept durations
+        """
+        if not self._durations:
+            return None
+        values = sorted(self._durations)
+        middle = len(values) // 2
+        if len(values) % 2:
+            return float(values[middle])
+        return (values[middle - 1] + values[middle]) / 2.0
+
+    @property
+    def mean(self):
+        """
+        @rtype: C{float} or None
+        @return: The mean of the kept durations
+        """
+        if not self._durations:
+            return None
+        return float(sum(self._durations)) / len(self._durations)
+
+    @property
+    def variance(self):
+        """
+        @rtype: C{float} or None
+        @return: The sample variance of the kept durations
+        """
+        if not self._durations:
+            return None
+        if len(self._durations) == 1:
+            return 0.0
+        mean = self.mean
+        return sum((value - mean) ** 2 for value in self._durations) / \
+            (len(self._durations) - 1)
+
+    @property
+    def estimate(self):
+        """
+        @rtype: C{float} or None
+        @return: The expected duration of the next execution in seconds
+        """
+        return self.median
+
+    def percentile(self, percent):
+        """
+        @type percent: C{float}
+        @param percent: The percentile between 0 and 100
+
+        @rtype: C{int} or None
+        @return: The nearest rank percentile of the kept durations
+        """
+        if not self._durations:
+            return None
+        return percentile(self._durations, percent)
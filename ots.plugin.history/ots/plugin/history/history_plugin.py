@@ -31,11 +31,13 @@ Plug-in for saving test package execution times to database
 import logging
 import time
 import datetime
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 
 from ots.common.framework.api import PublisherPluginBase
 from ots.common.dto.monitor import MonitorType
 from ots.plugin.history.models import Package, History
+from ots.plugin.history.package_stats import update_packages_stats
+from ots.plugin.history.package_stats import get_device_group
 LOG = logging.getLogger(__name__)
 
 
@@ -44,7 +46,8 @@ class HistoryPlugin(PublisherPluginBase):
     Plug-in for saving test package execution times to database
     """
     
-    def __init__(self, request_id, testrun_uuid, sw_product, image, **kwargs):
+    def __init__(self, request_id, testrun_uuid, sw_product, image, 
+                 device = None, **kwargs):
         """
         Initialization
         
@@ -59,6 +62,9 @@ class HistoryPlugin(PublisherPluginBase):
 
         @type image: C{str}
         @param image: The URL of the image
+
+        @type device: C{dict}
+        @param device: Device options as dictionary
         
         @type kwargs: C{dict}
         @param kwargs: Keyword dictionary
@@ -69,6 +75,8 @@ class HistoryPlugin(PublisherPluginBase):
         self._testrun_id = testrun_uuid
         self._request_id = request_id
         self._test_packages = dict()
+        self._device_group = get_device_group(device)
+        self._workers = dict()
         
     def set_tested_packages(self, packages):
         """
@@ -91,6 +99,7 @@ class HistoryPlugin(PublisherPluginBase):
             start_time = time.time()
             
             self._test_packages[test_package] = (start_time, None)
+            self._workers[test_package] = monitors.sender or ""
             LOG.debug("Test package started %s : %d" % \
                       (test_package, start_time))
             
@@ -112,30 +121,46 @@ class HistoryPlugin(PublisherPluginBase):
         Publish the results of the Testrun
         """
         try:
-            for (test_package, data) in self._test_packages.items():
-                
-                start_time = datetime.datetime.fromtimestamp(data[0])
-                duration = data[1]
-                
-                if duration is None:
-                    continue
-                
-                db_package = Package.objects.filter(package_name = test_package)
-                
-                if db_package.count() == 0:
-                    db_package = Package(package_name = test_package)
-                    db_package.save()
-                else:
-                    db_package = db_package[0]
-                
-                history = History(package_id = db_package,
-                                  start_time = start_time,
-                                  duration = duration,
-                                  testrun_id = self._testrun_id,
-                                  verdict = 0)
-                history.save()
-            
+            executions = self._save_history()
             LOG.info("history data saved")                    
                 
         except (TypeError, AttributeError, IntegrityError), error:
             LOG.error("History object creation failed: %s" % error)
+            return
+
+        # The History is committed, a conflict here cannot lose it
+        if update_packages_stats(executions, self._device_group):
+            LOG.info("package statistics updated")
+
+    @transaction.commit_on_success
+    def _save_history(self):
+        """
+        Saves the History in one transaction
+
+        @rtype: C{list} of C{tuple}
+        @return: The (L{Package}, duration, start time) of the executions
+        """
+        executions = [(test_package, start_time, duration) 
+                      for (test_package, (start_time, duration)) 
+                      in self._test_packages.items()
+                      if duration is not None]
+        executions.sort(key = lambda execution: execution[1])
+        packages = Package.objects.get_or_create_many(
+            [execution[0] for execution in executions])
+
+        histories = []
+        stats = []
+        for (test_package, start_time, duration) in executions:
+            start_time = datetime.datetime.fromtimestamp(start_time)
+            db_package = packages[test_package]
+            histories.append(History(package_id = db_package,
+                                     start_time = start_time,
+                                     duration = duration,
+                                     testrun_id = self._testrun_id,
+                                     verdict = 0,
+                                     device_group = self._device_group,
+                                     worker = self._workers[test_package]))
+            stats.append((db_package, int(duration), start_time))
+
+        History.objects.insert_many(histories)
+        return stats
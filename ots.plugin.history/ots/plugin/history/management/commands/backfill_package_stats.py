@@ -0,0 +1,46 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Rebuilds the package statistics from the existing History
+
+usage: django-admin backfill_package_stats
+"""
+
+from django.core.management.base import NoArgsCommand
+
+from ots.plugin.history.package_stats import backfill_package_stats
+
+class Command(NoArgsCommand):
+    """
+    The backfill_package_stats command
+    """
+
+    help = "Rebuilds the package statistics from the existing History"
+
+    def handle_noargs(self, **options):
+        """
+        @type options: C{dict}
+        @param options: The command line options
+        """
+        count = backfill_package_stats()
+        return "%d package statistics saved\n" % count
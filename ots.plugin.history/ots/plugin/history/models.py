@@ -24,7 +24,193 @@
 Django models file for package data
 """
 
-from django.db import models
+from django.db import models, connection, transaction
+
+from ots.plugin.history.duration_stats import DurationStats
+
+# Values per IN clause, below the bound parameter limit of sqlite
+QUERY_CHUNK_SIZE = 500
+
+def _fields(model):
+    """
+    @type model: C{class}
+    @param model: A model
+
+    @rtype: C{list}
+    @return: The fields of the model saved by value
+    """
+    return [field for field in model._meta.local_fields
+            if not isinstance(field, models.AutoField)]
+
+def _values(fields, obj, add):
+    """
+    @type fields: C{list}
+    @param fields: The fields of the model
+
+    @type obj: L{models.Model}
+    @param obj: The model instance
+
+    @type add: C{bool}
+    @param add: Whether the instance is inserted
+
+    @rtype: C{list}
+    @return: The values of the fields prepared for saving
+    """
+    return [field.get_db_prep_save(field.pre_save(obj, add), 
+                                   connection = connection)
+            for field in fields]
+
+def _insert_many(model, objects):
+    """
+    Inserts the objects with one statement in the transaction 
+    of the caller. The objects do not get their ids.
+
+    @type model: C{class}
+    @param model: The model of the objects
+
+    @type objects: C{list}
+    @param objects: The model instances to insert
+    """
+    if not objects:
+        return
+    fields = _fields(model)
+    quote_name = connection.ops.quote_name
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % \
+        (quote_name(model._meta.db_table),
+         ", ".join([quote_name(field.column) for field in fields]),
+         ", ".join(["%s"] * len(fields)))
+    rows = [_values(fields, obj, True) for obj in objects]
+    connection.cursor().executemany(sql, rows)
+    transaction.set_dirty()
+
+def _update_many(model, objects, guard = None):
+    """
+    Updates the saved objects with one statement in the transaction 
+    of the caller
+
+    @type model: C{class}
+    @param model: The model of the objects
+
+    @type objects: C{list}
+    @param objects: The model instances to update
+
+    @type guard: C{tuple} or None
+    @param guard: The name of a field and the values, one per object,
+                  a row must still have to be updated
+
+    @rtype: C{int}
+    @return: The number of rows updated
+    """
+    if not objects:
+        return 0
+    fields = _fields(model)
+    quote_name = connection.ops.quote_name
+    sql = "UPDATE %s SET %s WHERE %s = %%s" % \
+        (quote_name(model._meta.db_table),
+         ", ".join(["%s = %%s" % quote_name(field.column) 
+                    for field in fields]),
+         quote_name(model._meta.pk.column))
+    rows = [_values(fields, obj, False) + [obj.pk] for obj in objects]
+    if guard is not None:
+        name, values = guard
+        sql += " AND %s = %%s" % \
+            quote_name(model._meta.get_field(name).column)
+        rows = [row + [value] for row, value in zip(rows, values)]
+    cursor = connection.cursor()
+    cursor.executemany(sql, rows)
+    transaction.set_dirty()
+    return cursor.rowcount
+
+
+class StaleStatsError(Exception):
+    """
+    The statistics were changed by another writer after they were read
+    """
+    pass
+
+
+class PackageManager(models.Manager):
+    """Extra manager for Package model"""
+
+    def get_or_create_many(self, package_names):
+        """
+        Looks up the packages in bulk and inserts the missing ones
+
+        @type package_names: C{list} of C{str}
+        @param package_names: The names of the test packages
+
+        @rtype: C{dict}
+        @return: Dictionary of test package names and L{Package}
+        """
+        packages = self._get_many(package_names)
+        missing = [name for name in set(package_names) 
+                   if name not in packages]
+        if missing:
+            _insert_many(self.model, 
+                         [self.model(package_name = name) 
+                          for name in missing])
+            packages.update(self._get_many(missing))
+        return packages
+
+    def _get_many(self, package_names):
+        """
+        @type package_names: C{list} of C{str}
+        @param package_names: The names of the test packages
+
+        @rtype: C{dict}
+        @return: Dictionary of the names found and the oldest L{Package}
+        """
+        packages = dict()
+        package_names = list(set(package_names))
+        for i in xrange(0, len(package_names), QUERY_CHUNK_SIZE):
+            for package in self.get_query_set().filter(
+                package_name__in = 
+                    package_names[i:i + QUERY_CHUNK_SIZE]).order_by("-id"):
+                packages[package.package_name] = package
+        return packages
+
+
+class HistoryManager(models.Manager):
+    """Extra manager for History model"""
+
+    def insert_many(self, histories):
+        """
+        Inserts the History with one statement in the transaction 
+        of the caller
+
+        @type histories: C{list} of L{History}
+        @param histories: The History to insert
+        """
+        _insert_many(self.model, histories)
+
+
+class PackageStatsManager(models.Manager):
+    """Extra manager for PackageStats model"""
+
+    def save_many(self, stats, read_counts = None):
+        """
+        Inserts the new and updates the saved statistics with a statement
+        each in the transaction of the caller. A new statistics saved by
+        another writer meanwhile raises an IntegrityError.
+
+        @type stats: C{list} of L{PackageStats}
+        @param stats: The statistics to save
+
+        @type read_counts: C{dict} or None
+        @param read_counts: The counts of the saved statistics, by id,
+                            when they were read
+
+        @raise StaleStatsError: If another writer updated saved statistics
+                                since they were read
+        """
+        _insert_many(self.model, [obj for obj in stats if obj.pk is None])
+        saved = [obj for obj in stats if obj.pk is not None]
+        guard = None
+        if read_counts is not None:
+            guard = ("count", [read_counts[obj.pk] for obj in saved])
+        if _update_many(self.model, saved, guard) < len(saved):
+            raise StaleStatsError("Statistics changed since read")
+
 
 class Package(models.Model):
     """
@@ -32,6 +218,8 @@ class Package(models.Model):
     """
 
     package_name = models.CharField(db_index=True, max_length=255)
+
+    objects = PackageManager()
  
     class Meta:
         """
@@ -57,9 +245,89 @@ class History(models.Model):
     duration = models.PositiveIntegerField()
     testrun_id = models.CharField(max_length=32)
     verdict = models.CharField(max_length=2, choices=VERDICT_CHOICES)
+    device_group = models.CharField(max_length=255, blank=True, default="")
+    # The host name of the worker
+    worker = models.CharField(max_length=255, blank=True, default="")
+
+    objects = HistoryManager()
  
     class Meta:
         """
         Meta class for model
         """
-        db_table = 'distribution_history'
\ No newline at end of file
+        db_table = 'distribution_history'
+
+
+def restore_duration_stats(recent, count, ewma):
+    """
+    @type recent: C{str}
+    @param recent: The latest durations, comma separated
+
+    @type count: C{int}
+    @param count: The number of durations
+
+    @type ewma: C{float} or None
+    @param ewma: The moving average of the durations
+
+    @rtype: L{DurationStats}
+    @return: The estimator for the saved statistics
+    """
+    durations = [int(value) for value in recent.split(",") if value]
+    return DurationStats.restore(durations, count, ewma)
+
+
+class PackageStats(models.Model):
+    """
+    Model for the execution time statistics of a test package 
+    on a device group, updated as History is added
+    """
+
+    package_id = models.ForeignKey(Package)
+    # Empty for the statistics over all device groups
+    device_group = models.CharField(max_length=255, blank=True, default="")
+    count = models.PositiveIntegerField(default=0)
+    # In seconds, as are the rest
+    mean = models.FloatField(default=0)
+    ewma = models.FloatField(null=True)
+    p50 = models.FloatField(null=True)
+    p90 = models.FloatField(null=True)
+    last_seen = models.DateTimeField(null=True)
+    # The latest durations, comma separated, oldest first
+    recent = models.TextField(blank=True, default="")
+
+    objects = PackageStatsManager()
+
+    class Meta:
+        """
+        Meta class for model
+        """
+        db_table = 'distribution_package_stats'
+        unique_together = (('package_id', 'device_group'),)
+
+    def duration_stats(self):
+        """
+        @rtype: L{DurationStats}
+        @return: The estimator for the package
+        """
+        return restore_duration_stats(self.recent, self.count, self.ewma)
+
+    def add(self, duration, start_time):
+        """
+        Updates the statistics, does not save them
+
+        @type duration: C{int}
+        @param duration: The duration of the execution in seconds
+
+        @type start_time: C{datetime.datetime}
+        @param start_time: The start time of the execution
+        """
+        stats = self.duration_stats()
+        stats.add(duration)
+        self.count = stats.count
+        self.mean += (duration - self.mean) / float(self.count)
+        self.ewma = stats.ewma
+        self.p50 = stats.median
+        self.p90 = stats.percentile(90)
+        if self.last_seen is None or start_time > self.last_seen:
+            self.last_seen = start_time
+        self.recent = ",".join([str(value) for value in stats.durations])
@@ -0,0 +1,228 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Execution time statistics of test packages, kept up to date 
+as History is added so estimates need not scan the History
+"""
+
+import logging
+
+from django.db import transaction, IntegrityError
+
+from ots.plugin.history.models import History, PackageStats, StaleStatsError
+from ots.plugin.history.models import restore_duration_stats
+from ots.plugin.history.models import QUERY_CHUNK_SIZE
+
+# The device group of the statistics over all device groups
+ALL_DEVICE_GROUPS = ""
+# Executions on a device group needed before its statistics are used
+MIN_DEVICE_GROUP_SAMPLES = 3
+# Times the statistics are read and saved when other Hubs race for them
+MAX_UPDATE_ATTEMPTS = 3
+
+LOG = logging.getLogger(__name__)
+
+def get_device_group(device):
+    """
+    @type device: C{dict} or None
+    @param device: Device options as dictionary
+
+    @rtype: C{str}
+    @return: The device group of the device options
+    """
+    if device and not isinstance(device, basestring):
+        return device.get('devicegroup', ALL_DEVICE_GROUPS)
+    return ALL_DEVICE_GROUPS
+
+def _device_groups(device_group):
+    """
+    @type device_group: C{str}
+    @param device_group: The device group of an execution
+
+    @rtype: C{list} of C{str}
+    @return: The device groups whose statistics the execution updates
+    """
+    if device_group == ALL_DEVICE_GROUPS:
+        return [ALL_DEVICE_GROUPS]
+    return [device_group, ALL_DEVICE_GROUPS]
+
+def update_package_stats(db_package, duration, start_time, 
+                         device_group = ALL_DEVICE_GROUPS):
+    """
+    Adds an execution to the statistics of the package. 
+
+    @type db_package: L{Package}
+    @param db_package: The test package
+
+    @type duration: C{int}
+    @param duration: The duration of the execution in seconds
+
+    @type start_time: C{datetime.datetime}
+    @param start_time: The start time of the execution
+
+    @type device_group: C{str}
+    @param device_group: The device group the package was executed on
+
+    @rtype: C{bool}
+    @return: Whether the statistics were saved
+    """
+    return update_packages_stats([(db_package, duration, start_time)], 
+                                 device_group)
+
+def update_packages_stats(executions, device_group = ALL_DEVICE_GROUPS):
+    """
+    Adds executions to the statistics of their packages in a 
+    transaction of its own. When another Hub updates the same 
+    statistics meanwhile, they are read again and the update retried.
+
+    @type executions: C{list} of C{tuple}
+    @param executions: The (L{Package}, duration, start time) 
+                       of the executions, oldest first
+
+    @type device_group: C{str}
+    @param device_group: The device group the packages were executed on
+
+    @rtype: C{bool}
+    @return: Whether the statistics were saved
+    """
+    for attempt in xrange(MAX_UPDATE_ATTEMPTS):
+        try:
+            _save_packages_stats(executions, device_group)
+            return True
+        except (IntegrityError, StaleStatsError), error:
+            LOG.warning("Package statistics update conflicted: %s" % error)
+    LOG.error("Package statistics not updated after %d attempts" % 
+              MAX_UPDATE_ATTEMPTS)
+    return False
+
+@transaction.commit_on_success
+def _save_packages_stats(executions, device_group):
+    """
+    Reads the statistics of the packages, adds the executions and
+    saves them, guarded against changes since the read.
+
+    @type executions: C{list} of C{tuple}
+    @param executions: The (L{Package}, duration, start time) 
+                       of the executions, oldest first
+
+    @type device_group: C{str}
+    @param device_group: The device group the packages were executed on
+    """
+    groups = _device_groups(device_group)
+    package_ids = list(set([execution[0].id for execution in executions]))
+    summaries = dict()
+    for i in xrange(0, len(package_ids), QUERY_CHUNK_SIZE):
+        for stats in PackageStats.objects.filter(
+            package_id__in = package_ids[i:i + QUERY_CHUNK_SIZE],
+            device_group__in = groups):
+            summaries[(stats.package_id_id, stats.device_group)] = stats
+    read_counts = dict((stats.pk, stats.count) 
+                       for stats in summaries.values())
+    for db_package, duration, start_time in executions:
+        for group in groups:
+            key = (db_package.id, group)
+            if key not in summaries:
+                summaries[key] = PackageStats(package_id = db_package,
+                                              device_group = group)
+            summaries[key].add(duration, start_time)
+    PackageStats.objects.save_many(summaries.values(), read_counts)
+
+def get_package_stats(test_packages, device_group = ALL_DEVICE_GROUPS):
+    """
+    Returns dictionary of test packages and the statistics of their
+    execution times. If there is no history, then it is none
+
+    @type test_packages: C{list}
+    @param test_packages: List of test packages
+
+    @type device_group: C{str}
+    @param device_group: The device group of the statistics
+
+    @rtype: C{dict}
+    @return: Dictionary of test package names and L{DurationStats}
+    """
+    stats = dict.fromkeys(test_packages)
+    test_packages = list(set(test_packages))
+    # Keeps the IN clause below the bound parameter limit of sqlite
+    for i in xrange(0, len(test_packages), QUERY_CHUNK_SIZE):
+        rows = PackageStats.objects.filter(
+            package_id__package_name__in = 
+                test_packages[i:i + QUERY_CHUNK_SIZE],
+            device_group = device_group).values_list(
+            "package_id__package_name", "recent", "count", "ewma")
+        for package, recent, count, ewma in rows.iterator():
+            stats[package] = restore_duration_stats(recent, count, ewma)
+    return stats
+
+def get_device_group_stats(test_packages, device_group,
+                           min_samples = MIN_DEVICE_GROUP_SAMPLES):
+    """
+    Returns dictionary of test packages and the statistics of their
+    execution times on the device group. Packages with less than 
+    min_samples executions on it get the statistics over all device 
+    groups. If there is no history, then it is none
+
+    @type test_packages: C{list}
+    @param test_packages: List of test packages
+
+    @type device_group: C{str}
+    @param device_group: The device group of the statistics
+
+    @type min_samples: C{int}
+    @param min_samples: The executions needed on the device group
+
+    @rtype: C{dict}
+    @return: Dictionary of test package names and L{DurationStats}
+    """
+    stats = get_package_stats(test_packages)
+    if device_group == ALL_DEVICE_GROUPS:
+        return stats
+    known = [package for package in test_packages 
+             if stats[package] is not None]
+    for package, group_stats in get_package_stats(known, 
+                                                  device_group).items():
+        if group_stats is not None and group_stats.count >= min_samples:
+            stats[package] = group_stats
+    return stats
+
+@transaction.commit_on_success
+def backfill_package_stats():
+    """
+    Rebuilds the statistics of all test packages from the History
+
+    @rtype: C{int}
+    @return: The number of statistics saved
+    """
+    summaries = dict()
+    rows = History.objects.order_by("start_time", "id").values_list(
+        "package_id", "duration", "start_time", "device_group")
+    for package_id, duration, start_time, group in rows.iterator():
+        for group in _device_groups(group):
+            key = (package_id, group)
+            if key not in summaries:
+                summaries[key] = PackageStats(package_id_id = package_id,
+                                              device_group = group)
+            summaries[key].add(duration, start_time)
+    PackageStats.objects.all().delete()
+    PackageStats.objects.save_many(summaries.values())
+    return len(summaries)
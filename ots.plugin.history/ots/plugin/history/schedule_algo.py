@@ -20,8 +20,12 @@
 # 02110-1301 USA
 # ***** END LICENCE BLOCK *****
 
+
 """ Schedule algorithm """
 
+import heapq
+from bisect import bisect_left, insort
+
 def group_packages(packages, max_runtime=60, max_groups=1000):
     """
     @type packages: C{dict} of C{str} : C{int}
@@ -40,75 +44,71 @@ def group_packages(packages, max_runtime=60, max_groups=1000):
               total estimated runtime of a group should be below max_runtime
     """
     sorted_tasks, unknown_tasks = _sort_tasks(packages)
-    tgroups = []
 
-    # cmp will return 0 if there was no unknown tasks, 1 otherwise
-    while sorted_tasks and (len(tgroups) < 
-                            max_groups - cmp(unknown_tasks, [])):
-        tgroups.append( _create_group(sorted_tasks, max_runtime) )
+    # one group is kept for the tasks without an estimate
+    available_groups = max_groups - cmp(unknown_tasks, [])
+    if available_groups < 1:
+        return [[t[0] for t in sorted_tasks] + unknown_tasks]
 
+    tgroups = None
+    if sum(t[1] for t in sorted_tasks) <= max_runtime * available_groups:
+        tgroups = _pack_groups(sorted_tasks, max_runtime, available_groups)
     # if not all tasks fit under runtime group limit
-    i = 0
-    while sorted_tasks:
-        next_task = (i + 1) % len(tgroups)
-        # find a group which runtime is shorter than next groups runtime
-        while _group_runtime(tgroups[i]) <= _group_runtime(tgroups[next_task]) and \
-                sorted_tasks:
-            tgroups[i].append(sorted_tasks.pop())
-        i = next_task
-
-    # flatten groups
-    groups = [[t[0] for t in g] for g in tgroups]
+    if tgroups is None:
+        tgroups = _balance_groups(sorted_tasks, available_groups)
 
+    groups = [g for g in tgroups if g]
     if unknown_tasks:
         groups.append(unknown_tasks)
     return groups
-    
-
-def _group_runtime(group):
-    """
-    Total runtime for group
-    """
-    return sum(t[1] for t in group)
 
 
-def _find_task(sorted_tasks, max_time):
+def _pack_groups(sorted_tasks, max_runtime, max_groups):
     """
-    Find task
+    Best fit decreasing: each task goes to the group with the least room
+    left that still fits it. A task longer than max_runtime gets a group
+    of its own.
+
+    Returns None if more than max_groups groups are needed
     """
-    matching_tasks = filter(lambda t: t[1] <= max_time, sorted_tasks)
-    if matching_tasks:
-        # filter() on sorted list returns sorted
-        task = matching_tasks[-1]
-        sorted_tasks.remove(task)
-        return task
-    else:
-        return None
+    groups = []
+    # (room left, group index) of the groups, ordered by room
+    rooms = []
+    for name, runtime in sorted_tasks:
+        i = bisect_left(rooms, (runtime, -1))
+        if i < len(rooms):
+            room, index = rooms.pop(i)
+            groups[index].append(name)
+            insort(rooms, (room - runtime, index))
+        elif len(groups) < max_groups:
+            insort(rooms, (max_runtime - runtime, len(groups)))
+            groups.append([name])
+        else:
+            return None
+    return groups
 
 
-def _create_group(sorted_tasks, max_runtime):
+def _balance_groups(sorted_tasks, max_groups):
     """
-    Creates a group of tasks adding longest possible tasks one by one
-    Group exceeds max_runtime only if it had single long task
+    Longest processing time first: each task goes to the group with 
+    the shortest runtime so far. The longest group is within 4/3 of 
+    the optimum.
     """
-    task = sorted_tasks.pop()
-    group = [task]
-    runtime = _group_runtime(group)
-    while runtime < max_runtime:
-        task = _find_task(sorted_tasks, max_runtime-runtime)
-        if task:
-            group.append(task)
-            runtime = _group_runtime(group)
-        else:
-            break
-    return group
+    groups = [[] for i in xrange(min(max_groups, len(sorted_tasks)))]
+    # (runtime, group index) of the groups
+    runtimes = [(0, i) for i in xrange(len(groups))]
+    for name, runtime in sorted_tasks:
+        total, index = runtimes[0]
+        groups[index].append(name)
+        heapq.heapreplace(runtimes, (total + runtime, index))
+    return groups
 
 
 def _sort_tasks(tasks):
     """
-    Sort tasks
+    Sort tasks, longest first
     """
     estimated = [(t, tasks[t]) for t in tasks if tasks[t] != None]
-    not_estimated = [t for t in tasks if tasks[t] == None]
-    estimated.sort(lambda t1, t2: cmp(t1[1], t2[1]))
+    not_estimated = sorted(t for t in tasks if tasks[t] == None)
+    estimated.sort(key = lambda t: (-t[1], t[0]))
     return estimated, not_estimated
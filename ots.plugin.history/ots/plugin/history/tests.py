@@ -25,10 +25,21 @@ import logging
 import uuid
 import time
 import random
+import datetime
 
-from ots.plugin.history.models import Package, History
+from ots.plugin.history.models import Package, History, PackageStats
+from ots.plugin.history.models import StaleStatsError
 from ots.plugin.history.history_plugin import HistoryPlugin
 from ots.plugin.history.distribution_model import get_test_package_history, history_model, get_model
+from ots.plugin.history.distribution_model import get_test_package_percentiles
+from ots.plugin.history.distribution_model import get_test_package_stats
+from ots.plugin.history.duration_stats import DurationStats
+from ots.plugin.history import package_stats
+from ots.plugin.history.package_stats import get_package_stats
+from ots.plugin.history.package_stats import update_package_stats
+from ots.plugin.history.package_stats import get_device_group_stats
+from ots.plugin.history.management.commands.backfill_package_stats \
+    import Command as BackfillCommand
 from ots.plugin.history.schedule_algo import group_packages
 from ots.common.dto.monitor import Monitor, MonitorType
 
@@ -46,6 +57,14 @@ def _create_test_data():
                           testrun_id = uuid.uuid4().hex,
                           verdict = random.randint(0,4))
         history.save()
+    package_stats.backfill_package_stats()
+
+def _add_history(db_pack, duration, device_group = ""):
+    history = History(package_id = db_pack, duration = duration, 
+                      testrun_id = uuid.uuid4().hex, verdict = 0,
+                      device_group = device_group)
+    history.save()
+    update_package_stats(db_pack, duration, history.start_time, device_group)
 
 
 class TestHistoryPublisherPlugin(unittest.TestCase):
@@ -87,6 +106,10 @@ class TestHistoryPublisherPlugin(unittest.TestCase):
         self.assertTrue(db_package.count() == 1)
         self.assertTrue(history.count() == 1)
         self.assertTrue(history[0].duration >= 1)
+        stats = PackageStats.objects.get(package_id = db_package[0],
+                                         device_group = "")
+        self.assertEquals(1, stats.count)
+        self.assertTrue(stats.p50 >= 1)
     
     def testAddToOld(self):
         
@@ -124,6 +147,81 @@ class TestHistoryPublisherPlugin(unittest.TestCase):
         
         self.assertTrue(db_package.count() == 0)
 
+    def testManyPackages(self):
+
+        plugin = HistoryPlugin("0001", "0001", "example_product", "no image")
+        packages = ["test-package%d-tests" % i for i in range(10)]
+        for event_type in [MonitorType.TEST_PACKAGE_STARTED,
+                           MonitorType.TEST_PACKAGE_ENDED]:
+            for package in packages:
+                plugin.add_monitor_event(Monitor(event_type = event_type,
+                                                 sender = "ots-worker1",
+                                                 description = package))
+        plugin.publish()
+
+        self.assertEquals(10, Package.objects.count())
+        self.assertEquals(NUM_OF_TESTPACKAGES + 10, History.objects.count())
+        self.assertEquals(10, History.objects.filter(
+                testrun_id = "0001", worker = "ots-worker1").count())
+        stats = get_package_stats(packages)
+        self.assertEquals([2] * NUM_OF_TESTPACKAGES + 
+                          [1] * (10 - NUM_OF_TESTPACKAGES),
+                          [stats[package].count for package in packages])
+
+    def testStatsConflictKeepsHistory(self):
+
+        plugin = HistoryPlugin("0001", "0001", "example_product", "no image")
+        for event_type in [MonitorType.TEST_PACKAGE_STARTED,
+                           MonitorType.TEST_PACKAGE_ENDED]:
+            plugin.add_monitor_event(Monitor(event_type = event_type,
+                                             sender = "ots-worker1",
+                                             description = 
+                                             "test-package1-tests"))
+        manager = PackageStats.objects
+        def conflicting_save_many(stats, read_counts = None):
+            raise StaleStatsError("conflict")
+        manager.save_many = conflicting_save_many
+        try:
+            plugin.publish()
+        finally:
+            del manager.save_many
+
+        self.assertEquals(1, History.objects.filter(testrun_id = "0001").count())
+        stats = get_package_stats(["test-package1-tests"])
+        self.assertEquals(1, stats["test-package1-tests"].count)
+
+    def testGetOrCreateMany(self):
+
+        oldest = Package.objects.get(package_name = "test-package1-tests")
+        Package(package_name = "test-package1-tests").save()
+        packages = Package.objects.get_or_create_many(
+            ["test-package1-tests", "test-new-tests", "test-new-tests"])
+        self.assertEquals(oldest.id, packages["test-package1-tests"].id)
+        self.assertEquals(1, Package.objects.filter(
+                package_name = "test-new-tests").count())
+        self.assertEquals(packages["test-new-tests"],
+                          Package.objects.get(package_name = "test-new-tests"))
+
+    def testDeviceGroupStats(self):
+
+        plugin = HistoryPlugin("0001", "0001", "example_product", "no image",
+                               device = {"devicegroup" : "fast"})
+        for event_type in [MonitorType.TEST_PACKAGE_STARTED,
+                           MonitorType.TEST_PACKAGE_ENDED]:
+            plugin.add_monitor_event(Monitor(event_type = event_type,
+                                             sender = "ots-worker1",
+                                             description = 
+                                             "test-package1-tests"))
+        plugin.publish()
+
+        stats = get_package_stats(["test-package1-tests"], "fast")
+        self.assertEquals(1, stats["test-package1-tests"].count)
+        stats = get_package_stats(["test-package1-tests"])
+        self.assertEquals(2, stats["test-package1-tests"].count)
+        history = History.objects.latest("id")
+        self.assertEquals("fast", history.device_group)
+        self.assertEquals("ots-worker1", history.worker)
+
 
 class TestDistributionModel(unittest.TestCase):
     """
@@ -254,6 +352,242 @@ class TestDistributionModel(unittest.TestCase):
         
         self.assertTrue(len(cmds) == 3)
 
+    def testPackagePercentiles(self):
+        
+        db_pack = Package.objects.get(package_name = "test-package1-tests")
+        for duration in [60, 120, 180]:
+            _add_history(db_pack, duration)
+
+        percentiles = get_test_package_percentiles(["test-package1-tests",
+                                                    "test-package2-tests",
+                                                    "unknown-tests"], 50)
+        self.assertEquals(120, percentiles["test-package1-tests"])
+        self.assertEquals(7200, percentiles["test-package2-tests"])
+        self.assertEquals(None, percentiles["unknown-tests"])
+
+    def testPackageStats(self):
+
+        db_pack = Package.objects.get(package_name = "test-package1-tests")
+        for duration in [3500, 3700, 36000]:
+            _add_history(db_pack, duration)
+
+        packages = ["test-package%d-tests" % i 
+                    for i in range(NUM_OF_TESTPACKAGES)]
+        stats = get_test_package_stats(packages + ["unknown-tests"])
+        self.assertEquals(4, stats["test-package1-tests"].count)
+        self.assertEquals(1, stats["test-package2-tests"].count)
+        self.assertEquals(None, stats["unknown-tests"])
+        #The outlier run does not move the estimate
+        history = get_test_package_history(["test-package1-tests"])
+        self.assertEquals(60, history["test-package1-tests"])
+
+    def testPackageStatsChunked(self):
+
+        chunk_size = package_stats.QUERY_CHUNK_SIZE
+        package_stats.QUERY_CHUNK_SIZE = 2
+        try:
+            packages = ["test-package%d-tests" % i 
+                        for i in range(NUM_OF_TESTPACKAGES)]
+            history = get_test_package_history(packages)
+        finally:
+            package_stats.QUERY_CHUNK_SIZE = chunk_size
+        self.assertEquals([1, 60, 120, 180, 240], 
+                          [history[package] for package in packages])
+
+    def testDistributionModelSpeculation(self):
+        
+        options = self._default_options()
+        
+        test_list = dict()
+        test_list["device"] = "test-package1-tests,test-package2-tests"
+        
+        schedule_options = dict()
+        schedule_options["target_execution_time"] = 1000
+        schedule_options["max_worker_amount"] = 1
+        
+        cmds = get_model(schedule_options)(test_list, options)
+        self.assertEquals(None, cmds[0].expected_duration)
+
+        schedule_options["speculation_percentile"] = "90"
+        cmds = get_model(schedule_options)(test_list, options)
+        self.assertEquals(3 * 60 * 60, cmds[0].expected_duration)
+
+    def testDistributionModelDeviceGroup(self):
+
+        options = self._default_options()
+        db_pack = Package.objects.get(package_name = "test-package1-tests")
+        for duration in [1, 1, 1]:
+            _add_history(db_pack, duration, "fast")
+
+        test_list = dict()
+        test_list["device"] = "test-package1-tests,test-package2-tests"
+
+        schedule_options = dict()
+        schedule_options["target_execution_time"] = 1000
+        schedule_options["max_worker_amount"] = 1
+        schedule_options["speculation_percentile"] = "90"
+        schedule_options["device"] = {"devicegroup" : "fast"}
+
+        cmds = get_model(schedule_options)(test_list, options)
+        self.assertEquals(1 + 2 * 60 * 60, cmds[0].expected_duration)
+
+class TestPackageStats(unittest.TestCase):
+    """
+    Unit tests for the package statistics
+    """
+
+    def setUp(self):
+        self.db_pack = Package(package_name = "test-package-tests")
+        self.db_pack.save()
+
+    def tearDown(self):
+        Package.objects.all().delete()
+        History.objects.all().delete()
+
+    def testIncremental(self):
+        for duration in [60, 90, 6000, 30]:
+            _add_history(self.db_pack, duration, "fast")
+        stats = PackageStats.objects.get(package_id = self.db_pack, 
+                                         device_group = "fast")
+        self.assertEquals(4, stats.count)
+        self.assertEquals(1545, stats.mean)
+        self.assertEquals(75, stats.p50)
+        self.assertEquals(6000, stats.p90)
+        self.assertEquals("60,90,6000,30", stats.recent)
+        self.assertEquals(History.objects.latest("id").start_time, 
+                          stats.last_seen)
+        self.assertEquals(2, PackageStats.objects.count())
+
+    def testBackfill(self):
+        for duration in [60, 90, 6000, 30]:
+            _add_history(self.db_pack, duration)
+        expected = PackageStats.objects.get(package_id = self.db_pack)
+        PackageStats.objects.all().delete()
+
+        self.assertEquals("1 package statistics saved\n",
+                          BackfillCommand().handle_noargs())
+        stats = PackageStats.objects.get(package_id = self.db_pack)
+        for field in ["count", "mean", "ewma", "p50", "p90", 
+                      "last_seen", "recent"]:
+            self.assertEquals(getattr(expected, field), 
+                              getattr(stats, field))
+
+    def testBackfillDeviceGroups(self):
+        _add_history(self.db_pack, 60, "fast")
+        _add_history(self.db_pack, 120, "slow")
+        PackageStats.objects.all().delete()
+
+        self.assertEquals(3, package_stats.backfill_package_stats())
+        for group, count in [("fast", 1), ("slow", 1), ("", 2)]:
+            stats = PackageStats.objects.get(package_id = self.db_pack,
+                                             device_group = group)
+            self.assertEquals(count, stats.count)
+
+    def testDeviceGroupFallback(self):
+        for duration in [600, 600, 600]:
+            _add_history(self.db_pack, duration, "slow")
+        for duration in [60, 60]:
+            _add_history(self.db_pack, duration, "fast")
+        packages = ["test-package-tests", "unknown-tests"]
+
+        stats = get_device_group_stats(packages, "fast")
+        self.assertEquals(5, stats["test-package-tests"].count)
+        self.assertEquals(None, stats["unknown-tests"])
+
+        _add_history(self.db_pack, 60, "fast")
+        stats = get_device_group_stats(packages, "fast")
+        self.assertEquals(3, stats["test-package-tests"].count)
+        self.assertEquals(60, stats["test-package-tests"].estimate)
+        stats = get_device_group_stats(packages, "slow")
+        self.assertEquals(600, stats["test-package-tests"].estimate)
+
+    def _race(self, duration):
+        """
+        Makes another writer add the duration right before the next 
+        statistics are saved
+        """
+        manager = PackageStats.objects
+        save_many = manager.save_many
+        def racing_save_many(stats, read_counts = None):
+            del manager.save_many
+            update_package_stats(self.db_pack, duration, 
+                                 datetime.datetime.now())
+            save_many(stats, read_counts)
+        manager.save_many = racing_save_many
+
+    def testStaleUpdate(self):
+        _add_history(self.db_pack, 60)
+        self._race(120)
+        self.assertTrue(update_package_stats(self.db_pack, 90, 
+                                             datetime.datetime.now()))
+        stats = PackageStats.objects.get(package_id = self.db_pack)
+        self.assertEquals(3, stats.count)
+        self.assertEquals("60,120,90", stats.recent)
+
+    def testConcurrentInsert(self):
+        self._race(120)
+        self.assertTrue(update_package_stats(self.db_pack, 90, 
+                                             datetime.datetime.now()))
+        stats = PackageStats.objects.get(package_id = self.db_pack)
+        self.assertEquals(2, stats.count)
+        self.assertEquals("120,90", stats.recent)
+
+    def testStaleSaveMany(self):
+        _add_history(self.db_pack, 60)
+        stats = PackageStats.objects.get(package_id = self.db_pack)
+        stats.add(90, datetime.datetime.now())
+        self.assertRaises(StaleStatsError, PackageStats.objects.save_many,
+                          [stats], {stats.pk : 0})
+        PackageStats.objects.save_many([stats], {stats.pk : 1})
+        self.assertEquals(2, PackageStats.objects.get(pk = stats.pk).count)
+
+    def testRestore(self):
+        for duration in [60, 90, 6000, 30]:
+            _add_history(self.db_pack, duration)
+        stats = get_package_stats(["test-package-tests"])
+        restored = stats["test-package-tests"]
+        self.assertEquals(4, restored.count)
+        self.assertEquals([60, 90, 6000, 30], restored.durations)
+        self.assertEquals(75, restored.estimate)
+
+class TestDurationStats(unittest.TestCase):
+    """
+    Unit tests for the execution time estimator
+    """
+
+    def _stats(self, durations, window = 20):
+        stats = DurationStats(window)
+        for duration in durations:
+            stats.add(duration)
+        return stats
+
+    def testEmpty(self):
+        stats = DurationStats()
+        self.assertEquals(0, stats.count)
+        self.assertEquals(None, stats.estimate)
+        self.assertEquals(None, stats.ewma)
+        self.assertEquals(None, stats.variance)
+        self.assertEquals(None, stats.percentile(50))
+
+    def testStatistics(self):
+        stats = self._stats([10, 20, 30, 40])
+        self.assertEquals(4, stats.count)
+        self.assertEquals(25, stats.median)
+        self.assertEquals(25, stats.mean)
+        self.assertAlmostEquals(500 / 3.0, stats.variance)
+        self.assertEquals(20, stats.percentile(50))
+        self.assertAlmostEquals(24.67, stats.ewma)
+
+    def testOutlier(self):
+        stats = self._stats([60, 62, 58, 6000, 61])
+        self.assertEquals(61, stats.estimate)
+
+    def testWindow(self):
+        stats = self._stats([1000, 1000, 10, 20, 30], window = 3)
+        self.assertEquals(5, stats.count)
+        self.assertEquals([10, 20, 30], stats.durations)
+        self.assertEquals(20, stats.estimate)
+
 class TestSchedulerAlgorithm(unittest.TestCase):
     """
     Unit tests for scheduler
@@ -312,6 +646,56 @@ class TestSchedulerAlgorithm(unittest.TestCase):
         self.assertEquals(groups[0][0], "test-package1")
         self.assertEquals(groups[3][0], "test-package4")
         self.assertEquals(groups[3][1], "test-package6")
+
+    def testSingleGroup(self):
+
+        test_packages = {"test-package1" : 30,
+                         "test-package2" : None}
+
+        groups = group_packages(test_packages, 10, 1)
+        self.assertEquals([["test-package1", "test-package2"]], groups)
+
+    def _random_packages(self, amount):
+        rand = random.Random(amount)
+        return dict(("test-package%d" % i, rand.randint(1, 120))
+                    for i in xrange(amount))
+
+    def _runtimes(self, groups, test_packages):
+        return [sum(test_packages[p] for p in group) for group in groups]
+
+    def _assert_partitioned(self, amount):
+        test_packages = self._random_packages(amount)
+        total = sum(test_packages.values())
+        max_groups = amount / 10
+
+        #Everything fits under max_runtime
+        max_runtime = 2 * total / max_groups
+        groups = group_packages(test_packages, max_runtime, max_groups)
+        self.assertEquals(sorted(test_packages), 
+                          sorted(sum(groups, [])))
+        self.assertTrue(max(self._runtimes(groups, test_packages)) <= 
+                        max_runtime)
+        self.assertTrue(len(groups) <= 
+                        11 / 9.0 * (float(total) / max_runtime) + 1)
+
+        #The groups run past max_runtime but are balanced
+        groups = group_packages(test_packages, 60, max_groups)
+        self.assertEquals(max_groups, len(groups))
+        self.assertEquals(sorted(test_packages), 
+                          sorted(sum(groups, [])))
+        lower_bound = max(float(total) / max_groups, 
+                          max(test_packages.values()))
+        self.assertTrue(max(self._runtimes(groups, test_packages)) <= 
+                        4 / 3.0 * lower_bound)
+
+    def testPartition100(self):
+        self._assert_partitioned(100)
+
+    def testPartition1000(self):
+        self._assert_partitioned(1000)
+
+    def testPartition10000(self):
+        self._assert_partitioned(10000)
     
 
 if __name__ == "__main__":
@@ -159,4 +159,73 @@ def single_task_distribution(test_list, options):
             task.set_test_plan(test_plan)
             tasks.append(task)
 
-    return tasks
\ No newline at end of file
+    return tasks
+
+def _balanced_groups(packages, count):
+    """
+    Split the packages in order into groups whose sizes differ by one at most
+
+    @type packages: C{list} of C{str}
+    @param packages: The test packages
+
+    @type count: C{int}
+    @param count: The number of groups wanted
+
+    @rtype: C{list} of C{list} of C{str}
+    @return: At most count non empty groups
+    """
+    count = max(min(count, len(packages)), 1)
+    size, extra = divmod(len(packages), count)
+    groups = []
+    start = 0
+    for i in range(count):
+        end = start + size + int(i < extra)
+        groups.append(packages[start:end])
+        start = end
+    return groups
+
+def _test_plan_tasks(test_list, options):
+    """Creates a task for each hw and host test plan"""
+
+    tasks = []
+    for key, host_testing in [('hw_testplans', False), 
+                              ('host_testplans', True)]:
+        options['test_packages'] = ""
+        for test_plan in test_list.get(key, []):
+            options['testplan_name'] = test_plan.name
+            cmd = conductor_command(options,
+                                    host_testing = host_testing,
+                                    chroot_testing = False)
+            task = Task(cmd)
+            task.set_test_plan(test_plan)
+            tasks.append(task)
+    return tasks
+
+def adaptive_distribution(test_list, options):
+    """
+    Creates as many tasks of balanced size as there are idle workers.
+
+    The number of idle workers is given in options['idle_consumers'].
+    Device, host and chroot packages are split separately
+    """
+
+    if not test_list:
+        return single_task_distribution(test_list, options)
+
+    workers = options.get('idle_consumers') or 1
+    tasks = []
+    for key, host_testing, chroot_testing in [('device', False, False),
+                                              ('host', True, False),
+                                              ('chroot', False, True)]:
+        if key not in test_list:
+            continue
+        packages = test_list[key].split(",")
+        for group in _balanced_groups(packages, workers):
+            options['test_packages'] = ",".join(group)
+            cmd = conductor_command(options,
+                                    host_testing = host_testing,
+                                    chroot_testing = chroot_testing)
+            tasks.append(Task(cmd))
+
+    tasks.extend(_test_plan_tasks(test_list, options))
+    return tasks
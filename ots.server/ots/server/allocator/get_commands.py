@@ -25,6 +25,8 @@ A module for generating conductor commands based on testrun options
 """
 from ots.server.allocator.default_distribution_models \
     import single_task_distribution, perpackage_distribution
+from ots.server.allocator.default_distribution_models \
+    import adaptive_distribution
 
 
 def get_commands(distribution_model,
@@ -40,8 +42,14 @@ def get_commands(distribution_model,
                  use_libssh2=False,
                  resume=False,
                  flasher_options=None,
-                 extended_options=None):
-    """Returns a list of conductor commands based on the options"""
+                 extended_options=None,
+                 idle_consumers=None):
+    """
+    Returns a list of conductor commands based on the options
+
+    The "adaptive" model needs the number of idle workers 
+    in `idle_consumers`
+    """
     options = dict()
     options['image_url'] = image_url
     options['testrun_id'] = testrun_id
@@ -53,6 +61,7 @@ def get_commands(distribution_model,
     options['use_libssh2'] = use_libssh2
     options['resume'] = resume
     options['flasher_options'] = flasher_options
+    options['idle_consumers'] = idle_consumers
 
     cmds = []
 
@@ -64,6 +73,9 @@ def get_commands(distribution_model,
     if distribution_model == "perpackage":
         cmds = perpackage_distribution(test_list,
                                        options)
+    elif distribution_model == "adaptive":
+        cmds = adaptive_distribution(test_list,
+                                     options)
     else: # Default to single task distribution if nothing else matches
         cmds = single_task_distribution(test_list,
                                         options)
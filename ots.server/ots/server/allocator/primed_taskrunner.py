@@ -125,13 +125,16 @@ def primed_taskrunner(testrun_uuid, execution_timeout, distribution_model,
     @param flasher_options : Custom flasher options
 
     @type extended_options : C{dict}
-    @param extended_options : A dictionary of extended ots testrun options
+    @param extended_options : A dictionary of extended ots testrun options.
+                              The `priority` option selects the priority 
+                              lane of the device queue 
 
     @rtype: C{Taskrunner}
     @return: A loaded Taskrunner 
     """
 
-    routing_key = get_routing_key(device_properties)
+    routing_key = get_routing_key(device_properties, 
+                                  extended_options.get("priority"))
     taskrunner = taskrunner_factory(routing_key, execution_timeout, 
                                     testrun_uuid)
     test_list = dict()
@@ -152,6 +155,11 @@ def primed_taskrunner(testrun_uuid, execution_timeout, distribution_model,
     # Server deals with minutes, conductor uses seconds, 
     execution_timeout = int(execution_timeout)*60
 
+    idle_consumers = None
+    if distribution_model == "adaptive" and not custom_distribution_model:
+        idle_consumers = taskrunner.idle_consumers()
+        LOG.info("%s idle workers for '%s'" % (idle_consumers, routing_key))
+
     cmds = get_commands(distribution_model,
                         image,
                         rootstrap,
@@ -165,7 +173,8 @@ def primed_taskrunner(testrun_uuid, execution_timeout, distribution_model,
                         use_libssh2,
                         resume,
                         flasher_options,
-                        extended_options)
+                        extended_options,
+                        idle_consumers)
     
     if len(cmds) == 0:
         raise AllocatorException("No commands created!")
@@ -886,6 +886,44 @@ class TestGetCommands(unittest.TestCase):
         self.assertEquals(commands[3].command, expected_cmd_4)
 
 
+    def _adaptive_commands(self, test_list, idle_consumers):
+        return get_commands("adaptive", 
+                            'http://image/url/image.bin',
+                            "",
+                            test_list,
+                            "",
+                            "",
+                            "",
+                            "30",
+                            idle_consumers = idle_consumers)
+
+    def test_adaptive_distribution(self):
+        commands = self._adaptive_commands({'device':"a,b,c,d,e",
+                                            'host':"f"}, 2)
+        self.assertEquals(3, len(commands))
+        self.assertEquals(['conductor', 
+                           '-u', 'http://image/url/image.bin', 
+                           '-t', "a,b,c", '-m', '30'],
+                          commands[0].command)
+        self.assertEquals(['conductor', 
+                           '-u', 'http://image/url/image.bin', 
+                           '-t', "d,e", '-m', '30'],
+                          commands[1].command)
+        self.assertEquals(['conductor', 
+                           '-u', 'http://image/url/image.bin', 
+                           '-t', "f", '-m', '30', '-o'],
+                          commands[2].command)
+
+    def test_adaptive_distribution_more_workers_than_packages(self):
+        commands = self._adaptive_commands({'device':"a,b"}, 5)
+        self.assertEquals(["a", "b"], 
+                          [command.command[4] for command in commands])
+
+    def test_adaptive_distribution_no_idle_workers(self):
+        commands = self._adaptive_commands({'device':"a,b"}, 0)
+        self.assertEquals(1, len(commands))
+        self.assertEquals("a,b", commands[0].command[4])
+
 
 
 #######################################################################
@@ -0,0 +1,79 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Waiting for an AMQP message with a timeout
+
+amqplib can only block in `channel.wait()`. 
+`wait_for_message` selects on the socket of the connection first 
+so that the caller can wake up for its deadlines.
+"""
+
+import errno
+import select
+
+def is_buffered(channel):
+    """
+    amqplib reads ahead. Data it has buffered is not seen by select
+
+    @type channel: C{amqplib.client_0_8.channel.Channel}
+    @param channel: The AMQP channel
+
+    @rtype: C{bool}
+    @return: Whether a message may be waiting in the buffers 
+    """
+    connection = channel.connection
+    return bool(channel.method_queue) \
+        or not connection.method_reader.queue.empty() \
+        or bool(getattr(connection.transport, "_read_buffer", ""))
+
+def wait_for_message(channel, timeout, wake_up_fd = None):
+    """
+    Wait until a message can be read from the channel
+
+    @type channel: C{amqplib.client_0_8.channel.Channel}
+    @param channel: The AMQP channel
+
+    @type timeout: C{float} or None
+    @param timeout: Seconds to wait, None waits forever
+
+    @type wake_up_fd: C{int} or None
+    @param wake_up_fd: A file descriptor that also ends the wait
+
+    @rtype: C{bool}
+    @return: Whether `channel.wait()` can be called without blocking
+    """
+    if is_buffered(channel):
+        return True
+    sock = channel.connection.transport.sock
+    readers = [sock]
+    if wake_up_fd is not None:
+        readers.append(wake_up_fd)
+    try:
+        readable = select.select(readers, [], [], timeout)[0]
+    except select.error, error:
+        # Interrupted system calls are expected 
+        # on apache graceful restart
+        if error[0] == errno.EINTR:
+            return False
+        raise
+    return sock in readable
@@ -31,9 +31,12 @@ Defines the ots.server.distributor API
 
 from ots.server.distributor.taskrunner import TaskRunner
 from ots.server.distributor.taskrunner_factory import taskrunner_factory
-from ots.server.distributor.dto_signal import DTO_SIGNAL
+from ots.server.distributor.taskrunner_factory import is_reactor_mode
+from ots.server.distributor.dto_signal import DTO_SIGNAL, is_for_testrun
+from ots.server.distributor.cancel import cancel_testrun
 
 # Exceptions
 
 from ots.server.distributor.exceptions import OtsQueueDoesNotExistError, \
-     OtsExecutionTimeoutError, OtsQueueTimeoutError
+     OtsExecutionTimeoutError, OtsQueueTimeoutError, OtsTaskLostError, \
+     OtsTestrunCancelledError
@@ -0,0 +1,87 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Drives the Tasks of a TaskRunner through start and finish
+and reports the time spent in the state change message path
+
+usage: python benchmark_task_registry.py [-n TASKS]
+"""
+
+import time
+from optparse import OptionParser
+
+from ots.common.dto.api import StateChangeMessage, TaskCondition
+from ots.common.amqp.api import pack_message
+
+from ots.server.distributor.taskrunner import TaskRunner
+
+def _taskrunner(tasks):
+    """
+    @type tasks: C{int}
+    @param tasks: The number of Tasks
+
+    @rtype: L{TaskRunner}
+    @return: A TaskRunner with the Tasks added, not connected to AMQP
+    """
+    #With a reactor the TaskRunner does not connect
+    taskrunner = TaskRunner("guest", "guest", "localhost", "/", 
+                            "ots", 5672, "benchmark", "benchmark",
+                            3600, 3600, 3600, reactor = object())
+    for i in xrange(tasks):
+        taskrunner.add_task(["echo", str(i)])
+    return taskrunner
+
+def benchmark(tasks):
+    """
+    Print the time to handle the state changes of all the Tasks
+
+    @type tasks: C{int}
+    @param tasks: The number of Tasks
+    """
+    taskrunner = _taskrunner(tasks)
+    task_ids = [task.task_id for task in taskrunner._tasks]
+    taskrunner.timeout_handler.start_queue_timeout(task_ids)
+    messages = []
+    for condition in [TaskCondition.START, TaskCondition.FINISH]:
+        messages.extend([pack_message(StateChangeMessage(task_id, condition))
+                         for task_id in task_ids])
+    start = time.time()
+    for message in messages:
+        taskrunner._on_message(message)
+    elapsed = time.time() - start
+    assert taskrunner.is_finished
+    print "%d tasks, %d messages in %.2f s, %.1f us per message" % \
+        (tasks, len(messages), elapsed, elapsed / len(messages) * 1e6)
+
+def main():
+    """Entry point"""
+    parser = OptionParser()
+    parser.add_option("-n", "--tasks",
+                      default = 10000,
+                      type = int,
+                      help = "the number of tasks")
+    options = parser.parse_args()[0]
+    benchmark(options.tasks)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Cancels a running Testrun.
+
+The TaskRunner of the Testrun consumes its testrun queue 
+so a CancelMessage published there reaches it 
+whichever process the Testrun runs in
+"""
+
+import logging
+
+from ots.common.dto.api import CancelMessage
+from ots.common.amqp.api import pack_message, testrun_queue_name
+from ots.common.amqp.api import CONNECTION_POOL
+
+from ots.server.distributor.taskrunner_factory import distributor_config
+from ots.server.distributor.queue_exists import queue_exists
+
+LOGGER = logging.getLogger(__name__)
+
+def cancel_testrun(testrun_id, config_file = None):
+    """
+    Ask the TaskRunner of the Testrun to cancel it
+
+    @type testrun_id: C{int}  
+    @param testrun_id: The Testrun id 
+
+    @type config_file: C{str}  
+    @param config_file: The fqname of the config file
+
+    @rtype: C{bool}  
+    @return: Whether the Testrun was running
+    """
+    config = distributor_config(config_file)
+    queue = testrun_queue_name(testrun_id)
+    if not queue_exists(config["host"], 
+                        config["username"], 
+                        config["password"], 
+                        config["vhost"], 
+                        queue):
+        LOGGER.warning("Testrun %s is not running" % (testrun_id))
+        return False
+    channel = CONNECTION_POOL.acquire(config["host"], 
+                                      config["username"], 
+                                      config["password"], 
+                                      config["vhost"])
+    try:
+        channel.basic_publish(pack_message(CancelMessage(testrun_id)),
+                              mandatory = True,
+                              exchange = queue,
+                              routing_key = queue)
+    except:
+        CONNECTION_POOL.release(channel, discard = True)
+        raise
+    CONNECTION_POOL.release(channel)
+    LOGGER.info("Testrun %s cancelled" % (testrun_id))
+    return True
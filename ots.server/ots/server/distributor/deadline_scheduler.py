@@ -0,0 +1,160 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+A heap of deadlines with cancellation
+
+Cancelled entries are left in the heap and skipped when they
+reach the top, so all operations are O(log n).
+"""
+
+import heapq
+import itertools
+
+class DeadlineScheduler(object):
+    """
+    Deadlines keyed by an id. A key has at most one deadline
+    """
+
+    def __init__(self):
+        #[deadline, sequence, key, value, is_valid]
+        self._heap = []
+        self._entries = {}
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def schedule(self, key, deadline, value = None):
+        """
+        Set the deadline for the key, replacing any earlier one 
+
+        @type key: C{object}
+        @param key: A hashable id
+
+        @type deadline: C{float}
+        @param deadline: The time of expiry in seconds since the epoch
+
+        @type value: C{object}
+        @param value: Returned with the key on expiry
+        """
+        self.cancel(key)
+        entry = [deadline, self._sequence.next(), key, value, True]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, key):
+        """
+        Remove the deadline of the key if there is one
+
+        @type key: C{object}
+        @param key: A hashable id
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[-1] = False
+
+    def clear(self):
+        """
+        Remove all the deadlines
+        """
+        self._heap = []
+        self._entries = {}
+
+    def keys(self):
+        """
+        @rtype: C{list}
+        @return: The keys with a deadline
+        """
+        return self._entries.keys()
+
+    def deadline(self, key):
+        """
+        @type key: C{object}
+        @param key: A hashable id
+
+        @rtype: C{float} or None
+        @return: The deadline of the key
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0]
+
+    @property
+    def next_deadline(self):
+        """
+        @rtype: C{float} or None
+        @return: The earliest deadline
+        """
+        self._prune()
+        if not self._heap:
+            return None
+        return self._heap[0][0]
+
+    def peek(self):
+        """
+        @rtype: C{object} or None
+        @return: The key of the earliest deadline
+        """
+        self._prune()
+        if not self._heap:
+            return None
+        return self._heap[0][2]
+
+    def pop_expired(self, now):
+        """
+        Remove the deadlines that have passed
+
+        @type now: C{float}
+        @param now: The current time 
+
+        @rtype: C{list} of C{tuple} of key and value
+        @return: The expired keys and values, earliest first
+        """
+        expired = []
+        while self.next_deadline is not None and self.next_deadline <= now:
+            expired.append(self.pop())
+        return expired
+
+    def pop(self):
+        """
+        Remove the earliest deadline
+
+        @rtype: C{tuple} of key and value
+        @return: The key and the value of the earliest deadline
+        """
+        self._prune()
+        entry = heapq.heappop(self._heap)
+        key, value = entry[2], entry[3]
+        del self._entries[key]
+        return key, value
+
+    def _prune(self):
+        """
+        Drop cancelled entries from the top of the heap
+        """
+        while self._heap and not self._heap[0][-1]:
+            heapq.heappop(self._heap)
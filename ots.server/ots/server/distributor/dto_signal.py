@@ -60,7 +60,8 @@ from django.dispatch.dispatcher import Signal
 DTO_SIGNAL = Signal()
 
 
-def send_monitor_event(monitory_type, sender=None, description=None):
+def send_monitor_event(monitory_type, sender=None, description=None,
+                       testrun_id=None):
     """
     Create monitor instance and send it
 
@@ -72,9 +73,31 @@ def send_monitor_event(monitory_type, sender=None, description=None):
 
     @type description : C{str}
     @param description : Event description
+
+    @type testrun_id : C{str}
+    @param testrun_id : The testrun the event belongs to
     """
     monitor = Monitor(event_type=monitory_type,
                       sender=sender,
                       description=description)
 
-    DTO_SIGNAL.send(sender=sender, dto=monitor)
+    DTO_SIGNAL.send(sender=sender, dto=monitor, testrun_id=testrun_id)
+
+
+def is_for_testrun(testrun_id, kwargs):
+    """
+    Filter for DTO_SIGNAL receivers when many testruns share a process
+
+    @type testrun_id : C{str} or None
+    @param testrun_id : The testrun of the receiver, None receives all
+
+    @type kwargs : C{dict}
+    @param kwargs : The keyword arguments of the signal
+
+    @rtype: C{bool}
+    @return: Whether the signal is for the testrun. 
+             DTOs sent without a testrun_id are for every testrun
+    """
+    signal_testrun_id = kwargs.get("testrun_id")
+    return testrun_id is None or signal_testrun_id is None \
+        or signal_testrun_id == testrun_id
@@ -35,6 +35,27 @@ class OtsExecutionTimeoutError(Exception):
         return ("Server side timeout. (Worker went offline during "+\
                     "testrun or some tasks were not started in time)")
 
+class OtsTaskLostError(OtsExecutionTimeoutError):
+    """Exception raised if the worker of a task stopped sending heartbeats"""
+    def __init__(self, task_id, silence, *args, **kwargs):
+        self.task_id = task_id
+        self.silence = silence
+        OtsExecutionTimeoutError.__init__(self, *args, **kwargs)
+
+    def __str__(self):
+        return ("No heartbeat from the worker of task %s for %s seconds. "+\
+                    "The worker went offline during testrun") \
+                    % (self.task_id, self.silence)
+
+class OtsTestrunCancelledError(Exception):
+    """Exception raised if the testrun was cancelled while it was running"""
+    def __init__(self, testrun_id, *args, **kwargs):
+        self.testrun_id = testrun_id
+        Exception.__init__(self, *args, **kwargs)
+
+    def __str__(self):
+        return "Testrun %s was cancelled" % (self.testrun_id)
+
 class OtsQueueTimeoutError(Exception):
     """Exception raised if none of the tasks was started before queue timeout"""
     def __init__(self, timeout_length, *args, **kwargs):
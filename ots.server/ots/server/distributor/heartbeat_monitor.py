@@ -0,0 +1,117 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Lost worker detection from the heartbeats of the running Tasks 
+
+The worker of a Task sends a heartbeat every `interval` seconds 
+while the Task runs. A Task whose worker has missed `misses` 
+heartbeats in a row is lost. 
+
+A Task is watched from its first heartbeat, so workers that 
+don't send heartbeats fall back to the execution timeout.
+"""
+
+import time
+
+from ots.server.distributor.deadline_scheduler import DeadlineScheduler
+
+MISSES = 3
+
+class HeartbeatMonitor(object):
+    """
+    The heartbeat deadlines of the running Tasks
+    """
+
+    def __init__(self, interval = None, misses = MISSES):
+        """
+        @type interval: C{int} or None
+        @param interval: Seconds between the heartbeats, None to disable
+
+        @type misses: C{int}
+        @param misses: The number of missed heartbeats that lose a Task
+        """
+        self.interval = interval
+        self.misses = misses
+        self._scheduler = DeadlineScheduler()
+
+    @property
+    def is_enabled(self):
+        """
+        @rtype: C{bool}
+        @return: Whether the workers are asked for heartbeats
+        """
+        return bool(self.interval)
+
+    @property
+    def silence(self):
+        """
+        @rtype: C{float}
+        @return: The seconds without a heartbeat after which a Task is lost
+        """
+        return self.interval * self.misses
+
+    @property
+    def deadline(self):
+        """
+        @rtype: C{float} or None
+        @return: The time the next Task is lost if no heartbeat comes 
+        """
+        return self._scheduler.next_deadline
+
+    def beat(self, task_id, now = None):
+        """
+        A heartbeat from the worker of the Task
+
+        @type task_id: C{str}
+        @param task_id: The id of the running Task
+        """
+        if not self.is_enabled:
+            return
+        if now is None:
+            now = time.time()
+        self._scheduler.schedule(task_id, now + self.silence)
+
+    def task_ended(self, task_id):
+        """
+        Stop watching the Task 
+
+        @type task_id: C{str}
+        @param task_id: The id of the Task
+        """
+        self._scheduler.cancel(task_id)
+
+    def lost(self, now = None):
+        """
+        @rtype: C{list} of C{str}
+        @return: The ids of the Tasks lost by now
+        """
+        if now is None:
+            now = time.time()
+        return [task_id for task_id, value in 
+                self._scheduler.pop_expired(now)]
+
+    def clear(self):
+        """
+        Stop watching all the Tasks
+        """
+        self._scheduler.clear()
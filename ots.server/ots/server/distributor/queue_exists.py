@@ -21,14 +21,16 @@
 # ***** END LICENCE BLOCK *****
 
 """
-Determines whether a Queue exists or not
+Determines whether a Queue exists or not 
+and how many of its consumers are idle
 """
 
 import logging
 
-from amqplib import client_0_8 as amqp
 from amqplib.client_0_8.exceptions import AMQPChannelException 
 
+from ots.common.amqp.api import CONNECTION_POOL
+
 LOGGER = logging.getLogger(__name__)
 
 def queue_exists(host, user_id, password, virtual_host, queue):
@@ -52,12 +54,7 @@ def queue_exists(host, user_id, password, virtual_host, queue):
     @return: Whether the AMQP queue exists or not 
     """
     ret_val = False
-    connection = amqp.Connection(host = host, 
-                                 userid = user_id,
-                                 password = password,
-                                 virtual_host = virtual_host, 
-                                 insist = False)
-    channel = connection.channel()
+    channel = CONNECTION_POOL.acquire(host, user_id, password, virtual_host)
     try:
         channel.queue_declare(queue = queue, 
                               durable = False, 
@@ -66,5 +63,95 @@ def queue_exists(host, user_id, password, virtual_host, queue):
                               passive = True)
         ret_val = True
     except AMQPChannelException:
+        #The broker has closed the channel, the pool opens a new one
         LOGGER.debug("No queue for %s"%(queue))
+    except:
+        CONNECTION_POOL.release(channel, discard = True)
+        raise
+    CONNECTION_POOL.release(channel)
     return ret_val 
+
+def idle_consumers(host, user_id, password, virtual_host, queue):
+    """
+    A passive queue_declare reports the consumers and the messages
+    waiting on the queue. Each waiting message will keep a consumer busy
+    so the idle consumers are estimated as the difference.
+    
+    @type host: C{str}
+    @param host: The AMQP host name
+
+    @type user_id: C{str} 
+    @param user_id: The AMQP userid
+
+    @type password: C{str} 
+    @param password: The AMQP password
+
+    @type virtual_host: C{str} 
+    @param virtual_host: The AMQP virtual host
+
+    @type queue : C{str} 
+    @param queue: The name of the queue
+
+    @rtype: C{int} 
+    @return: The estimated number of idle consumers, 0 without a queue
+    """
+    ret_val = 0
+    channel = CONNECTION_POOL.acquire(host, user_id, password, virtual_host)
+    try:
+        message_count, consumer_count = \
+            channel.queue_declare(queue = queue, 
+                                  durable = False, 
+                                  exclusive = False,
+                                  auto_delete=True,
+                                  passive = True)[1:]
+        ret_val = max(consumer_count - message_count, 0)
+    except AMQPChannelException:
+        #The broker has closed the channel, the pool opens a new one
+        LOGGER.debug("No queue for %s"%(queue))
+    except:
+        CONNECTION_POOL.release(channel, discard = True)
+        raise
+    CONNECTION_POOL.release(channel)
+    return ret_val 
+
+def queue_loads(host, user_id, password, virtual_host, queues):
+    """
+    The messages waiting on the queues and their consumers 
+    from passive queue_declares. Missing queues are left out
+
+    @type host: C{str}
+    @param host: The AMQP host name
+
+    @type user_id: C{str} 
+    @param user_id: The AMQP userid
+
+    @type password: C{str} 
+    @param password: The AMQP password
+
+    @type virtual_host: C{str} 
+    @param virtual_host: The AMQP virtual host
+
+    @type queues : C{list} of C{str} 
+    @param queues: The names of the queues
+
+    @rtype: C{dict} of C{str} : (C{int}, C{int})
+    @return: The message and consumer counts of the queues that exist
+    """
+    loads = {}
+    for queue in queues:
+        channel = CONNECTION_POOL.acquire(host, user_id, password, 
+                                          virtual_host)
+        try:
+            loads[queue] = channel.queue_declare(queue = queue, 
+                                                 durable = False, 
+                                                 exclusive = False,
+                                                 auto_delete=True,
+                                                 passive = True)[1:]
+        except AMQPChannelException:
+            #The broker has closed the channel, the pool opens a new one
+            LOGGER.debug("No queue for %s"%(queue))
+        except:
+            CONNECTION_POOL.release(channel, discard = True)
+            raise
+        CONNECTION_POOL.release(channel)
+    return loads 
@@ -0,0 +1,309 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+A select based event loop that runs many TaskRunners in one thread. 
+
+A blocking TaskRunner holds an AMQP connection for the whole 
+testrun, so every testrun needs a process of its own.
+The Reactor instead consumes the response queues of all 
+its TaskRunners on a single pooled channel. 
+Each TaskRunner keeps its own Task state machines,
+its deadlines are checked by the loop between messages.
+
+`Reactor.run` is called from the thread of the testrun (the Hub),
+it blocks until the Reactor thread has finished the TaskRunner.
+"""
+
+import os
+import time
+import sys
+import socket
+import select
+import logging
+import threading
+import Queue
+
+from amqplib.client_0_8.exceptions import AMQPException
+
+from ots.common.amqp.api import CONNECTION_POOL
+
+from ots.server.distributor.amqp_wait import wait_for_message
+from ots.server.distributor.exceptions import OtsExecutionTimeoutError
+from ots.server.distributor.exceptions import OtsQueueTimeoutError
+from ots.server.distributor.exceptions import OtsTestrunCancelledError
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Run(object):
+    """
+    A TaskRunner in the Reactor
+    """
+
+    def __init__(self, taskrunner):
+        self.taskrunner = taskrunner
+        self.done = threading.Event()
+        self.exc_info = None
+
+
+class Reactor(object):
+    """
+    Multiplexes the response queues and the timeouts of TaskRunners
+    """
+
+    def __init__(self, host, username, password, vhost):
+        """
+        @type host: C{str}
+        @param host: AMQP host 
+
+        @type username: C{str}
+        @param username: AMQP username 
+
+        @type password: C{str}
+        @param password: AMQP password 
+
+        @type vhost: C{str}
+        @param vhost: AMQP vhost
+        """
+        self._host = host
+        self._username = username
+        self._password = password
+        self._vhost = vhost
+        self._requests = Queue.Queue()
+        self._wake_up_r, self._wake_up_w = os.pipe()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._channel = None
+        #consumer tag -> _Run
+        self._runs = {}
+
+    @property
+    def active(self):
+        """
+        @rtype: C{int}
+        @return: The number of TaskRunners running
+        """
+        return len(self._runs)
+
+    def run(self, taskrunner):
+        """
+        Run the TaskRunner in the Reactor.
+        Blocks until all its Tasks have finished
+
+        @type taskrunner: L{ots.server.distributor.taskrunner.TaskRunner}
+        @param taskrunner: A TaskRunner created with this Reactor
+        """
+        run = _Run(taskrunner)
+        self._requests.put(run)
+        self._start_thread()
+        self._wake_up()
+        while not run.done.isSet():
+            #A timeout keeps the thread responsive to KeyboardInterrupt
+            run.done.wait(1)
+        if run.exc_info is not None:
+            raise run.exc_info[0], run.exc_info[1], run.exc_info[2]
+
+    #################################
+    # LOOP
+    #################################
+
+    def _start_thread(self):
+        """
+        Start the Reactor thread unless it is running
+        """
+        self._lock.acquire()
+        try:
+            if self._thread is None or not self._thread.isAlive():
+                self._thread = threading.Thread(target = self._loop,
+                                                name = "ots-reactor")
+                self._thread.setDaemon(True)
+                self._thread.start()
+        finally:
+            self._lock.release()
+
+    def _loop(self):
+        """
+        The event loop 
+        """
+        while True:
+            try:
+                self._start_runs()
+                if self._wait(self._next_timeout()):
+                    self._channel.wait()
+                self._finish_runs()
+            except:
+                #The loop must survive, but the channel can't be trusted
+                LOGGER.error("Reactor lost the AMQP connection", 
+                             exc_info = True)
+                self._fail_all(sys.exc_info())
+
+    def _start_runs(self):
+        """
+        Start the requested TaskRunners
+        """
+        while True:
+            try:
+                run = self._requests.get_nowait()
+            except Queue.Empty:
+                break
+            if self._channel is None:
+                try:
+                    self._channel = CONNECTION_POOL.acquire(self._host, 
+                                                            self._username,
+                                                            self._password,
+                                                            self._vhost)
+                except:
+                    self._finish(run, sys.exc_info())
+                    continue
+            callback = lambda message, run = run: self._deliver(run, message)
+            try:
+                consumer_tag = run.taskrunner.start(self._channel, callback)
+            except (AMQPException, socket.error, IOError):
+                self._finish(run, sys.exc_info())
+                raise
+            except:
+                self._finish(run, sys.exc_info())
+            else:
+                self._runs[consumer_tag] = run
+
+    def _deliver(self, run, message):
+        """
+        Hand the message to its TaskRunner. 
+        An error only finishes that TaskRunner
+        """
+        try:
+            run.taskrunner.on_message(message)
+        except:
+            LOGGER.error("Error in testrun %s" % (run.taskrunner.testrun_id),
+                         exc_info = True)
+            self._finish(run, sys.exc_info())
+
+    def _finish_runs(self):
+        """
+        Finish the TaskRunners that are done or have timed out
+        """
+        for run in self._runs.values():
+            try:
+                is_finished = run.taskrunner.check()
+            except (OtsQueueTimeoutError, OtsExecutionTimeoutError,
+                    OtsTestrunCancelledError):
+                self._finish(run, sys.exc_info())
+            except:
+                #The TaskRunner checks its queues on its own connections
+                LOGGER.error("Error in testrun %s" 
+                             % (run.taskrunner.testrun_id), exc_info = True)
+                self._finish(run, sys.exc_info())
+            else:
+                if is_finished:
+                    LOGGER.info("All Tasks completed")
+                    self._finish(run)
+
+    def _finish(self, run, exc_info = None):
+        """
+        Stop the TaskRunner and wake up the thread waiting for it
+        """
+        for consumer_tag, other_run in self._runs.items():
+            if other_run is run:
+                del self._runs[consumer_tag]
+        if run.done.isSet():
+            return
+        try:
+            run.taskrunner.finish()
+        finally:
+            run.exc_info = exc_info
+            run.done.set()
+
+    def _fail_all(self, exc_info):
+        """
+        Finish all the TaskRunners with the error and drop the channel
+        """
+        for run in self._runs.values():
+            self._finish(run, exc_info)
+        if self._channel is not None:
+            CONNECTION_POOL.release(self._channel, discard = True)
+            self._channel = None
+
+    #################################
+    # WAITING
+    #################################
+
+    def _next_timeout(self):
+        """
+        @rtype: C{float} or None
+        @return: Seconds to the nearest deadline, None if there is none
+        """
+        deadlines = [run.taskrunner.deadline 
+                     for run in self._runs.values()
+                     if run.taskrunner.deadline is not None]
+        if not deadlines:
+            return None
+        return max(min(deadlines) - time.time(), 0)
+
+    def _wait(self, timeout):
+        """
+        Wait for a message, a new request or the timeout
+
+        @type timeout: C{float} or None
+        @param timeout: Seconds to wait, None waits forever
+
+        @rtype: C{bool}
+        @return: Whether a message can be read from the channel
+        """
+        if self._channel is None:
+            readable = select.select([self._wake_up_r], [], [], timeout)[0]
+            is_message = False
+        else:
+            is_message = wait_for_message(self._channel, timeout, 
+                                          self._wake_up_r)
+            readable = select.select([self._wake_up_r], [], [], 0)[0]
+        if readable:
+            os.read(self._wake_up_r, 4096)
+        return is_message
+
+    def _wake_up(self):
+        """
+        Interrupt the select of the loop
+        """
+        os.write(self._wake_up_w, "x")
+
+
+##############################
+# PROCESS WIDE REACTORS
+##############################
+
+_REACTORS = {}
+_REACTORS_LOCK = threading.Lock()
+
+def get_reactor(host, username, password, vhost):
+    """
+    @rtype: L{Reactor}
+    @return: The Reactor of this process for the AMQP broker
+    """
+    key = (host, username, password, vhost)
+    _REACTORS_LOCK.acquire()
+    try:
+        if key not in _REACTORS:
+            _REACTORS[key] = Reactor(host, username, password, vhost)
+        return _REACTORS[key]
+    finally:
+        _REACTORS_LOCK.release()
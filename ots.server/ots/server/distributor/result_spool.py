@@ -0,0 +1,167 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Reassembles chunked result file transfers into spool files
+
+Each chunk is written straight to the spool file of its transfer 
+so the file is never held in memory as a whole.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+
+from ots.common.dto.api import SpooledResults
+
+LOGGER = logging.getLogger(__name__)
+
+class ResultSpoolError(Exception):
+    """A chunked transfer failed"""
+    pass
+
+class _Transfer(object):
+    """
+    State of an incomplete transfer
+    """
+
+    def __init__(self, path):
+        """
+        @type path: C{str}
+        @param path: The path of the spool file
+        """
+        self.path = path
+        self.spool_file = open(path, "wb")
+        self.checksum = hashlib.md5()
+        self.next_sequence = 0
+
+    def write(self, data):
+        """
+        @type data: C{str}
+        @param data: The data to append
+        """
+        self.spool_file.write(data)
+        self.checksum.update(data)
+        self.next_sequence += 1
+
+    def close(self):
+        """Close the spool file"""
+        self.spool_file.close()
+
+
+class ResultSpool(object):
+    """
+    The spool directory for the result files of a Testrun
+    """
+
+    def __init__(self, testrun_id, directory = None):
+        """
+        @type testrun_id: C{str}
+        @param testrun_id: The testrun id
+
+        @type directory: C{str}
+        @param directory: The parent directory for the spool directory. 
+                          Defaults to the system temporary directory
+        """
+        self._testrun_id = testrun_id
+        self._directory = directory
+        self._spool_dir = None
+        self._transfers = {}
+
+    @property
+    def spool_dir(self):
+        """
+        The spool directory created on first use
+        @rtype: C{str}
+        """
+        if self._spool_dir is None:
+            self._spool_dir = tempfile.mkdtemp(
+                                    prefix = "ots_%s_" % (self._testrun_id),
+                                    dir = self._directory)
+        return self._spool_dir
+
+    def add_chunk(self, chunk):
+        """
+        Append the chunk to the spool file of its transfer
+
+        @type chunk: L{ots.common.dto.results.ResultsChunk}
+        @param chunk: The chunk 
+
+        @rtype: L{ots.common.dto.results.SpooledResults} or None
+        @return: The Results when the transfer is complete 
+        """
+        transfer = self._transfers.get(chunk.transfer_id)
+        if transfer is None:
+            if chunk.sequence != 0:
+                raise ResultSpoolError("Transfer %s of %s started with "\
+                                       "chunk %s" % (chunk.transfer_id, 
+                                                     chunk.name,
+                                                     chunk.sequence))
+            path = os.path.join(self.spool_dir, chunk.transfer_id)
+            transfer = _Transfer(path)
+            self._transfers[chunk.transfer_id] = transfer
+        if chunk.sequence != transfer.next_sequence:
+            self._abort(chunk.transfer_id)
+            raise ResultSpoolError("Transfer %s of %s expected chunk %s "\
+                                   "got %s" % (chunk.transfer_id, chunk.name,
+                                               transfer.next_sequence,
+                                               chunk.sequence))
+        transfer.write(chunk.data)
+        if not chunk.is_last:
+            return None
+        transfer.close()
+        del self._transfers[chunk.transfer_id]
+        if transfer.checksum.hexdigest() != chunk.checksum:
+            os.remove(transfer.path)
+            raise ResultSpoolError("Checksum mismatch in transfer %s of %s"\
+                                   % (chunk.transfer_id, chunk.name))
+        LOGGER.debug("Received %s in %s chunks" % (chunk.name, 
+                                                   transfer.next_sequence))
+        return SpooledResults(chunk.name, transfer.path,
+                              package = chunk.package,
+                              hostname = chunk.hostname,
+                              environment = chunk.environment,
+                              task_id = chunk.task_id)
+
+    def _abort(self, transfer_id):
+        """
+        Drop an incomplete transfer
+
+        @type transfer_id: C{str}
+        @param transfer_id: The transfer id
+        """
+        transfer = self._transfers.pop(transfer_id)
+        transfer.close()
+        os.remove(transfer.path)
+
+    def clean_up(self):
+        """
+        Remove the spool directory and all the spooled files
+        """
+        for transfer_id in self._transfers.keys():
+            LOGGER.warning("Dropping incomplete transfer %s" % (transfer_id))
+            self._abort(transfer_id)
+        if self._spool_dir is not None:
+            shutil.rmtree(self._spool_dir, ignore_errors = True)
+            self._spool_dir = None
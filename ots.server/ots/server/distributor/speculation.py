@@ -0,0 +1,242 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Speculative re-execution of straggler Tasks
+
+A Task with an `expected_duration` that is still running when the 
+duration has passed is a straggler. The TaskRunner may publish a twin 
+of the straggler for an idle worker. Whichever of the two finishes 
+first is accepted, the other is superseded. 
+
+Both attempts send results for the same packages. The Results and 
+Packages carry the id of the Task that sent them, those of a Task 
+that may get a twin are held back until the Task ends. Only the 
+DTOs of the accepted Task of a pair are relayed.
+
+A lost Task published again is retried. The DTOs of the lost Task 
+still held back are dropped, those the retry sends again after the 
+lost Task relayed them are not relayed twice.
+
+Workers that don't send the Task id cannot be told apart, 
+once a Task has been repeated their DTOs already relayed 
+are not relayed again.
+"""
+
+import time
+
+from ots.common.dto.api import Results, Packages
+
+from ots.server.distributor.deadline_scheduler import DeadlineScheduler
+
+def _dto_key(dto):
+    """
+    @type dto: C{object}
+    @param dto: A DTO from a worker
+
+    @rtype: C{tuple} or None
+    @return: The identity of Results and Packages, None for other DTOs
+    """
+    if isinstance(dto, Results):
+        return ("results", dto.name, dto.package, 
+                dto.environment.environment)
+    if isinstance(dto, Packages):
+        return ("packages",) + tuple(sorted([(environment.environment, 
+                                              tuple(packages))
+                                             for environment, packages 
+                                             in dto.items()]))
+    return None
+
+class Speculation(object):
+    """
+    Tracks the running Tasks against their expected durations,
+    pairs the stragglers with their twins and decides which 
+    of the Results and Packages are relayed
+    """
+
+    def __init__(self):
+        self._scheduler = DeadlineScheduler()
+        #task_id -> task_id of the twin, both ways
+        self._twins = {}
+        #task_id -> DTOs held back until the Task ends
+        self._held = {}
+        #The Tasks whose DTOs are dropped
+        self._discarded = set()
+        #task_id -> keys of the DTOs relayed
+        self._relayed = {}
+        #task_id of a retry -> keys relayed by the earlier attempts
+        self._inherited = {}
+        self._has_repeats = False
+
+    @property
+    def deadline(self):
+        """
+        @rtype: C{float} or None
+        @return: The time the next running Task becomes a straggler
+        """
+        return self._scheduler.next_deadline
+
+    def twin(self, task_id):
+        """
+        @type task_id: C{str}
+        @param task_id: The id of a Task
+
+        @rtype: C{str} or None
+        @return: The id of the twin of the Task
+        """
+        return self._twins.get(task_id)
+
+    def task_started(self, task, now = None):
+        """
+        Watch the Task if it has an expected duration and no twin yet.
+        The DTOs of a watched Task are held back until it ends
+
+        @type task: L{ots.server.distributor.task.Task}
+        @param task: The started Task
+        """
+        if task.expected_duration is None or task.task_id in self._twins:
+            return
+        if now is None:
+            now = time.time()
+        self._held.setdefault(task.task_id, [])
+        self._scheduler.schedule(task.task_id, now + task.expected_duration)
+
+    def task_ended(self, task_id):
+        """
+        Stop watching the Task and break up its pair
+
+        @type task_id: C{str}
+        @param task_id: The id of the finished or superseded Task
+
+        @rtype: C{str} or None
+        @return: The id of the twin of the Task
+        """
+        self._scheduler.cancel(task_id)
+        twin_id = self._twins.pop(task_id, None)
+        if twin_id is not None:
+            self._twins.pop(twin_id, None)
+        return twin_id
+
+    def stragglers(self, now = None):
+        """
+        @rtype: C{list} of C{str}
+        @return: The ids of the Tasks that became stragglers by now
+        """
+        if now is None:
+            now = time.time()
+        return [task_id for task_id, value in 
+                self._scheduler.pop_expired(now)]
+
+    def add_twin(self, task_id, twin_id):
+        """
+        @type task_id: C{str}
+        @param task_id: The id of the straggler
+
+        @type twin_id: C{str}
+        @param twin_id: The id of its twin 
+        """
+        self._twins[task_id] = twin_id
+        self._twins[twin_id] = task_id
+        self._held.setdefault(task_id, [])
+        self._held.setdefault(twin_id, [])
+        self._has_repeats = True
+
+    def add_retry(self, task_id, retry_id):
+        """
+        The lost Task has been published again. 
+        Its DTOs are dropped from now on, the retry doesn't 
+        relay again those it has already relayed 
+
+        @type task_id: C{str}
+        @param task_id: The id of the lost Task
+
+        @type retry_id: C{str}
+        @param retry_id: The id of the retry
+        """
+        self.discard(task_id)
+        inherited = set(self._inherited.get(task_id, ()))
+        inherited.update(self._relayed.get(task_id, ()))
+        self._inherited[retry_id] = inherited
+        self._has_repeats = True
+
+    def relay(self, dto):
+        """
+        @type dto: C{object}
+        @param dto: A DTO from a worker
+
+        @rtype: C{list} of C{object}
+        @return: The DTOs to relay now
+        """
+        key = _dto_key(dto)
+        if key is None:
+            return [dto]
+        task_id = dto.task_id
+        if task_id in self._discarded:
+            return []
+        if task_id in self._held:
+            self._held[task_id].append(dto)
+            return []
+        return self._relay_once(dto, key)
+
+    def release(self, task_id):
+        """
+        The Task has ended and its DTOs are accepted
+
+        @type task_id: C{str}
+        @param task_id: The id of the Task
+
+        @rtype: C{list} of C{object}
+        @return: The DTOs of the Task held back so far
+        """
+        dtos = []
+        for dto in self._held.pop(task_id, []):
+            dtos.extend(self._relay_once(dto, _dto_key(dto)))
+        return dtos
+
+    def discard(self, task_id):
+        """
+        The Task has been superseded, its DTOs are dropped
+
+        @type task_id: C{str}
+        @param task_id: The id of the Task
+        """
+        self._held.pop(task_id, None)
+        self._discarded.add(task_id)
+
+    def _relay_once(self, dto, key):
+        """
+        @type dto: C{object}
+        @param dto: A Results or Packages
+
+        @type key: C{tuple}
+        @param key: The identity of the DTO
+
+        @rtype: C{list} of C{object}
+        @return: The DTO unless it has already been relayed
+        """
+        if dto.task_id is None:
+            if self._has_repeats and key in self._relayed.get(None, ()):
+                return []
+        elif key in self._inherited.get(dto.task_id, ()):
+            return []
+        self._relayed.setdefault(dto.task_id, set()).add(key)
+        return [dto]
@@ -52,17 +52,37 @@ class Task(object):
     Has a unique id 
     """
 
+    __slots__ = ("command", "_timeout", "xml_file", "task_id", 
+                 "current_state", "expected_duration", "attempt")
+
     _WAITING = "WAITING" 
     _STARTED = "STARTED"
     _FINISHED = "FINISHED"
+    _TIMED_OUT = "TIMED_OUT"
+    _LOST = "LOST"
+    _CANCELLED = "CANCELLED"
+
+    #Server side condition, the deadline of the Task has passed
+    TIMEOUT = "TIMEOUT"
+    #Server side condition, the worker stopped sending heartbeats
+    LOST = "LOST"
+    #Server side condition, the Testrun has been cancelled
+    CANCEL = "CANCEL"
 
-    #condition, current, next_state
-    transition_table = [(TaskCondition.START, _WAITING, _STARTED, ),
-                        (TaskCondition.FINISH, _STARTED, _FINISHED)]
+    #(condition, current) -> next_state
+    transition_table = {(TaskCondition.START, _WAITING) : _STARTED,
+                        (TaskCondition.FINISH, _STARTED) : _FINISHED,
+                        (TIMEOUT, _WAITING) : _TIMED_OUT,
+                        (TIMEOUT, _STARTED) : _TIMED_OUT,
+                        (LOST, _STARTED) : _LOST,
+                        (CANCEL, _WAITING) : _CANCELLED,
+                        (CANCEL, _STARTED) : _CANCELLED}
 
-    current_state = "WAITING"
+    _conditions = frozenset([TaskCondition.START, TaskCondition.FINISH, 
+                             TIMEOUT, LOST, CANCEL])
 
-    def __init__(self, command, timeout = None, xml_file = None):
+    def __init__(self, command, timeout = None, xml_file = None,
+                 expected_duration = None, attempt = 1):
         """
         @type command: C{list} 
         @param command: The CL params as a list
@@ -73,11 +93,20 @@ class Task(object):
         @type xml_file: C{StringIO} 
         @param xml_file: Is task includes a test plan
 
+        @type expected_duration: C{float} 
+        @param expected_duration: Seconds after which the running Task 
+                                  is a straggler, None if not known
+
+        @type attempt: C{int} 
+        @param attempt: The number of times the command has been published
         """
         self.command = command 
         self._timeout = timeout
         self.xml_file = xml_file
         self.task_id = uuid.uuid1().hex
+        self.current_state = self._WAITING
+        self.expected_duration = expected_duration
+        self.attempt = attempt
 
     def transition(self, condition):
         """
@@ -86,17 +115,23 @@ class Task(object):
         @type condition: C{str} 
         @param condition: The condition 
         """
-        transition_table = self.transition_table
-        if not condition in [row[0] for row in transition_table]:
-            raise TaskException("Unknown condition '%s'" % (condition))
-        for row in transition_table:
-            if row[0] == condition and self.current_state == row[1]:
-                self.current_state = row[2]
-                break
-        else:
+        try:
+            self.current_state = \
+                self.transition_table[(condition, self.current_state)]
+        except KeyError:
+            if condition not in self._conditions:
+                raise TaskException("Unknown condition '%s'" % (condition))
             msg = "No transition %s->'%s'->" % (self.current_state, condition)
             raise TaskException(msg)
     
+    @property
+    def is_waiting(self):
+        """
+        Is the Task still queued for a worker?
+        @rtype: C{bool}  
+        """
+        return self.current_state == self._WAITING
+
     @property
     def is_finished(self):
         """
@@ -105,7 +140,44 @@ class Task(object):
         @rtype: C{bool}  
         """
         return self.current_state == self._FINISHED
+
+    @property
+    def is_timed_out(self):
+        """
+        Has the Task missed its deadline?
+        @rtype: C{bool}  
+        """
+        return self.current_state == self._TIMED_OUT
+
+    @property
+    def is_lost(self):
+        """
+        Has the worker of the Task gone silent?
+        @rtype: C{bool}  
+        """
+        return self.current_state == self._LOST
+
+    @property
+    def is_cancelled(self):
+        """
+        Has the Testrun of the Task been cancelled?
+        @rtype: C{bool}  
+        """
+        return self.current_state == self._CANCELLED
     
+    def retry(self):
+        """
+        A new Task for the next attempt of the command. 
+        It has an id of its own so that the late messages 
+        of this attempt can be told apart
+
+        @rtype: L{Task}  
+        @return: The Task to publish again
+        """
+        return Task(self.command, self._timeout, self.xml_file,
+                    expected_duration = self.expected_duration,
+                    attempt = self.attempt + 1)
+
     def set_timeout(self, timeout):
         """
         Set the task timeout.
@@ -121,3 +193,66 @@ class Task(object):
         @param xml_file: Test plan as StringIO
         """
         self.xml_file = xml_file
+
+
+#############################
+# TaskRegistry
+#############################
+
+class TaskRegistry(object):
+    """
+    The Tasks of a TaskRunner indexed by task_id.
+    Iterates over the Tasks in the order they were added
+    """
+
+    def __init__(self, tasks = None):
+        """
+        @type tasks: C{list} of L{Task} 
+        @param tasks: The initial Tasks
+        """
+        self._tasks = {}
+        self._order = []
+        for task in tasks or []:
+            self.add(task)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def __iter__(self):
+        tasks = self._tasks
+        for task in list(self._order):
+            if tasks.get(task.task_id) is task:
+                yield task
+
+    def add(self, task):
+        """
+        @type task: L{Task} 
+        @param task: The Task to add
+        """
+        if task.task_id in self._tasks:
+            raise TaskException("Task '%s' already added" % (task.task_id))
+        self._tasks[task.task_id] = task
+        self._order.append(task)
+
+    def get(self, task_id):
+        """
+        @type task_id: C{str}
+        @param task_id: The ID of the Task
+
+        @rtype: L{Task}  
+        @return: The Task. Raises KeyError for an unknown task_id
+        """
+        return self._tasks[task_id]
+
+    def remove(self, task):
+        """
+        @type task: L{Task} 
+        @param task: The Task to remove
+        """
+        del self._tasks[task.task_id]
+        #Removed Tasks are dropped from the order once they dominate it
+        if len(self._order) > 2 * len(self._tasks) + 16:
+            self._order = list(self)
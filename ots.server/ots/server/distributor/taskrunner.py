@@ -31,23 +31,38 @@ Distribution of Tasks to Workers
 #pylint: disable=F0401
 
 
+import time
 import logging
 import sys
 import socket
 import errno
 
-from amqplib import client_0_8 as amqp
+from amqplib.client_0_8.exceptions import AMQPChannelException
 
 from ots.common.dto.api import CommandMessage, StateChangeMessage, Monitor
-from ots.common.dto.api import MonitorType
-from ots.common.amqp.api import pack_message, unpack_message
-from ots.common.amqp.api import testrun_queue_name
+from ots.common.dto.api import MonitorType, ResultsChunk, CancelMessage
+from ots.common.amqp.api import pack_message, unpack_messages, header_dto
+from ots.common.amqp.api import unpack_message
+from ots.common.amqp.api import testrun_queue_name, task_control_queue_name
+from ots.common.amqp.api import CONNECTION_POOL, CONTENT_ENCODINGS
+from ots.common.amqp.api import CONTENT_TYPES
+from ots.common.testplan_store import TestPlanReference
 
 from ots.server.distributor.dto_signal import DTO_SIGNAL, send_monitor_event
-from ots.server.distributor.task import Task
+from ots.server.distributor.task import Task, TaskRegistry
 from ots.server.distributor.queue_exists import queue_exists
+from ots.server.distributor.queue_exists import idle_consumers
+from ots.server.distributor.queue_exists import queue_loads
 from ots.server.distributor.timeout import Timeout
+from ots.server.distributor.speculation import Speculation
+from ots.server.distributor.heartbeat_monitor import HeartbeatMonitor, MISSES
+from ots.server.distributor.amqp_wait import wait_for_message
 from ots.server.distributor.exceptions import OtsQueueDoesNotExistError
+from ots.server.distributor.exceptions import OtsExecutionTimeoutError
+from ots.server.distributor.exceptions import OtsQueueTimeoutError
+from ots.server.distributor.exceptions import OtsTaskLostError
+from ots.server.distributor.exceptions import OtsTestrunCancelledError
+from ots.server.distributor.result_spool import ResultSpool, ResultSpoolError
 
 
 LOGGER = logging.getLogger(__name__)
@@ -102,6 +117,10 @@ class TaskRunner(object):
 
     The TaskRunner can only be run once.
 
+    With a Reactor the TaskRunner doesn't own an AMQP connection. 
+    `run` hands it to the Reactor which multiplexes the response 
+    queues and the timeouts of many TaskRunners in one thread. 
+
     Results from the tasks are signalled with names 
     associated with MESSAGE_TYPES.
     """
@@ -110,7 +129,11 @@ class TaskRunner(object):
                  services_exchange, port, 
                  routing_key, testrun_id, 
                  execution_timeout, queue_timeout, controller_timeout,
-                 min_worker_version = None):
+                 min_worker_version = None, reactor = None,
+                 dispatch_transaction = False,
+                 heartbeat_interval = None, heartbeat_misses = MISSES,
+                 max_retries = 0, sub_queues = None, testplan_url = None,
+                 content_type = None):
         """
         @type username: C{str}
         @param username: AMQP username 
@@ -144,6 +167,40 @@ class TaskRunner(object):
 
         @type controller_timeout: C{int}
         @param controller_timeout: The timeout for HW controllers         
+
+        @type reactor: L{ots.server.distributor.reactor.Reactor} or None
+        @param reactor: The Reactor to run in, None for a blocking run
+
+        @type dispatch_transaction: C{bool}
+        @param dispatch_transaction: Publish the Tasks in a channel 
+                                     transaction, all or none are queued
+
+        @type heartbeat_interval: C{int} or None
+        @param heartbeat_interval: Seconds between the heartbeats of the 
+                                   running Tasks, None for no heartbeats
+
+        @type heartbeat_misses: C{int}
+        @param heartbeat_misses: The number of missed heartbeats 
+                                 after which a Task is lost
+
+        @type max_retries: C{int}
+        @param max_retries: The number of times the command of a Task 
+                            lost to a silent worker is published again
+
+        @type sub_queues: C{list} of C{str} or None
+        @param sub_queues: The queues the Tasks are spread over by load, 
+                           the routing key first. 
+                           None publishes to the routing key
+
+        @type testplan_url: C{str} or None
+        @param testplan_url: The XML-RPC URL the Workers fetch 
+                             referenced test plans from
+
+        @type content_type: C{str} or None
+        @param content_type: The encoding of the messages to the Workers,
+                             None for the default. The Workers tell the
+                             encoding of their responses from the 
+                             content types advertised in the commands
         """
         #AMQP configuration
         self._username = username
@@ -156,10 +213,33 @@ class TaskRunner(object):
         self._routing_key = routing_key
         self._testrun_id = testrun_id
         #
-        self._init_amqp()
-        #List of Tasks
-        self._tasks = []
+        self._reactor = reactor
+        self._dispatch_transaction = dispatch_transaction
+        self._max_retries = max_retries
+        self._sub_queues = sub_queues
+        self._testplan_url = testplan_url
+        self._content_type = content_type
+        self._channel = None
+        self._consumer_tag = None
+        self._testrun_queue = testrun_queue_name(testrun_id)
+        if reactor is None:
+            self._init_amqp()
+        #The Tasks still to finish
+        self._tasks = TaskRegistry()
+        #task_id -> Task that missed its deadline
+        self._timed_out_tasks = {}
+        #task_id -> Task whose twin finished first
+        self._superseded_tasks = {}
+        #task_id -> Task whose worker went silent
+        self._lost_tasks = {}
+        #task_id -> Task of the cancelled testrun
+        self._cancelled_tasks = {}
+        #task_id -> the queue the Task was published to
+        self._task_queues = {}
+        self._errors = []
         self._is_run = False
+        #Chunked result files are reassembled here
+        self.result_spool = ResultSpool(testrun_id)
 
         #
         self._min_worker_version = min_worker_version
@@ -171,6 +251,9 @@ class TaskRunner(object):
         self.timeout_handler = Timeout(execution_timeout, 
                                        queue_timeout, 
                                        controller_timeout)
+        self.speculation = Speculation()
+        self.heartbeats = HeartbeatMonitor(heartbeat_interval, 
+                                           heartbeat_misses)
 
 
     #############################################
@@ -181,47 +264,374 @@ class TaskRunner(object):
         """
         Handler for AMQP messages   
         
-        Two types of messages:
+        Three types of messages:
         
             1. Indication of state changes on the Task 
-            2. Feedback from the Task itself
+            2. Chunks of result files 
+            3. Feedback from the Task itself
 
         State change messages trigger a state transition.
+        Chunks are spooled to disk, the complete file fires a signal.
         Everything else fires a signal
 
+        State changes and monitor events are rebuilt from the AMQP 
+        headers without decoding the body. 
+        Otherwise compressed messages are decompressed and batches are 
+        split by `unpack_messages`. The DTOs of a batch are handled
+        in the order they were sent
+
         @type amqp_message: amqplib.client_0_8.basic_message.Message 
         @param amqp_message: AMQP message
         """
-        msg = unpack_message(amqp_message)
+        msg = header_dto(amqp_message)
+        if msg is not None:
+            self._on_dto(msg)
+        else:
+            for msg in unpack_messages(amqp_message):
+                self._on_dto(msg)
+
+    def _on_dto(self, msg):
+        """
+        Handler for a single DTO
+
+        @type msg: C{object}
+        @param msg: The unpacked DTO
+        """
         if isinstance(msg, StateChangeMessage):
             LOGGER.debug("Received state change message %s, task %s "\
                              % (msg.condition, msg.task_id))
-            self._task_transition(msg)
+            if msg.is_heartbeat:
+                self._on_heartbeat(msg)
+            else:
+                self._task_transition(msg)
+        elif isinstance(msg, ResultsChunk):
+            self._on_results_chunk(msg)
+        elif isinstance(msg, CancelMessage):
+            self._cancel()
         else:
-            #The message is data. Relay using a signal
-            # If message is monitor message, make received timestamp
-            if isinstance(msg, Monitor):
-                msg.set_received()
-            DTO_SIGNAL.send(sender = "TaskRunner", dto = msg)
+            for dto in self.speculation.relay(msg):
+                self._relay(dto)
+
+    def _relay(self, dto):
+        """
+        The message is data. Relay using a signal
+
+        @type dto: C{object}
+        @param dto: The DTO
+        """
+        # If message is monitor message, make received timestamp
+        if isinstance(dto, Monitor):
+            dto.set_received()
+        DTO_SIGNAL.send(sender = "TaskRunner", dto = dto, 
+                        testrun_id = self._testrun_id)
+
+    def _release(self, task_id):
+        """
+        Relay the DTOs held back until the Task ended
+
+        @type task_id: C{str}
+        @param task_id: The id of the ended Task
+        """
+        for dto in self.speculation.release(task_id):
+            self._relay(dto)
   
+    def _on_results_chunk(self, chunk):
+        """
+        Spools the chunk. Relays the Results once the file is complete
+
+        @type chunk: L{ots.common.dto.results.ResultsChunk}
+        @param chunk: A chunk of a result file
+        """
+        try:
+            results = self.result_spool.add_chunk(chunk)
+        except ResultSpoolError, error:
+            LOGGER.error("Result file transfer failed: %s" % (error))
+        else:
+            if results is not None:
+                for dto in self.speculation.relay(results):
+                    self._relay(dto)
+
+    def _on_heartbeat(self, message):
+        """
+        Postpone the lost deadline of the running Task
+
+        @type message: L{StateChangeMessage}
+        @param message: The heartbeat 
+        """
+        if message.task_id in self._tasks:
+            self.heartbeats.beat(message.task_id)
+
     def _task_transition(self, message):
         """
         Processes state change message 
         """
+        if message.task_id in self._timed_out_tasks \
+                or message.task_id in self._superseded_tasks \
+                or message.task_id in self._lost_tasks \
+                or message.task_id in self._cancelled_tasks:
+            LOGGER.warning("State change '%s' of ended Task '%s' ignored"
+                           % (message.condition, message.task_id))
+            return
         if message.is_start:
-            self.timeout_handler.task_started()
+            self.timeout_handler.task_started(message.task_id)
         task = self._get_task(message.task_id)
         task.transition(message.condition)
+        if message.is_start:
+            self.speculation.task_started(task)
         if task.is_finished:
+            self.timeout_handler.task_finished(task.task_id)
+            self.heartbeats.task_ended(task.task_id)
             self._tasks.remove(task)
-    
+            twin_id = self.speculation.task_ended(task.task_id)
+            self._release(task.task_id)
+            if twin_id in self._tasks:
+                self._supersede(self._tasks.get(twin_id))
+
+    def _supersede(self, task):
+        """
+        Stop waiting for a Task whose twin has taken over
+
+        @type task: L{Task}
+        @param task: The Task to drop
+        """
+        LOGGER.info("Task '%s' superseded by its twin" % (task.task_id))
+        self._tasks.remove(task)
+        self._superseded_tasks[task.task_id] = task
+        self.timeout_handler.task_finished(task.task_id)
+        self.heartbeats.task_ended(task.task_id)
+        self.speculation.task_ended(task.task_id)
+        self.speculation.discard(task.task_id)
+
+    def _check_deadlines(self):
+        """
+        Handle the Tasks that were lost, timed out or became stragglers
+        """
+        self._check_heartbeats()
+        self._check_timeouts()
+        self._check_stragglers()
+
+    def _check_heartbeats(self):
+        """
+        Fail the Tasks whose workers have gone silent
+        without waiting for the execution timeout
+        """
+        for task_id in self.heartbeats.lost():
+            if task_id in self._tasks:
+                self._task_lost(self._tasks.get(task_id))
+
+    def _task_lost(self, task):
+        """
+        Move the Task to the lost state. The other Tasks carry on
+
+        @type task: L{Task}
+        @param task: The Task whose worker went silent
+        """
+        if self.speculation.twin(task.task_id) in self._tasks:
+            LOGGER.warning("Task '%s' lost, its twin carries on" \
+                               % (task.task_id))
+            self._supersede(task)
+            return
+        LOGGER.error("Task '%s' lost, no heartbeat for %s seconds" \
+                         % (task.task_id, self.heartbeats.silence))
+        task.transition(Task.LOST)
+        self._tasks.remove(task)
+        self._lost_tasks[task.task_id] = task
+        self.timeout_handler.task_finished(task.task_id)
+        self.speculation.task_ended(task.task_id)
+        send_monitor_event(MonitorType.TASK_LOST,
+                           __name__,
+                           task.task_id,
+                           self._testrun_id)
+        if not self._requeue(task):
+            self._release(task.task_id)
+            self._errors.append(
+                OtsTaskLostError(task.task_id, self.heartbeats.silence))
+
+    def _requeue(self, task):
+        """
+        Publish the command of a lost Task again if it has retries left.
+        The Results of the lost Task are dropped from now on
+
+        @type task: L{Task}
+        @param task: The lost Task
+
+        @rtype: C{bool}
+        @return: Whether the command was published again
+        """
+        if task.attempt > self._max_retries:
+            return False
+        retry = task.retry()
+        LOGGER.warning("Task '%s' requeued as '%s', attempt %s" \
+                           % (task.task_id, retry.task_id, retry.attempt))
+        self._tasks.add(retry)
+        self.speculation.add_retry(task.task_id, retry.task_id)
+        self.timeout_handler.start_queue_timeout([retry.task_id])
+        self._publish_tasks([retry])
+        return True
+
+    def _check_stragglers(self):
+        """
+        Publish twins of the stragglers for the idle workers
+        """
+        stragglers = [self._tasks.get(task_id) 
+                      for task_id in self.speculation.stragglers()
+                      if task_id in self._tasks]
+        if not stragglers:
+            return
+        idle = self.idle_consumers()
+        LOGGER.info("%s stragglers, %s idle workers" % (len(stragglers), idle))
+        for task in stragglers[:idle]:
+            twin = Task(task.command, self._execution_timeout, task.xml_file)
+            LOGGER.info("Task '%s' is a straggler, twin '%s'" \
+                            % (task.task_id, twin.task_id))
+            self._tasks.add(twin)
+            self.speculation.add_twin(task.task_id, twin.task_id)
+            self.timeout_handler.start_queue_timeout([twin.task_id])
+            self._publish_tasks([twin])
+
+    def _check_timeouts(self):
+        """
+        Time out the Tasks that have missed their deadline. 
+        The other Tasks carry on
+        """
+        while 1:
+            try:
+                self.timeout_handler.check()
+            except (OtsQueueTimeoutError, OtsExecutionTimeoutError), error:
+                self._task_timed_out(error)
+            else:
+                break
+
+    def _task_timed_out(self, error):
+        """
+        Move the Task of the timeout error to the timed out state 
+
+        @type error: L{OtsQueueTimeoutError} or L{OtsExecutionTimeoutError}
+        @param error: The timeout error raised for the Task
+        """
+        if error.task_id in self._tasks:
+            tasks = [self._tasks.get(error.task_id)]
+        else:
+            #A deadline for the whole testrun
+            tasks = list(self._tasks)
+        is_timed_out = False
+        for task in tasks:
+            if self.speculation.twin(task.task_id) in self._tasks:
+                LOGGER.warning("Task '%s' timed out, its twin carries on" \
+                                   % (task.task_id))
+                self._supersede(task)
+                continue
+            LOGGER.error("Task '%s' timed out" % (task.task_id))
+            task.transition(Task.TIMEOUT)
+            self._tasks.remove(task)
+            self._timed_out_tasks[task.task_id] = task
+            self.timeout_handler.task_finished(task.task_id)
+            self.heartbeats.task_ended(task.task_id)
+            self.speculation.task_ended(task.task_id)
+            self._release(task.task_id)
+            send_monitor_event(MonitorType.TASK_TIMED_OUT,
+                               __name__,
+                               task.task_id,
+                               self._testrun_id)
+            is_timed_out = True
+        if is_timed_out:
+            self._errors.append(error)
+
+    def _cancel(self):
+        """
+        Cancel the testrun. The Tasks still in the queue are purged, 
+        the workers running the others are told to kill their commands. 
+        The testrun ends with an OtsTestrunCancelledError
+        """
+        if not len(self._tasks):
+            LOGGER.warning("Testrun %s has already finished" \
+                               % (self._testrun_id))
+            return
+        LOGGER.warning("Cancelling testrun %s" % (self._testrun_id))
+        tasks = list(self._tasks)
+        waiting = {}
+        for task in tasks:
+            if task.is_waiting:
+                queue = self._task_queues.get(task.task_id, self._routing_key)
+                waiting.setdefault(queue, []).append(task.task_id)
+        purged = []
+        for queue, task_ids in waiting.items():
+            purged.extend(self._purge_tasks(queue, task_ids))
+        for task in tasks:
+            if task.task_id not in purged:
+                #The worker may have taken a waiting Task meanwhile
+                self._channel.basic_publish(
+                    pack_message(CancelMessage(self._testrun_id),
+                                 self._content_type),
+                    exchange = "",
+                    routing_key = task_control_queue_name(task.task_id))
+            task.transition(Task.CANCEL)
+            self._tasks.remove(task)
+            self._cancelled_tasks[task.task_id] = task
+            self.timeout_handler.task_finished(task.task_id)
+            self.heartbeats.task_ended(task.task_id)
+            self.speculation.task_ended(task.task_id)
+            self._release(task.task_id)
+        send_monitor_event(MonitorType.TESTRUN_CANCELLED,
+                           __name__,
+                           ",".join([task.task_id for task in tasks]),
+                           self._testrun_id)
+        #The cancel is the reason the testrun ended
+        self._errors.insert(0, OtsTestrunCancelledError(self._testrun_id))
+
+    def _purge_tasks(self, queue, task_ids):
+        """
+        Take the commands of the Tasks off the queue. 
+        The commands of other testruns are held until the queue has been 
+        gone through once and then put back
+
+        @type queue: C{str}
+        @param queue: The queue the Tasks were published to
+
+        @type task_ids: C{list} of C{str}
+        @param task_ids: The ids of the waiting Tasks
+
+        @rtype: C{list} of C{str}
+        @return: The ids of the Tasks whose commands were purged
+        """
+        purged = []
+        try:
+            count = self._channel.queue_declare(queue = queue,
+                                                passive = True)[1]
+            others = []
+            while len(purged) + len(others) < count:
+                message = self._channel.basic_get(queue = queue)
+                if message is None:
+                    break
+                tag = message.delivery_info["delivery_tag"]
+                task_id = unpack_message(message).task_id
+                if task_id in task_ids:
+                    self._channel.basic_ack(tag)
+                    purged.append(task_id)
+                else:
+                    others.append(tag)
+            for tag in others:
+                self._channel.basic_reject(tag, requeue = True)
+        except (AMQPChannelException, socket.error), error:
+            #The workers are told to cancel the Tasks left in the queue
+            LOGGER.warning("Purging '%s' failed: %s" % (queue, error))
+        LOGGER.info("Purged %s commands from '%s'" % (len(purged), queue))
+        return purged
+
+    def _raise_error(self):
+        """
+        Raise the first error of the testrun if there was one
+        """
+        if self._errors:
+            raise self._errors[0]
+
     ##########################################
     # OTHER HELPERS 
     ##########################################
 
     def _init_amqp(self):
         """
-        Make the AMQP connection. 
+        Lease an AMQP channel from the connection pool. 
         Prepare a Queue
         Start Consuming 
         """
@@ -229,20 +639,39 @@ class TaskRunner(object):
         # called from the __init__
         #pylint: disable=W0201
 
-        self._testrun_queue = testrun_queue_name(self._testrun_id)
-        self._connection = amqp.Connection(host = self._host, 
-                                           userid = self._username,
-                                           password = self._password,
-                                           virtual_host = self._vhost, 
-                                           insist = False)
-        self._channel = self._connection.channel()
+        self._channel = CONNECTION_POOL.acquire(self._host, 
+                                                self._username,
+                                                self._password,
+                                                self._vhost)
+        self._consume(self._on_message)
+
+    def _consume(self, callback):
+        """
+        Prepare the testrun queue and start consuming it
+
+        @type callback: C{callable}
+        @param callback: The handler for the AMQP messages
+        """
         _init_queue(self._channel, 
                     self._testrun_queue, 
                     self._testrun_queue, 
                     self._testrun_queue)
-        self._channel.basic_consume(queue = self._testrun_queue, 
-                                    callback = self._on_message,
-                                    no_ack = True)
+        self._consumer_tag = \
+            self._channel.basic_consume(queue = self._testrun_queue, 
+                                        callback = callback,
+                                        no_ack = True)
+
+    def _check_queue(self):
+        """
+        Raise OtsQueueDoesNotExistError if no worker serves the routing key
+        """
+        if not queue_exists(self._host, 
+                            self._username, 
+                            self._password, 
+                            self._vhost, 
+                            self._routing_key):
+            raise OtsQueueDoesNotExistError("No queue for %s" %\
+                                                (self._routing_key))
 
 
     def _get_task(self, task_id):
@@ -255,42 +684,128 @@ class TaskRunner(object):
         @rtype: L{Task}  
         @return: A Task
         """
-        return dict([(task.task_id, task) for task in self._tasks])[task_id]
+        return self._tasks.get(task_id)
         
-    def _dispatch_tasks(self):
+    def _command_messages(self, tasks):
         """
-        Publish the Tasks to the RabbitMQ
+        Encode the commands of the Tasks 
+
+        @type tasks: C{list} of L{Task}
+        @param tasks: The Tasks
+
+        @rtype: C{list} of C{amqplib.client_0_8.basic_message.Message}
+        @return: The AMQP messages in the order of the Tasks
         """
-        self.timeout_handler.start_queue_timeout()
-        for task in self._tasks:
-            log_msg = "Sending command '%s' with key '%s'" \
-                          % (task.command, self._routing_key)
-            LOGGER.debug(log_msg)
-            
-            #Send task in queue event with task id
-            send_monitor_event(MonitorType.TASK_INQUEUE,
-                               __name__,
-                               task.task_id)
-            
+        messages = []
+        for task in tasks:
+            LOGGER.debug("Sending command '%s' with key '%s'" \
+                             % (task.command, self._routing_key))
+            testplan_url = None
+            if isinstance(task.xml_file, TestPlanReference):
+                testplan_url = self._testplan_url
             cmd_msg = CommandMessage(task.command, 
                                      self._testrun_queue,
                                      task.task_id,
                                      timeout = self._execution_timeout,
                                      xml_file = task.xml_file,
                                      min_worker_version = 
-                                       self._min_worker_version)
-            message = pack_message(cmd_msg)
+                                       self._min_worker_version,
+                                     heartbeat_interval = 
+                                       self.heartbeats.interval,
+                                     attempt = task.attempt,
+                                     testplan_url = testplan_url,
+                                     content_encodings = CONTENT_ENCODINGS,
+                                     content_types = CONTENT_TYPES)
+            messages.append(pack_message(cmd_msg, self._content_type))
+        return messages
+
+    def _dispatch_tasks(self):
+        """
+        Publish the Tasks to the RabbitMQ
+
+        The commands are encoded before the first publish so that 
+        they go out in one burst, within a transaction if requested. 
+        One TASK_INQUEUE event lists the ids of all the Tasks
+        """
+        self.timeout_handler.start_queue_timeout(
+            [task.task_id for task in self._tasks])
+        self._publish_tasks(list(self._tasks))
+
+    def _publish_tasks(self, tasks):
+        """
+        Publish the commands of the Tasks in one burst
+
+        @type tasks: C{list} of L{Task}
+        @param tasks: The Tasks
+        """
+        task_ids = [task.task_id for task in tasks]
+        messages = self._command_messages(tasks)
+        queues = [self._routing_key] * len(tasks)
+        if self._sub_queues:
+            queues = self._least_loaded_queues(len(tasks))
+            for task_id, queue in zip(task_ids, queues):
+                self._task_queues[task_id] = queue
+        if self._dispatch_transaction:
+            self._channel.tx_select()
+        for message, queue in zip(messages, queues):
+            #Each sub-queue has an exchange of its own
+            exchange = self._services_exchange
+            if queue != self._routing_key:
+                exchange = queue
             self._channel.basic_publish(message, 
-                                        exchange = self._services_exchange,
-                                        routing_key = self._routing_key)
+                                        exchange = exchange,
+                                        routing_key = queue)
+        if self._dispatch_transaction:
+            self._channel.tx_commit()
+        LOGGER.debug("Sent %s commands" % (len(messages)))
+        send_monitor_event(MonitorType.TASK_INQUEUE,
+                           __name__,
+                           ",".join(task_ids),
+                           self._testrun_id)
+
+    def _least_loaded_queues(self, count):
+        """
+        Spread Tasks over the sub-queues. Each Task goes to the queue 
+        with the fewest waiting messages per consumer counting 
+        the Tasks before it. Ties go to the earlier queue
+
+        @type count: C{int}
+        @param count: The number of Tasks
+
+        @rtype: C{list} of C{str}
+        @return: The queue of each Task
+        """
+        loads = self.queue_loads()
+        queues = []
+        for i in range(count):
+            best_queue, best_load = self._routing_key, None
+            for queue in self._sub_queues:
+                messages, consumers = loads.get(queue, (0, 0))
+                if not consumers:
+                    continue
+                load = float(messages + 1) / consumers
+                if best_load is None or load < best_load:
+                    best_queue, best_load = queue, load
+            if best_load is not None:
+                messages, consumers = loads[best_queue]
+                loads[best_queue] = (messages + 1, consumers)
+            queues.append(best_queue)
+        LOGGER.debug("Tasks spread over %s" % (queues))
+        return queues
 
     def _wait_for_all_tasks(self):
         """
         Block until all Tasks are complete
+        or the deadline of a Task expires
         """
         while 1:
+            deadline = self.deadline
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.time(), 0)
             try:
-                self._channel.wait()
+                if wait_for_message(self._channel, timeout):
+                    self._channel.wait()
             except socket.error, error:
                 # interrupted system call exception need to be ignored so that
                 # testruns don't fail on apache graceful restart
@@ -298,28 +813,98 @@ class TaskRunner(object):
                     LOGGER.debug("Interrupted system call. Ignoring...")
                 else:
                     raise
-            if len(self._tasks) == 0:
+            self._check_deadlines()
+            if self.is_finished:
                 break
-    def _close(self):
+
+    def _close(self, discard = False):
         """
-        Silent close the channel and connection
+        Silent release of the channel. 
+        The pool closes it, which removes the testrun queue
+
+        @type discard: C{bool}
+        @param discard: Close the connection as well. 
+                        Used when the run was interrupted  
         """
         try:
             LOGGER.debug("Closing down")
-            self._channel.close()
-            self._connection.close()
-            # Fix Memory leaks
-            del self._channel.callbacks
-            del self._connection.channels
-            del self._connection.connection
-            self._connection = None
+            CONNECTION_POOL.release(self._channel, discard)
+            self._channel = None
         except:
             LOGGER.debug(sys.exc_info())
             
     #####################################################
     # PUBLIC METHODS 
     #####################################################
+
+    @property
+    def testrun_id(self):
+        """
+        @rtype: C{str}
+        @return: The testrun id
+        """
+        return self._testrun_id
+
+    @property
+    def is_finished(self):
+        """
+        @rtype: C{bool}
+        @return: Whether all the Tasks have finished 
+        """
+        return len(self._tasks) == 0
+
+    @property
+    def deadline(self):
+        """
+        @rtype: C{float} or None
+        @return: The time of the next timeout, straggler or heartbeat check
+        """
+        deadlines = [deadline for deadline in [self.timeout_handler.deadline,
+                                               self.speculation.deadline,
+                                               self.heartbeats.deadline]
+                     if deadline is not None]
+        if not deadlines:
+            return None
+        return min(deadlines)
+
+    @property
+    def timed_out_tasks(self):
+        """
+        @rtype: C{list} of C{str}
+        @return: The ids of the Tasks that have timed out
+        """
+        return self._timed_out_tasks.keys()
+
+    @property
+    def lost_tasks(self):
+        """
+        @rtype: C{list} of C{str}
+        @return: The ids of the Tasks whose workers went silent
+        """
+        return self._lost_tasks.keys()
     
+    def idle_consumers(self):
+        """
+        @rtype: C{int}
+        @return: The estimated number of idle workers on the routing key
+        """
+        return idle_consumers(self._host, 
+                              self._username, 
+                              self._password, 
+                              self._vhost, 
+                              self._routing_key)
+
+    def queue_loads(self):
+        """
+        @rtype: C{dict} of C{str} : (C{int}, C{int})
+        @return: The waiting messages and consumers of the sub-queues
+        """
+        return queue_loads(self._host, 
+                           self._username, 
+                           self._password, 
+                           self._vhost, 
+                           self._sub_queues)
+
     def add_task(self, command):
         """
         Add a Task to be run
@@ -331,10 +916,17 @@ class TaskRunner(object):
             raise TaskRunnerException("This TaskRunner has already been run")
         if isinstance(command, Task):
             command.set_timeout(self._execution_timeout)
-            self._tasks.append(command)
+            self._tasks.add(command)
         else:
-            self._tasks.append(Task(command, self._execution_timeout))
+            self._tasks.add(Task(command, self._execution_timeout))
         
+    def clean_up(self):
+        """
+        Removes the spooled result files. 
+        Call once the Results are no longer needed
+        """
+        self.result_spool.clean_up()
+
     def run(self):
         """
         Sends the Tasks to the queue
@@ -345,20 +937,91 @@ class TaskRunner(object):
             raise TaskRunnerException("This TaskRunner has already been run")
         self._is_run = True 
 
-        if not queue_exists(self._host, 
-                            self._username, 
-                            self._password, 
-                            self._vhost, 
-                            self._routing_key):
-            raise OtsQueueDoesNotExistError("No queue for %s" %\
-                                                (self._routing_key))
+        if self._reactor is not None:
+            self._reactor.run(self)
+            return
+
+        self._check_queue()
         LOGGER.debug("Sending Tasks")
+        completed = False
         try:
             self._dispatch_tasks()
             self._wait_for_all_tasks()
+            completed = True
+            self._raise_error()
             LOGGER.info("All Tasks completed")
         finally:
-            send_monitor_event(MonitorType.TESTRUN_ENDED, __name__)
+            send_monitor_event(MonitorType.TESTRUN_ENDED, __name__,
+                               testrun_id = self._testrun_id)
             LOGGER.debug("stopping...")
             self.timeout_handler.stop()
-            self._close()
+            self.heartbeats.clear()
+            self._close(discard = not completed)
+
+    #####################################################
+    # REACTOR INTERFACE 
+    #####################################################
+
+    def start(self, channel, callback):
+        """
+        Start the run on a channel shared with other TaskRunners.
+        Called by the Reactor
+
+        @type channel: C{amqplib.client_0_8.channel.Channel}
+        @param channel: The shared AMQP channel
+
+        @type callback: C{callable}
+        @param callback: The handler for the AMQP messages. 
+                         Delegates to L{on_message}
+
+        @rtype: C{str}
+        @return: The consumer tag of the testrun queue
+        """
+        self._check_queue()
+        self._channel = channel
+        self._consume(callback)
+        LOGGER.debug("Sending Tasks")
+        self._dispatch_tasks()
+        return self._consumer_tag
+
+    def on_message(self, amqp_message):
+        """
+        Handle an AMQP message delivered by the Reactor
+
+        @type amqp_message: amqplib.client_0_8.basic_message.Message 
+        @param amqp_message: AMQP message
+        """
+        self._on_message(amqp_message)
+
+    def check(self):
+        """
+        Time out the Tasks that have missed their deadline, fail the
+        lost Tasks and twin the stragglers. Called by the Reactor
+
+        Raises the first error once the other Tasks are done
+
+        @rtype: C{bool}
+        @return: Whether the run has finished
+        """
+        self._check_deadlines()
+        if not self.is_finished:
+            return False
+        self._raise_error()
+        return True
+
+    def finish(self):
+        """
+        Stop consuming the testrun queue. Called by the Reactor
+        """
+        send_monitor_event(MonitorType.TESTRUN_ENDED, __name__,
+                           testrun_id = self._testrun_id)
+        self.timeout_handler.stop()
+        self.heartbeats.clear()
+        if self._consumer_tag is not None:
+            try:
+                #The auto delete queue goes with the consumer
+                self._channel.basic_cancel(self._consumer_tag)
+            except:
+                LOGGER.debug(sys.exc_info())
+        self._consumer_tag = None
+        self._channel = None
@@ -26,8 +26,114 @@ Factory method to create TaskRunner from a config file
 
 import configobj
 
+from ots.common.routing.api import get_sub_queues, PRIORITY_SEPARATOR
+from ots.common.amqp.api import PICKLE_CONTENT_TYPE, DTO_CONTENT_TYPE
+
 from ots.server.server_config_filename import server_config_filename
+from ots.server.testplans import testplan_url
 from ots.server.distributor.taskrunner import TaskRunner
+from ots.server.distributor.reactor import get_reactor
+from ots.server.distributor.heartbeat_monitor import MISSES
+
+#The distributor modes 
+PROCESS_MODE = "process"
+REACTOR_MODE = "reactor"
+
+#The routing of the Tasks
+STATIC_ROUTING = "static"
+LOAD_AWARE_ROUTING = "load_aware"
+
+#The encodings of the commands sent to the workers
+COMMAND_ENCODINGS = {"pickle" : PICKLE_CONTENT_TYPE,
+                     "dto" : DTO_CONTENT_TYPE}
+
+def distributor_config(config_file = None):
+    """
+    @type config_file: C{str}  
+    @param config_file: The fqname of the config file
+
+    @rtype: C{configobj.Section}  
+    @return: The ots.server.distributor section of the config file
+    """
+    if not config_file:
+        config_file = server_config_filename()
+    return configobj.ConfigObj(config_file).get("ots.server.distributor")
+
+def is_reactor_mode(config_file = None):
+    """
+    @type config_file: C{str}  
+    @param config_file: The fqname of the config file
+
+    @rtype: C{bool}  
+    @return: Whether the testruns share a Reactor in one process
+    """
+    config = distributor_config(config_file) or {}
+    return config.get("mode", PROCESS_MODE) == REACTOR_MODE
+
+def _as_bool(config, key, default = False):
+    """
+    @type config: C{configobj.Section}  
+    @param config: The distributor config
+
+    @type key: C{str}  
+    @param key: The name of an optional boolean option
+
+    @rtype: C{bool}  
+    @return: The value of the option
+    """
+    if key not in config:
+        return default
+    return config.as_bool(key)
+
+def _as_int(config, key, default = None):
+    """
+    @type config: C{configobj.Section}  
+    @param config: The distributor config
+
+    @type key: C{str}  
+    @param key: The name of an optional integer option
+
+    @rtype: C{int} or None
+    @return: The value of the option
+    """
+    if key not in config:
+        return default
+    return config.as_int(key)
+
+def _sub_queues(config, routing_key):
+    """
+    @type config: C{configobj.Section}  
+    @param config: The distributor config
+
+    @type routing_key : C{str}  
+    @param routing_key : The routing_key for the Task
+
+    @rtype: C{list} of C{str} or None
+    @return: The queues to spread the Tasks over with load aware routing
+    """
+    if config.get("routing", STATIC_ROUTING) != LOAD_AWARE_ROUTING:
+        return None
+    devicegroup = routing_key.split(PRIORITY_SEPARATOR)[0]
+    devicenames = config.get("devicenames", {})
+    if devicegroup not in devicenames:
+        return None
+    queues = get_sub_queues(routing_key, devicenames.as_list(devicegroup))
+    if len(queues) < 2:
+        return None
+    return queues
+
+def _command_content_type(config):
+    """
+    @type config: C{configobj.Section}  
+    @param config: The distributor config
+
+    @rtype: C{str}
+    @return: The content type of the commands sent to the workers
+    """
+    encoding = config.get("command_encoding", "pickle")
+    if encoding not in COMMAND_ENCODINGS:
+        raise ValueError("Unknown command_encoding '%s'" % (encoding))
+    return COMMAND_ENCODINGS[encoding]
 
 def taskrunner_factory(routing_key,
                        execution_timeout,
@@ -51,10 +157,13 @@ def taskrunner_factory(routing_key,
     @rtype: L{TaskRunner}  
     @return: The TaskRunner
     """
-    if not config_file:
-        config_file = server_config_filename()
-
-    config = configobj.ConfigObj(config_file).get("ots.server.distributor")
+    config = distributor_config(config_file)
+    reactor = None
+    if config.get("mode", PROCESS_MODE) == REACTOR_MODE:
+        reactor = get_reactor(config["host"],
+                              config["username"],
+                              config["password"],
+                              config["vhost"])
 
     taskrunner = TaskRunner(username = config["username"],
                             password = config["password"],
@@ -67,7 +176,18 @@ def taskrunner_factory(routing_key,
                             execution_timeout = execution_timeout,
                             queue_timeout = config.as_int("timeout_task_start"),
                             controller_timeout = \
-                                config.as_int("timeout_for_preparation"))
+                                config.as_int("timeout_for_preparation"),
+                            reactor = reactor,
+                            dispatch_transaction = \
+                                _as_bool(config, "dispatch_transaction"),
+                            heartbeat_interval = \
+                                _as_int(config, "heartbeat_interval"),
+                            heartbeat_misses = \
+                                _as_int(config, "heartbeat_misses", MISSES),
+                            max_retries = _as_int(config, "max_retries", 0),
+                            sub_queues = _sub_queues(config, routing_key),
+                            testplan_url = testplan_url(config_file),
+                            content_type = _command_content_type(config))
     return taskrunner
 
 
@@ -0,0 +1,154 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Component Test of the DTO encoding. 
+
+The messages of a Task go through the TaskRunner, the TaskBroker 
+and the ResponseClient of the conductor the way they do in a 
+deployment, only the AMQP channels are stubbed. 
+No RabbitMQ server is needed.
+"""
+
+import os
+import tempfile
+import unittest
+
+from ots.common.amqp.api import DTO_CONTENT_TYPE
+from ots.common.dto.api import Results, Packages
+from ots.common.routing.routing import DEVICE_GROUP
+
+from ots.server.distributor.api import DTO_SIGNAL
+from ots.server.distributor.task import Task
+from ots.server.distributor.taskrunner import TaskRunner
+
+from ots.worker import responseclient
+from ots.worker.task_broker import TaskBroker
+from ots.worker.responseclient import ResponseClient
+
+class ChannelStub(object):
+
+    def __init__(self):
+        self.msgs = []
+
+    def basic_publish(self, msg, mandatory = False, 
+                      exchange = None, routing_key = None):
+        self.msgs.append(msg)
+
+    def basic_ack(self, delivery_tag):
+        pass
+
+    def queue_declare(self, queue, durable, exclusive, auto_delete):
+        pass
+
+    def queue_delete(self, queue):
+        pass
+
+    def basic_get(self, queue, no_ack):
+        return None
+
+class ConnectionStub(object):
+
+    def __init__(self):
+        self.channel = ChannelStub()
+
+    def clone(self):
+        return ConnectionStub()
+
+    def clean_up(self):
+        pass
+
+
+class TestDTOContentType(unittest.TestCase):
+
+    def setUp(self):
+        self.dtos = []
+        DTO_SIGNAL.connect(self._on_dto)
+        fd, self.env_file = tempfile.mkstemp()
+        os.close(fd)
+        #With a reactor the TaskRunner does not connect
+        self.taskrunner = TaskRunner("guest", "guest", "localhost",
+                                     "/", "ots", 5672, "test_dto", 
+                                     1, 100, 100, 100, reactor = object(),
+                                     content_type = DTO_CONTENT_TYPE)
+        self.taskrunner._channel = ChannelStub()
+        self.connection = ConnectionStub()
+        self.task_broker = TaskBroker(self.connection, {DEVICE_GROUP : "test"})
+
+    def tearDown(self):
+        DTO_SIGNAL.disconnect(self._on_dto)
+        os.remove(self.env_file)
+
+    def _on_dto(self, signal, dto, **kwargs):
+        self.dtos.append(dto)
+
+    def _conductor_environment(self):
+        environment = {}
+        for line in open(self.env_file):
+            name, value = line.rstrip("\n").split("=", 1)
+            if name.startswith("OTS_"):
+                environment[name] = value
+        return environment
+
+    def test_testrun(self):
+        #The command records the environment the conductor would get
+        task = Task(["env > %s" % (self.env_file)])
+        self.taskrunner.add_task(task)
+        self.taskrunner._dispatch_tasks()
+        cmd_msg = self.taskrunner._channel.msgs[0]
+        self.assertEquals(DTO_CONTENT_TYPE, cmd_msg.properties["content_type"])
+        cmd_msg.delivery_tag = 1
+        self.task_broker._handle_message(cmd_msg)
+        worker_msgs = self.connection.channel.msgs
+        #Monitor and state change for the start and the end
+        self.assertEquals(4, len(worker_msgs))
+
+        environment = self._conductor_environment()
+        self.assertEquals(task.task_id, 
+                          environment[responseclient.TASK_ID_VARIABLE])
+        os.environ.update(environment)
+        try:
+            client = ResponseClient("localhost", self.taskrunner.testrun_id)
+        finally:
+            for name in environment:
+                del os.environ[name]
+        client.channel = ChannelStub()
+        client.add_result("results.xml", "<xml/>", test_package = "pkg1")
+        client.add_executed_packages("hardware", ["pkg1"])
+        client.flush()
+        conductor_msgs = client.channel.msgs
+
+        for msg in worker_msgs[:2] + conductor_msgs + worker_msgs[2:]:
+            self.assertEquals(DTO_CONTENT_TYPE, msg.properties["content_type"])
+            self.taskrunner._on_message(msg)
+        self.assertTrue(task.is_finished)
+        self.assertTrue(self.taskrunner.check())
+        results = [dto for dto in self.dtos if isinstance(dto, Results)]
+        self.assertEquals(["results.xml"], [dto.name for dto in results])
+        self.assertEquals(task.task_id, results[0].task_id)
+        packages = [dto for dto in self.dtos if isinstance(dto, Packages)]
+        self.assertEquals([["pkg1"]], [dto.packages("hardware") 
+                                       for dto in packages])
+
+
+if __name__ == "__main__":
+    unittest.main()
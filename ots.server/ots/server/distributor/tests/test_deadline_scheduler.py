@@ -0,0 +1,80 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+import unittest
+
+from ots.server.distributor.deadline_scheduler import DeadlineScheduler
+
+class TestDeadlineScheduler(unittest.TestCase):
+
+    def test_schedule(self):
+        scheduler = DeadlineScheduler()
+        self.assertEquals(None, scheduler.next_deadline)
+        scheduler.schedule("b", 20, "value_b")
+        scheduler.schedule("a", 10, "value_a")
+        self.assertEquals(2, len(scheduler))
+        self.assertTrue("a" in scheduler)
+        self.assertEquals(10, scheduler.next_deadline)
+        self.assertEquals("a", scheduler.peek())
+        self.assertEquals(20, scheduler.deadline("b"))
+        self.assertEquals(("a", "value_a"), scheduler.pop())
+        self.assertEquals(("b", "value_b"), scheduler.pop())
+        self.assertEquals(0, len(scheduler))
+
+    def test_reschedule(self):
+        scheduler = DeadlineScheduler()
+        scheduler.schedule("a", 10)
+        scheduler.schedule("b", 20)
+        scheduler.schedule("a", 30)
+        self.assertEquals(2, len(scheduler))
+        self.assertEquals(20, scheduler.next_deadline)
+        self.assertEquals(["b", "a"], 
+                          [scheduler.pop()[0], scheduler.pop()[0]])
+
+    def test_cancel(self):
+        scheduler = DeadlineScheduler()
+        scheduler.schedule("a", 10)
+        scheduler.schedule("b", 20)
+        scheduler.cancel("a")
+        scheduler.cancel("no_such_key")
+        self.assertFalse("a" in scheduler)
+        self.assertEquals(["b"], scheduler.keys())
+        self.assertEquals(20, scheduler.next_deadline)
+
+    def test_pop_expired(self):
+        scheduler = DeadlineScheduler()
+        for deadline in [30, 10, 20, 40]:
+            scheduler.schedule(deadline, deadline)
+        self.assertEquals([10, 20], 
+                          [key for key, value in scheduler.pop_expired(25)])
+        self.assertEquals([], scheduler.pop_expired(25))
+        self.assertEquals(30, scheduler.next_deadline)
+
+    def test_clear(self):
+        scheduler = DeadlineScheduler()
+        scheduler.schedule("a", 10)
+        scheduler.clear()
+        self.assertEquals(None, scheduler.next_deadline)
+        self.assertRaises(IndexError, scheduler.pop)
+
+if __name__ == "__main__":
+    unittest.main()
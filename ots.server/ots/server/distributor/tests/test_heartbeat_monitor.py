@@ -0,0 +1,62 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+import unittest
+
+from ots.server.distributor.heartbeat_monitor import HeartbeatMonitor
+
+class TestHeartbeatMonitor(unittest.TestCase):
+
+    def test_lost(self):
+        monitor = HeartbeatMonitor(10, 3)
+        self.assertEquals(None, monitor.deadline)
+        monitor.beat("t1", now = 100)
+        monitor.beat("t2", now = 105)
+        self.assertEquals(130, monitor.deadline)
+        self.assertEquals([], monitor.lost(now = 129))
+        self.assertEquals(["t1"], monitor.lost(now = 130))
+        self.assertEquals(["t2"], monitor.lost(now = 200))
+        self.assertEquals([], monitor.lost(now = 300))
+
+    def test_beat_postpones(self):
+        monitor = HeartbeatMonitor(10, 2)
+        monitor.beat("t1", now = 100)
+        monitor.beat("t1", now = 115)
+        self.assertEquals([], monitor.lost(now = 125))
+        self.assertEquals(["t1"], monitor.lost(now = 135))
+
+    def test_task_ended(self):
+        monitor = HeartbeatMonitor(10)
+        monitor.beat("t1", now = 100)
+        monitor.task_ended("t1")
+        self.assertEquals(None, monitor.deadline)
+        self.assertEquals([], monitor.lost(now = 1000))
+
+    def test_disabled(self):
+        monitor = HeartbeatMonitor()
+        self.assertFalse(monitor.is_enabled)
+        monitor.beat("t1", now = 100)
+        self.assertEquals(None, monitor.deadline)
+
+
+if __name__ == "__main__":
+    unittest.main()
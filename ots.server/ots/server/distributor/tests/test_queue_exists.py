@@ -29,6 +29,8 @@ import unittest
 from amqplib import client_0_8 as amqp
 
 from ots.server.distributor.queue_exists import queue_exists 
+from ots.server.distributor.queue_exists import idle_consumers
+from ots.server.distributor.queue_exists import queue_loads
 
 class TestQueueExists(unittest.TestCase):
 
@@ -60,5 +62,18 @@ class TestQueueExists(unittest.TestCase):
                               self.virtual_host, "nokia")
         self.assertFalse(exists) 
 
+    def test_idle_consumers(self):
+        self.assertEquals(0, idle_consumers(self.host, self.user_id, 
+                                            self.password, 
+                                            self.virtual_host, "foo"))
+        self.assertEquals(0, idle_consumers(self.host, self.user_id, 
+                                            self.password, 
+                                            self.virtual_host, "nokia"))
+
+    def test_queue_loads(self):
+        loads = queue_loads(self.host, self.user_id, self.password, 
+                            self.virtual_host, ["nokia", "foo"])
+        self.assertEquals(["foo"], loads.keys())
+
 if __name__ == "__main__":
     unittest.main() 
@@ -0,0 +1,189 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+import socket
+import threading
+import unittest
+import Queue
+
+from ots.server.distributor.reactor import Reactor
+from ots.server.distributor.timeout import Timeout
+from ots.server.distributor.exceptions import OtsQueueTimeoutError
+
+class TransportStub(object):
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._read_buffer = ""
+
+class MethodReaderStub(object):
+
+    def __init__(self):
+        self.queue = Queue.Queue()
+
+class ConnectionStub(object):
+
+    def __init__(self, sock):
+        self.transport = TransportStub(sock)
+        self.method_reader = MethodReaderStub()
+
+class ChannelStub(object):
+    """Each byte on the socket is a message for all the consumers"""
+
+    def __init__(self, sock):
+        self.connection = ConnectionStub(sock)
+        self.method_queue = []
+        self.callbacks = []
+
+    def wait(self):
+        message = self.connection.transport.sock.recv(1)
+        for callback in self.callbacks[:]:
+            callback(message)
+
+
+class TaskRunnerStub(object):
+
+    def __init__(self, tasks, queue_timeout = 60):
+        self.tasks = tasks
+        self.testrun_id = "testrun_%s" % (tasks)
+        self.is_finish_called = False
+        self.timeout_handler = Timeout(60, queue_timeout, 60)
+
+    def start(self, channel, callback):
+        channel.callbacks.append(callback)
+        self.timeout_handler.start_queue_timeout()
+        return "tag_%s" % (id(self))
+
+    def on_message(self, message):
+        if message == "e":
+            raise ValueError("bad message")
+        self.tasks -= 1
+
+    @property
+    def is_finished(self):
+        return self.tasks <= 0
+
+    @property
+    def deadline(self):
+        return self.timeout_handler.deadline
+
+    def check(self):
+        self.timeout_handler.check()
+        return self.is_finished
+
+    def finish(self):
+        self.is_finish_called = True
+        self.timeout_handler.stop()
+
+
+class BrokenCheckStub(TaskRunnerStub):
+
+    def check(self):
+        raise socket.error("connection reset")
+
+
+class TestReactor(unittest.TestCase):
+
+    def setUp(self):
+        self.reactor = Reactor("localhost", "guest", "guest", "/")
+        self.sock, self.peer = socket.socketpair()
+        self.reactor._channel = ChannelStub(self.sock)
+        self.errors = []
+
+    def tearDown(self):
+        self.sock.close()
+        self.peer.close()
+
+    def _run_in_thread(self, taskrunner):
+        def run():
+            try:
+                self.reactor.run(taskrunner)
+            except Exception, error:
+                self.errors.append(error)
+        thread = threading.Thread(target = run)
+        thread.start()
+        return thread
+
+    def _wait_active(self, active):
+        for i in range(500):
+            if self.reactor.active == active:
+                return
+            threading.Event().wait(0.01)
+        self.fail("Reactor has %s runs" % (self.reactor.active))
+
+    def test_run_many(self):
+        taskrunners = [TaskRunnerStub(2), TaskRunnerStub(3)]
+        threads = [self._run_in_thread(taskrunner) 
+                   for taskrunner in taskrunners]
+        self._wait_active(2)
+        self.peer.send("mm")
+        self._wait_active(1)
+        self.assertTrue(taskrunners[0].is_finish_called)
+        self.assertFalse(taskrunners[1].is_finish_called)
+        self.peer.send("m")
+        for thread in threads:
+            thread.join(5)
+        self.assertTrue(taskrunners[1].is_finish_called)
+        self.assertEquals([], self.errors)
+        self.assertEquals(0, self.reactor.active)
+
+    def test_timeout(self):
+        taskrunner = TaskRunnerStub(1, queue_timeout = 0)
+        self.assertRaises(OtsQueueTimeoutError, self.reactor.run, taskrunner)
+        self.assertTrue(taskrunner.is_finish_called)
+
+    def test_error_finishes_only_its_run(self):
+        failing = TaskRunnerStub(2)
+        thread = self._run_in_thread(failing)
+        self._wait_active(1)
+        self.peer.send("e")
+        thread.join(5)
+        self.assertTrue(isinstance(self.errors[0], ValueError))
+        self.assertTrue(failing.is_finish_called)
+        taskrunner = TaskRunnerStub(1)
+        thread = self._run_in_thread(taskrunner)
+        self._wait_active(1)
+        self.peer.send("m")
+        thread.join(5)
+        self.assertTrue(taskrunner.is_finish_called)
+        self.assertEquals(1, len(self.errors))
+
+    def test_check_error_finishes_only_its_run(self):
+        taskrunner = TaskRunnerStub(2)
+        failing = BrokenCheckStub(2)
+        threads = [self._run_in_thread(taskrunner), 
+                   self._run_in_thread(failing)]
+        self._wait_active(2)
+        self.peer.send("m")
+        threads[1].join(5)
+        self.assertTrue(failing.is_finish_called)
+        self.assertTrue(isinstance(self.errors[0], socket.error))
+        self.assertEquals(1, self.reactor.active)
+        self.assertFalse(taskrunner.is_finish_called)
+        self.peer.send("m")
+        threads[0].join(5)
+        self.assertTrue(taskrunner.is_finish_called)
+        self.assertEquals(1, len(self.errors))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+import os
+import shutil
+import hashlib
+import unittest
+import tempfile
+
+from ots.common.dto.api import ResultsChunk, SpooledResults
+from ots.server.distributor.result_spool import ResultSpool, ResultSpoolError
+
+def _chunks(transfer_id, content, size):
+    """Split the content into ResultsChunks"""
+    pieces = [content[i:i + size] for i in range(0, len(content), size)]
+    chunks = []
+    for sequence, piece in enumerate(pieces):
+        chunks.append(ResultsChunk(transfer_id, sequence, piece, "foo.xml",
+                                   package = "pkg-tests", 
+                                   hostname = "worker",
+                                   environment = "hardware"))
+    chunks[-1].checksum = hashlib.md5(content).hexdigest()
+    return chunks
+
+class TestResultSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spool = ResultSpool("1", self.directory)
+
+    def tearDown(self):
+        self.spool.clean_up()
+        shutil.rmtree(self.directory)
+
+    def test_add_chunk(self):
+        content = "<xml>foo</xml>" * 100
+        chunks = _chunks("a", content, 64)
+        for chunk in chunks[:-1]:
+            self.assertEquals(None, self.spool.add_chunk(chunk))
+        results = self.spool.add_chunk(chunks[-1])
+        self.assertTrue(isinstance(results, SpooledResults))
+        self.assertEquals("foo.xml", results.name)
+        self.assertEquals("pkg-tests", results.package)
+        self.assertEquals("worker", results.hostname)
+        self.assertEquals("hardware", results.environment.environment)
+        self.assertEquals(content, results.content)
+
+    def test_interleaved_transfers(self):
+        chunks_a = _chunks("a", "a" * 100, 10)
+        chunks_b = _chunks("b", "b" * 100, 10)
+        for chunk_a, chunk_b in zip(chunks_a, chunks_b):
+            results_a = self.spool.add_chunk(chunk_a)
+            results_b = self.spool.add_chunk(chunk_b)
+        self.assertEquals("a" * 100, results_a.content)
+        self.assertEquals("b" * 100, results_b.content)
+
+    def test_missing_chunk(self):
+        chunks = _chunks("a", "a" * 100, 10)
+        self.spool.add_chunk(chunks[0])
+        self.assertRaises(ResultSpoolError, self.spool.add_chunk, chunks[2])
+        self.assertEquals([], os.listdir(self.spool.spool_dir))
+
+    def test_missing_first_chunk(self):
+        chunks = _chunks("a", "a" * 100, 10)
+        self.assertRaises(ResultSpoolError, self.spool.add_chunk, chunks[1])
+
+    def test_checksum_mismatch(self):
+        chunks = _chunks("a", "a" * 100, 10)
+        chunks[-1].checksum = "0"
+        for chunk in chunks[:-1]:
+            self.spool.add_chunk(chunk)
+        self.assertRaises(ResultSpoolError, self.spool.add_chunk, chunks[-1])
+        self.assertEquals([], os.listdir(self.spool.spool_dir))
+
+    def test_clean_up(self):
+        chunks = _chunks("a", "a" * 100, 10)
+        self.spool.add_chunk(chunks[0])
+        spool_dir = self.spool.spool_dir
+        self.spool.clean_up()
+        self.assertFalse(os.path.exists(spool_dir))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+import unittest
+
+from ots.common.dto.api import Results, Packages, Monitor
+
+from ots.server.distributor.task import Task
+from ots.server.distributor.speculation import Speculation
+
+class TestSpeculation(unittest.TestCase):
+
+    def test_stragglers(self):
+        speculation = Speculation()
+        task_1 = Task(["1"], expected_duration = 10)
+        task_2 = Task(["2"])
+        speculation.task_started(task_1, 100)
+        speculation.task_started(task_2, 100)
+        self.assertEquals(110, speculation.deadline)
+        self.assertEquals([], speculation.stragglers(109))
+        self.assertEquals([task_1.task_id], speculation.stragglers(110))
+        self.assertEquals(None, speculation.deadline)
+
+    def test_twins(self):
+        speculation = Speculation()
+        task = Task(["1"], expected_duration = 10)
+        twin = Task(["1"], expected_duration = 10)
+        speculation.add_twin(task.task_id, twin.task_id)
+        #A twin is not twinned again
+        speculation.task_started(twin, 100)
+        self.assertEquals(None, speculation.deadline)
+        self.assertEquals(task.task_id, speculation.twin(twin.task_id))
+        self.assertEquals(task.task_id, speculation.task_ended(twin.task_id))
+        self.assertEquals(None, speculation.twin(task.task_id))
+
+    def _results(self, task_id, package = "pkg1-tests"):
+        return Results("results.xml", "<xml/>", package, "host1", 
+                       "hardware", task_id)
+
+    def test_relay(self):
+        speculation = Speculation()
+        results = self._results("1")
+        self.assertEquals([results], speculation.relay(results))
+        #Without twins nothing is dropped
+        self.assertEquals([results], speculation.relay(results))
+        monitor = Monitor()
+        self.assertEquals([monitor], speculation.relay(monitor))
+
+    def test_winner_is_relayed(self):
+        speculation = Speculation()
+        speculation.task_started(Task(["1"], expected_duration = 10), 100)
+        task_id = speculation.stragglers(110)[0]
+        speculation.add_twin(task_id, "2")
+        self.assertEquals([], speculation.relay(self._results(task_id)))
+        twin_results = self._results("2")
+        twin_packages = Packages("hardware", ["pkg1-tests"], "2")
+        self.assertEquals([], speculation.relay(twin_results))
+        self.assertEquals([], speculation.relay(twin_packages))
+        speculation.task_ended("2")
+        self.assertEquals([twin_results, twin_packages], 
+                          speculation.release("2"))
+        speculation.discard(task_id)
+        self.assertEquals([], speculation.release(task_id))
+        self.assertEquals([], speculation.relay(self._results(task_id)))
+
+    def test_other_tasks_are_relayed(self):
+        speculation = Speculation()
+        speculation.add_twin("1", "2")
+        results = self._results("3")
+        self.assertEquals([results], speculation.relay(results))
+        results = self._results("4")
+        self.assertEquals([results], speculation.relay(results))
+
+    def test_relay_without_task_id(self):
+        speculation = Speculation()
+        results = self._results(None)
+        self.assertEquals([results], speculation.relay(results))
+        speculation.add_twin("1", "2")
+        self.assertEquals([], speculation.relay(self._results(None)))
+        results = self._results(None, "pkg2-tests")
+        self.assertEquals([results], speculation.relay(results))
+
+    def test_relay_after_retry(self):
+        speculation = Speculation()
+        packages = Packages("hardware", ["pkg1-tests"], "1")
+        self.assertEquals([packages], speculation.relay(packages))
+        speculation.add_retry("1", "2")
+        self.assertEquals([], speculation.relay(self._results("1")))
+        self.assertEquals([], speculation.relay(
+                Packages("hardware", ["pkg1-tests"], "2")))
+        results = self._results("2")
+        self.assertEquals([results], speculation.relay(results))
+        #The next retry inherits from both attempts
+        speculation.add_retry("2", "3")
+        self.assertEquals([], speculation.relay(self._results("3")))
+        self.assertEquals([], speculation.relay(
+                Packages("hardware", ["pkg1-tests"], "3")))
+        packages = Packages("hardware", ["pkg1-tests"], "4")
+        self.assertEquals([packages], speculation.relay(packages))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,7 +22,7 @@
 
 import unittest
 
-from ots.server.distributor.task import Task, TaskException
+from ots.server.distributor.task import Task, TaskException, TaskRegistry
 from ots.common.dto.api import TaskCondition
 
 class TestTask(unittest.TestCase):
@@ -37,11 +37,84 @@ class TestTask(unittest.TestCase):
         self.assertRaises(TaskException, task.transition, "foo")
         self.assertRaises(TaskException, task.transition, TaskCondition.START)
     
+    def test_timeout(self):
+        task = Task([1], 0)
+        task.transition(Task.TIMEOUT)
+        self.assertTrue(task.is_timed_out)
+        self.assertFalse(task.is_finished)
+        task = Task([1], 0)
+        task.transition(TaskCondition.START)
+        task.transition(Task.TIMEOUT)
+        self.assertTrue(task.is_timed_out)
+        self.assertRaises(TaskException, task.transition, 
+                          TaskCondition.FINISH)
+
+    def test_lost(self):
+        task = Task([1], 0)
+        self.assertRaises(TaskException, task.transition, Task.LOST)
+        task.transition(TaskCondition.START)
+        task.transition(Task.LOST)
+        self.assertTrue(task.is_lost)
+        self.assertFalse(task.is_finished)
+        self.assertRaises(TaskException, task.transition, 
+                          TaskCondition.FINISH)
+
+    def test_cancel(self):
+        waiting = Task([1], 0)
+        self.assertTrue(waiting.is_waiting)
+        waiting.transition(Task.CANCEL)
+        self.assertTrue(waiting.is_cancelled)
+        started = Task([1], 0)
+        started.transition(TaskCondition.START)
+        self.assertFalse(started.is_waiting)
+        started.transition(Task.CANCEL)
+        self.assertTrue(started.is_cancelled)
+        self.assertRaises(TaskException, started.transition, 
+                          TaskCondition.FINISH)
+
+    def test_retry(self):
+        task = Task([1], 10, expected_duration = 5)
+        task.transition(TaskCondition.START)
+        retry = task.retry()
+        self.assertEquals([1], retry.command)
+        self.assertEquals(5, retry.expected_duration)
+        self.assertEquals(2, retry.attempt)
+        self.assertNotEquals(task.task_id, retry.task_id)
+        self.assertEquals(task._WAITING, retry.current_state)
+        self.assertEquals(3, retry.retry().attempt)
+
     def test_is_finished(self):
         task = Task([1], 0)
         self.assertFalse(task.is_finished)
         task.current_state = task._FINISHED
         self.assertTrue(task.is_finished)
+
+    def test_slots(self):
+        task = Task([1], 0)
+        self.assertFalse(hasattr(task, "__dict__"))
+
+
+class TestTaskRegistry(unittest.TestCase):
+
+    def test_add_get_remove(self):
+        tasks = [Task([i]) for i in range(3)]
+        registry = TaskRegistry(tasks)
+        self.assertEquals(3, len(registry))
+        self.assertTrue(tasks[1].task_id in registry)
+        self.assertEquals(tasks[1], registry.get(tasks[1].task_id))
+        registry.remove(tasks[1])
+        self.assertFalse(tasks[1].task_id in registry)
+        self.assertRaises(KeyError, registry.get, tasks[1].task_id)
+        self.assertEquals([tasks[0], tasks[2]], list(registry))
+        self.assertRaises(TaskException, registry.add, tasks[0])
+
+    def test_order_after_many_removals(self):
+        tasks = [Task([i]) for i in range(100)]
+        registry = TaskRegistry(tasks)
+        for task in tasks[:90]:
+            registry.remove(task)
+        registry.add(tasks[0])
+        self.assertEquals(tasks[90:] + [tasks[0]], list(registry))
         
 if __name__ == "__main__":
     unittest.main()
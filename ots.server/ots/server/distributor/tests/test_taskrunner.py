@@ -30,16 +30,21 @@ import time
 from pickle import dumps, loads
 
 from amqplib import client_0_8 as amqp
+from amqplib.client_0_8.exceptions import AMQPChannelException
 
 from ots.common.dto.api import StateChangeMessage, TaskCondition
+from ots.common.dto.api import MonitorType, Packages, Results
+from ots.common.dto.api import CommandMessage, CancelMessage
 from ots.server.distributor.api import DTO_SIGNAL
-from ots.common.amqp.codec import pack_message
+from ots.common.amqp.codec import pack_message, unpack_message
+from ots.common.testplan_store import TestPlanReference
 
-from ots.server.distributor.task import Task
+from ots.server.distributor.task import Task, TaskRegistry
 from ots.server.distributor.taskrunner import TaskRunner
 from ots.server.distributor.taskrunner import _init_queue, TaskRunnerException
 from ots.server.distributor.exceptions import OtsQueueDoesNotExistError, \
-    OtsExecutionTimeoutError, OtsQueueTimeoutError
+    OtsExecutionTimeoutError, OtsQueueTimeoutError, OtsTaskLostError, \
+    OtsTestrunCancelledError
 
 
 class AMQPMessageStub:
@@ -77,7 +82,7 @@ class TestTaskRunner(unittest.TestCase):
         message = AMQPMessageStub()
         message.body = dumps(start_msg)
 
-        self.taskrunner._tasks = [task_1, task_2] 
+        self.taskrunner._tasks = TaskRegistry([task_1, task_2])
         self.taskrunner._on_message(message)
         self.assertEquals(2, len(self.taskrunner._tasks))
 
@@ -89,7 +94,7 @@ class TestTaskRunner(unittest.TestCase):
         
         self.taskrunner._on_message(message)
         self.assertEquals(1, len(self.taskrunner._tasks))
-        self.assertEquals(task_2, self.taskrunner._tasks[0])
+        self.assertEquals([task_2], list(self.taskrunner._tasks))
 
     def test_on_message_relay(self):
         message = AMQPMessageStub()
@@ -103,7 +108,7 @@ class TestTaskRunner(unittest.TestCase):
     def test_dispatch_tasks(self):
         task_1 = Task(["1", "2"], 10)
         task_2 = Task(["1", "2"], 10)
-        self.taskrunner._tasks = [task_1, task_2]
+        self.taskrunner._tasks = TaskRegistry([task_1, task_2])
         self.taskrunner._dispatch_tasks()
         def test_cb(message):
             self.channel.basic_ack(delivery_tag = message.delivery_tag)
@@ -117,23 +122,26 @@ class TestTaskRunner(unittest.TestCase):
     def test_wait_for_all_tasks(self):
         class ChannelStub:
             count = 5
+            #A message is always waiting
+            method_queue = ["message"]
             def __init__(self, taskrunner = None):
                 self.taskrunner = taskrunner
             def wait(self):
                 if self.taskrunner:
-                    assert(range(self.count) == self.taskrunner._tasks)
-                    self.taskrunner._tasks.pop()
+                    tasks = list(self.taskrunner._tasks)
+                    assert(self.count == len(tasks))
+                    self.taskrunner._tasks.remove(tasks[-1])
                     self.count -= 1
         self.taskrunner._channel = ChannelStub()
         self.taskrunner._wait_for_all_tasks()
-        self.taskrunner._tasks = [0,1,2,3,4]
+        self.taskrunner._tasks = TaskRegistry([Task([i]) for i in range(5)])
         self.taskrunner._channel = ChannelStub(self.taskrunner)
         self.taskrunner._wait_for_all_tasks()
 
     def test_add_task(self):
         self.taskrunner.add_task([1,2,3])
         self.assertEquals(1, len(self.taskrunner._tasks))
-        task = self.taskrunner._tasks[0]
+        task = list(self.taskrunner._tasks)[0]
         self.assertEquals([1,2,3], task.command)
         self.taskrunner._is_run = True
         self.assertRaises(TaskRunnerException, self.taskrunner.add_task, [1])
@@ -197,7 +205,7 @@ class TestTimeoutScenarios(unittest.TestCase):
      
         # Create a "started" state change message
 
-        taskrunner._tasks = [task_1] 
+        taskrunner._tasks = TaskRegistry([task_1])
         self._publish_message(task_1.task_id, taskrunner._testrun_queue)
         self.assertRaises(OtsExecutionTimeoutError,
                           taskrunner.run)
@@ -213,6 +221,517 @@ class TestTimeoutScenarios(unittest.TestCase):
 
 
 
+class TestPartialCompletion(unittest.TestCase):
+    """The deadline of one Task does not fail the others"""
+
+    def setUp(self):
+        self.monitors = []
+        DTO_SIGNAL.connect(self._on_dto)
+
+    def tearDown(self):
+        DTO_SIGNAL.disconnect(self._on_dto)
+
+    def _on_dto(self, signal, dto, **kwargs):
+        self.monitors.append(dto)
+
+    def _taskrunner(self, execution_timeout, queue_timeout):
+        #With a reactor the TaskRunner does not connect
+        taskrunner = TaskRunner("guest", "guest", "localhost",
+                                "/", "ots", 5672, "test_taskrunner", 
+                                1, execution_timeout, queue_timeout, 0,
+                                reactor = object())
+        self.task_1 = Task([1, 2], 10)
+        self.task_2 = Task([1, 2], 10)
+        taskrunner._tasks = TaskRegistry([self.task_1, self.task_2])
+        taskrunner.timeout_handler.start_queue_timeout(
+            [self.task_1.task_id, self.task_2.task_id])
+        return taskrunner
+
+    def _transition(self, taskrunner, task, condition):
+        message = AMQPMessageStub()
+        message.body = dumps(StateChangeMessage(task.task_id, condition))
+        taskrunner._on_message(message)
+
+    def test_execution_timeout_of_one_task(self):
+        taskrunner = self._taskrunner(0, 100)
+        self._transition(taskrunner, self.task_1, TaskCondition.START)
+        self.assertFalse(taskrunner.check())
+        self.assertTrue(self.task_1.is_timed_out)
+        self.assertEquals([self.task_1.task_id], taskrunner.timed_out_tasks)
+        self.assertEquals([self.task_1.task_id], 
+                          [dto.description for dto in self.monitors])
+        #Late messages of the timed out Task are ignored
+        self._transition(taskrunner, self.task_1, TaskCondition.FINISH)
+        self._transition(taskrunner, self.task_2, TaskCondition.START)
+        self.assertRaises(OtsExecutionTimeoutError, taskrunner.check)
+        self.assertTrue(self.task_2.is_timed_out)
+
+    def test_other_tasks_finish(self):
+        taskrunner = self._taskrunner(100, 100)
+        self._transition(taskrunner, self.task_2, TaskCondition.START)
+        #Only the waiting Task expires
+        timeout_handler = taskrunner.timeout_handler
+        timeout_handler.queue_timeout = 0
+        timeout_handler._queue_extension = None
+        timeout_handler.start_queue_timeout([self.task_1.task_id])
+        self.assertFalse(taskrunner.check())
+        self.assertEquals([self.task_1.task_id], taskrunner.timed_out_tasks)
+        self._transition(taskrunner, self.task_2, TaskCondition.FINISH)
+        self.assertTrue(self.task_2.is_finished)
+        self.assertRaises(OtsQueueTimeoutError, taskrunner.check)
+
+    def test_queue_timeout_of_all_tasks(self):
+        taskrunner = self._taskrunner(100, 0)
+        self.assertRaises(OtsQueueTimeoutError, taskrunner.check)
+        self.assertTrue(self.task_1.is_timed_out)
+        self.assertTrue(self.task_2.is_timed_out)
+
+
+class PublishChannelStub(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def tx_select(self):
+        self.calls.append("tx_select")
+
+    def tx_commit(self):
+        self.calls.append("tx_commit")
+
+    def basic_publish(self, message, exchange, routing_key):
+        self.calls.append(loads(message.body).task_id)
+
+
+class TestBulkDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.monitors = []
+        DTO_SIGNAL.connect(self._on_dto)
+
+    def tearDown(self):
+        DTO_SIGNAL.disconnect(self._on_dto)
+
+    def _on_dto(self, signal, dto, **kwargs):
+        self.monitors.append(dto)
+
+    def _dispatch(self, dispatch_transaction):
+        #With a reactor the TaskRunner does not connect
+        taskrunner = TaskRunner("guest", "guest", "localhost",
+                                "/", "ots", 5672, "test_taskrunner", 
+                                1, 10, 10, 10, reactor = object(),
+                                dispatch_transaction = dispatch_transaction)
+        for i in range(3):
+            taskrunner.add_task(["echo", str(i)])
+        taskrunner._channel = PublishChannelStub()
+        taskrunner._dispatch_tasks()
+        return taskrunner
+
+    def test_dispatch(self):
+        taskrunner = self._dispatch(False)
+        task_ids = [task.task_id for task in taskrunner._tasks]
+        self.assertEquals(task_ids, taskrunner._channel.calls)
+        self.assertEquals(1, len(self.monitors))
+        self.assertEquals(",".join(task_ids), self.monitors[0].description)
+
+    def test_dispatch_transaction(self):
+        taskrunner = self._dispatch(True)
+        task_ids = [task.task_id for task in taskrunner._tasks]
+        self.assertEquals(["tx_select"] + task_ids + ["tx_commit"], 
+                          taskrunner._channel.calls)
+
+
+class TestSpeculativeExecution(unittest.TestCase):
+
+    def setUp(self):
+        #With a reactor the TaskRunner does not connect
+        self.taskrunner = TaskRunner("guest", "guest", "localhost",
+                                     "/", "ots", 5672, "test_taskrunner", 
+                                     1, 100, 100, 100, reactor = object())
+        self.taskrunner.idle_consumers = lambda : 1
+        self.taskrunner._channel = PublishChannelStub()
+        self.task = Task(["echo", "1"], expected_duration = 0)
+        self.taskrunner.add_task(self.task)
+        self.taskrunner._dispatch_tasks()
+        self._transition(self.task, TaskCondition.START)
+        self.assertFalse(self.taskrunner.check())
+        self.twin_id = self.taskrunner._channel.calls[-1]
+
+    def _transition(self, task_id, condition):
+        if isinstance(task_id, Task):
+            task_id = task_id.task_id
+        message = AMQPMessageStub()
+        message.body = dumps(StateChangeMessage(task_id, condition))
+        self.taskrunner._on_message(message)
+
+    def test_straggler_is_twinned(self):
+        self.assertEquals(2, len(self.taskrunner._tasks))
+        self.assertNotEquals(self.task.task_id, self.twin_id)
+        self.assertEquals(self.twin_id, 
+                          self.taskrunner.speculation.twin(self.task.task_id))
+        #No more twins
+        self.assertFalse(self.taskrunner.check())
+        self.assertEquals(2, len(self.taskrunner._tasks))
+
+    def test_twin_finishes_first(self):
+        self._transition(self.twin_id, TaskCondition.START)
+        self._transition(self.twin_id, TaskCondition.FINISH)
+        self.assertTrue(self.taskrunner.check())
+        #The late original is ignored
+        self._transition(self.task, TaskCondition.FINISH)
+        self.assertFalse(self.task.is_finished)
+
+    def test_original_finishes_first(self):
+        self._transition(self.task, TaskCondition.FINISH)
+        self.assertTrue(self.taskrunner.check())
+        self._transition(self.twin_id, TaskCondition.START)
+        self.assertTrue(self.taskrunner.is_finished)
+
+    def test_only_winner_results_are_relayed(self):
+        dtos = []
+        def on_dto(signal, dto, **kwargs):
+            dtos.append(dto)
+        DTO_SIGNAL.connect(on_dto)
+        try:
+            self._transition(self.twin_id, TaskCondition.START)
+            for task_id in [self.task.task_id, self.twin_id]:
+                results = Results("results.xml", "<xml/>", "pkg1-tests",
+                                  task_id = task_id)
+                self.taskrunner._on_message(pack_message(results))
+            #The testrun.log of another Task goes through
+            log = Results("testrun.log", "log", task_id = "other")
+            self.taskrunner._on_message(pack_message(log))
+            self.assertEquals(["other"], [dto.task_id for dto in dtos])
+            self._transition(self.twin_id, TaskCondition.FINISH)
+            self.assertEquals(["other", self.twin_id], 
+                              [dto.task_id for dto in dtos])
+            #The late original is dropped
+            results = Results("results.xml", "<xml/>", "pkg1-tests",
+                              task_id = self.task.task_id)
+            self.taskrunner._on_message(pack_message(results))
+            self.assertEquals(2, len(dtos))
+        finally:
+            DTO_SIGNAL.disconnect(on_dto)
+
+
+class TestLostWorkers(unittest.TestCase):
+    """Silent workers lose their Tasks before the execution timeout"""
+
+    def setUp(self):
+        self.monitors = []
+        DTO_SIGNAL.connect(self._on_dto)
+        #With a reactor the TaskRunner does not connect
+        self.taskrunner = TaskRunner("guest", "guest", "localhost",
+                                     "/", "ots", 5672, "test_taskrunner", 
+                                     1, 100, 100, 100, reactor = object(),
+                                     heartbeat_interval = 10,
+                                     heartbeat_misses = 3)
+        self.task_1 = Task(["echo", "1"])
+        self.task_2 = Task(["echo", "2"])
+        self.taskrunner.add_task(self.task_1)
+        self.taskrunner.add_task(self.task_2)
+        for task in [self.task_1, self.task_2]:
+            self._transition(task, TaskCondition.START)
+            self._transition(task, TaskCondition.HEARTBEAT)
+
+    def tearDown(self):
+        DTO_SIGNAL.disconnect(self._on_dto)
+
+    def _on_dto(self, signal, dto, **kwargs):
+        self.monitors.append(dto)
+
+    def _transition(self, task, condition):
+        message = AMQPMessageStub()
+        message.body = dumps(StateChangeMessage(task.task_id, condition))
+        self.taskrunner._on_message(message)
+
+    def test_command_message(self):
+        messages = self.taskrunner._command_messages([self.task_1])
+        self.assertEquals(10, loads(messages[0].body).heartbeat_interval)
+
+    def test_heartbeats(self):
+        self.assertTrue(self.taskrunner.deadline > time.time() + 20)
+        self.assertFalse(self.taskrunner.check())
+        self.assertEquals([], self.taskrunner.lost_tasks)
+
+    def test_lost_task(self):
+        #The last heartbeat of task_1 came 30 seconds ago
+        self.taskrunner.heartbeats.beat(self.task_1.task_id, 
+                                        now = time.time() - 30)
+        self.assertFalse(self.taskrunner.check())
+        self.assertTrue(self.task_1.is_lost)
+        self.assertEquals([self.task_1.task_id], self.taskrunner.lost_tasks)
+        self.assertEquals([MonitorType.TASK_LOST], 
+                          [dto.type for dto in self.monitors])
+        #Late messages of the lost Task are ignored
+        self._transition(self.task_1, TaskCondition.FINISH)
+        self._transition(self.task_2, TaskCondition.FINISH)
+        self.assertRaises(OtsTaskLostError, self.taskrunner.check)
+
+    def test_finished_task_is_not_lost(self):
+        self._transition(self.task_1, TaskCondition.FINISH)
+        self._transition(self.task_1, TaskCondition.HEARTBEAT)
+        lost = self.taskrunner.heartbeats.lost(now = time.time() + 60)
+        self.assertEquals([self.task_2.task_id], lost)
+
+
+class TestRequeue(unittest.TestCase):
+    """Lost Tasks are published again while they have retries left"""
+
+    def setUp(self):
+        self.dtos = []
+        DTO_SIGNAL.connect(self._on_dto)
+        #With a reactor the TaskRunner does not connect
+        self.taskrunner = TaskRunner("guest", "guest", "localhost",
+                                     "/", "ots", 5672, "test_taskrunner", 
+                                     1, 0, 100, 0, reactor = object(),
+                                     heartbeat_interval = 10,
+                                     max_retries = 1)
+        self.taskrunner._channel = PublishChannelStub()
+        self.task = Task(["echo", "1"])
+        self.taskrunner.add_task(self.task)
+        self.taskrunner._dispatch_tasks()
+        self._transition(self.task, TaskCondition.START)
+
+    def tearDown(self):
+        DTO_SIGNAL.disconnect(self._on_dto)
+
+    def _on_dto(self, signal, dto, **kwargs):
+        self.dtos.append(dto)
+
+    def _transition(self, task, condition):
+        message = AMQPMessageStub()
+        message.body = dumps(StateChangeMessage(task.task_id, condition))
+        self.taskrunner._on_message(message)
+
+    def _lose(self, task):
+        self.taskrunner.heartbeats.beat(task.task_id, now = time.time() - 30)
+
+    def _retry(self):
+        tasks = list(self.taskrunner._tasks)
+        self.assertEquals(1, len(tasks))
+        self.assertEquals(tasks[0].task_id, self.taskrunner._channel.calls[-1])
+        return tasks[0]
+
+    def test_lost_task_is_requeued(self):
+        self._lose(self.task)
+        self.assertFalse(self.taskrunner.check())
+        retry = self._retry()
+        self.assertTrue(self.task.is_lost)
+        self.assertEquals(2, retry.attempt)
+        self.assertEquals(self.task.command, retry.command)
+        #The late first attempt is ignored
+        self._transition(self.task, TaskCondition.FINISH)
+        self.assertFalse(self.taskrunner.is_finished)
+        self._transition(retry, TaskCondition.START)
+        self._transition(retry, TaskCondition.FINISH)
+        self.assertTrue(self.taskrunner.check())
+
+    def test_max_retries(self):
+        self._lose(self.task)
+        self.taskrunner.check()
+        retry = self._retry()
+        self._transition(retry, TaskCondition.START)
+        self._lose(retry)
+        self.assertRaises(OtsTaskLostError, self.taskrunner.check)
+        self.assertEquals(2, len(self.taskrunner.lost_tasks))
+
+    def test_execution_timeout_is_not_requeued(self):
+        #No heartbeat, the execution timeout is 0
+        self.taskrunner.heartbeats.task_ended(self.task.task_id)
+        self.assertRaises(OtsExecutionTimeoutError, self.taskrunner.check)
+        self.assertTrue(self.task.is_timed_out)
+        self.assertEquals(0, len(self.taskrunner._tasks))
+
+    def test_late_results_are_dropped(self):
+        packages = pack_message(Packages("hardware", ["pkg1-tests"]))
+        self.taskrunner._on_message(packages)
+        self._lose(self.task)
+        self.taskrunner.check()
+        self.taskrunner._on_message(packages)
+        self.assertEquals(1, len([dto for dto in self.dtos 
+                                  if isinstance(dto, Packages)]))
+
+    def test_dedup_is_limited_to_the_retry(self):
+        def send(dto):
+            self.taskrunner._on_message(pack_message(dto))
+        send(Packages("hardware", ["pkg1-tests"], self.task.task_id))
+        self._lose(self.task)
+        self.taskrunner.check()
+        retry = self._retry()
+        #The lost Task is dropped
+        send(Results("results.xml", "<xml/>", task_id = self.task.task_id))
+        #The retry doesn't relay again what the lost Task did
+        send(Packages("hardware", ["pkg1-tests"], retry.task_id))
+        send(Results("results.xml", "<xml/>", task_id = retry.task_id))
+        #Other Tasks are not affected
+        send(Packages("hardware", ["pkg1-tests"], "other"))
+        self.assertEquals([(Packages, self.task.task_id), 
+                           (Results, retry.task_id),
+                           (Packages, "other")],
+                          [(type(dto), dto.task_id) for dto in self.dtos
+                           if isinstance(dto, (Packages, Results))])
+
+
+class TestTestPlanReferences(unittest.TestCase):
+    """The commands refer to uploaded test plans"""
+
+    def test_command_message(self):
+        taskrunner = TaskRunner("guest", "guest", "localhost",
+                                "/", "ots", 5672, "test_taskrunner", 
+                                1, 100, 100, 0, reactor = object(),
+                                testplan_url = "http://ots/xmlrpc/")
+        task = Task(["echo", "1"])
+        task.set_test_plan(TestPlanReference("plan.xml", "a" * 40))
+        messages = taskrunner._command_messages([task, Task(["echo", "2"])])
+        cmd_msg = unpack_message(messages[0])
+        self.assertEquals("a" * 40, cmd_msg.xml_file.digest)
+        self.assertEquals("http://ots/xmlrpc/", cmd_msg.testplan_url)
+        self.assertEquals(None, unpack_message(messages[1]).testplan_url)
+        #The server takes compressed responses
+        self.assertEquals(["deflate"], cmd_msg.content_encodings)
+
+
+class RoutingChannelStub(object):
+
+    def __init__(self):
+        self.routes = []
+
+    def basic_publish(self, message, exchange, routing_key):
+        self.routes.append((exchange, routing_key))
+
+
+class TestLoadAwareRouting(unittest.TestCase):
+    """The Tasks are spread over the least loaded sub-queues"""
+
+    def setUp(self):
+        self.taskrunner = TaskRunner("guest", "guest", "localhost",
+                                     "/", "ots", 5672, "group", 
+                                     1, 100, 100, 0, reactor = object(),
+                                     sub_queues = ["group", "group.a", 
+                                                   "group.b"])
+        self.taskrunner._channel = RoutingChannelStub()
+
+    def tearDown(self):
+        self.taskrunner.timeout_handler.stop()
+
+    def _publish(self, loads, count):
+        self.taskrunner.queue_loads = lambda : loads
+        tasks = [Task(["echo", str(i)]) for i in range(count)]
+        self.taskrunner._publish_tasks(tasks)
+        return [queue for exchange, queue in self.taskrunner._channel.routes]
+
+    def test_least_loaded(self):
+        loads = {"group" : (4, 2), "group.a" : (3, 1), "group.b" : (0, 1)}
+        self.assertEquals(["group.b", "group.b", "group", "group"], 
+                          self._publish(loads, 4))
+
+    def test_sub_queue_exchange(self):
+        self._publish({"group" : (0, 1), "group.a" : (0, 2)}, 2)
+        self.assertEquals([("group.a", "group.a"), ("ots", "group")],
+                          self.taskrunner._channel.routes)
+
+    def test_no_consumers(self):
+        self.assertEquals(["group", "group"], 
+                          self._publish({"group.a" : (0, 0)}, 2))
+
+
+class CancelChannelStub(object):
+    """The queue of the routing key with the commands still queued"""
+
+    def __init__(self, task_ids):
+        self.queued = []
+        for task_id in task_ids:
+            message = pack_message(CommandMessage(["echo"], "q", task_id))
+            message.delivery_info = {"delivery_tag" : task_id}
+            self.queued.append(message)
+        self.got = []
+        self.acked = []
+        self.published = []
+
+    def queue_declare(self, queue, passive):
+        return queue, len(self.queued), 1
+
+    def basic_get(self, queue):
+        if not self.queued:
+            return None
+        message = self.queued.pop(0)
+        self.got.append(message)
+        return message
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_reject(self, delivery_tag, requeue):
+        self.queued.extend([message for message in self.got 
+                        if message.delivery_info["delivery_tag"] == delivery_tag])
+
+    def basic_publish(self, message, exchange, routing_key):
+        self.published.append(routing_key)
+
+
+class TestCancel(unittest.TestCase):
+    """Queued Tasks are purged and running ones told to stop"""
+
+    def setUp(self):
+        self.dtos = []
+        DTO_SIGNAL.connect(self._on_dto)
+        self.taskrunner = TaskRunner("guest", "guest", "localhost",
+                                     "/", "ots", 5672, "test_taskrunner", 
+                                     1, 100, 100, 0, reactor = object())
+        self.task_1 = Task(["echo", "1"])
+        self.task_2 = Task(["echo", "2"])
+        self.taskrunner.add_task(self.task_1)
+        self.taskrunner.add_task(self.task_2)
+        self.taskrunner._channel = CancelChannelStub(["other", 
+                                                      self.task_2.task_id])
+        self._transition(self.task_1, TaskCondition.START)
+
+    def tearDown(self):
+        DTO_SIGNAL.disconnect(self._on_dto)
+        self.taskrunner.timeout_handler.stop()
+
+    def _on_dto(self, signal, dto, **kwargs):
+        self.dtos.append(dto)
+
+    def _transition(self, task, condition):
+        message = AMQPMessageStub()
+        message.body = dumps(StateChangeMessage(task.task_id, condition))
+        self.taskrunner._on_message(message)
+
+    def test_cancel(self):
+        self.taskrunner._on_message(pack_message(CancelMessage(1)))
+        channel = self.taskrunner._channel
+        self.assertTrue(self.task_1.is_cancelled)
+        self.assertTrue(self.task_2.is_cancelled)
+        #The queued Task is purged, the other testrun's is put back
+        self.assertEquals([self.task_2.task_id], channel.acked)
+        self.assertEquals(["other"], [message.delivery_info["delivery_tag"] 
+                                      for message in channel.queued])
+        #The running Task is killed by its worker
+        self.assertEquals(["c" + self.task_1.task_id], channel.published)
+        self.assertRaises(OtsTestrunCancelledError, self.taskrunner.check)
+        self.assertEquals([MonitorType.TESTRUN_CANCELLED], 
+                          [dto.type for dto in self.dtos])
+        self.assertEquals([self.task_1.task_id, self.task_2.task_id],
+                          self.dtos[0].description.split(","))
+
+    def test_cancel_purge_error(self):
+        def queue_declare(queue, passive):
+            raise AMQPChannelException(404, "NOT_FOUND", (50, 10))
+        channel = self.taskrunner._channel
+        channel.queue_declare = queue_declare
+        self.taskrunner._on_message(pack_message(CancelMessage(1)))
+        self.assertTrue(self.task_2.is_cancelled)
+        self.assertEquals([], channel.acked)
+        self.assertEquals(["c" + self.task_1.task_id, 
+                           "c" + self.task_2.task_id], channel.published)
+
+    def test_late_messages_are_ignored(self):
+        self.taskrunner._on_message(pack_message(CancelMessage(1)))
+        self._transition(self.task_1, TaskCondition.FINISH)
+        self.assertTrue(self.taskrunner.is_finished)
+
+
 class TestQueueDoesnotExist(unittest.TestCase):
 
     def setUp(self):
@@ -32,61 +32,79 @@ from ots.server.distributor.exceptions import OtsQueueTimeoutError
 class TestTimeout(unittest.TestCase):
 
     def test_queue_timeout_raised(self):
-        def run(): # A dummy timeouting function
-            time.sleep(3)
-        queue_timeout = 1
-        execution_timeout = 1
-        controller_timeout = 1
-        timeout = Timeout(execution_timeout, 
-                          queue_timeout, 
-                          controller_timeout)
-        timeout.start_queue_timeout()
-        self.assertRaises(OtsQueueTimeoutError, run)
+        timeout = Timeout(1, 1, 1)
+        timeout.start_queue_timeout(["task1"])
+        deadline = timeout.deadline
+        timeout.check(deadline - 0.1)
+        try:
+            timeout.check(deadline)
+            self.fail("No timeout")
+        except OtsQueueTimeoutError, error:
+            self.assertEquals("task1", error.task_id)
+        self.assertEquals(None, timeout.deadline)
 
     def test_queue_timeout_not_raised(self):
-        self.done = False
-        def run(): # A dummy not timeouting function
-            self.done = True
-        queue_timeout = 1
-        execution_timeout = 1
-        controller_timeout = 1
-        timeout = Timeout(execution_timeout, 
-                          queue_timeout, 
-                          controller_timeout)
-        timeout.start_queue_timeout()
-        run()
-        self.assertTrue(self.done)
+        timeout = Timeout(1, 10, 1)
+        timeout.start_queue_timeout(["task1"])
+        timeout.check()
+        timeout.task_started("task1")
+        timeout.task_finished("task1")
+        self.assertEquals(None, timeout.deadline)
+        timeout.check(time.time() + 100)
+
+    def test_execution_timeout_raised(self):
+        timeout = Timeout(1, 1, 2)
+        timeout.start_queue_timeout(["task1"])
+        now = time.time()
+        timeout.task_started("task1")
+        self.assertTrue(timeout.deadline >= now + 3)
+        try:
+            timeout.check(timeout.deadline)
+            self.fail("No timeout")
+        except OtsExecutionTimeoutError, error:
+            self.assertEquals("task1", error.task_id)
+
+    def test_only_affected_task_times_out(self):
+        timeout = Timeout(10, 100, 10)
+        timeout.start_queue_timeout(["task1", "task2"])
+        timeout.task_started("task1")
+        execution_deadline = timeout.deadline
+        self.assertRaises(OtsExecutionTimeoutError, timeout.check, 
+                          execution_deadline)
+        #The waiting Task keeps its extended queue deadline
+        self.assertTrue(timeout.deadline > execution_deadline)
+        try:
+            timeout.check(timeout.deadline)
+            self.fail("No timeout")
+        except OtsQueueTimeoutError, error:
+            self.assertEquals("task2", error.task_id)
+
+    def test_task_started_extends_waiting_tasks(self):
+        timeout = Timeout(1, 2, 3)
+        timeout.start_queue_timeout(["task1", "task2"])
+        queue_deadline = timeout.deadline
+        timeout.task_started("task1")
+        timeout.task_finished("task1")
+        self.assertTrue(timeout.deadline >= queue_deadline + 4)
 
-    def test_global_timeout_raised(self):
-        def run(): # A dummy timeouting function
-            time.sleep(3)
-        queue_timeout = 1
-        controller_timeout = 1
-        execution_timeout = 1
-        timeout = Timeout(execution_timeout, 
-                          queue_timeout, 
-                          controller_timeout)
+    def test_testrun_without_task_ids(self):
+        timeout = Timeout(1, 2, 3)
+        timeout.start_queue_timeout()
+        deadline = timeout.deadline
+        self.assertRaises(OtsQueueTimeoutError, timeout.check, deadline)
         timeout.start_queue_timeout()
         timeout.task_started()
-        self.assertRaises(OtsExecutionTimeoutError, run)
+        self.assertTrue(timeout.deadline >= deadline + 2)
+        self.assertRaises(OtsExecutionTimeoutError, timeout.check, 
+                          timeout.deadline)
 
     def test_stop(self):
-        self.done = False
-        def run(): # A dummy timeouting function
-            time.sleep(2)
-            self.done = True
-
-        queue_timeout = 1
-        controller_timeout = 1
-        execution_timeout = 1
-        timeout = Timeout(execution_timeout, 
-                          queue_timeout, 
-                          controller_timeout)
-        timeout.start_queue_timeout()
+        timeout = Timeout(1, 1, 1)
+        timeout.start_queue_timeout(["task1", "task2"])
+        timeout.task_started("task1")
         timeout.stop()
-        run()
-        self.assertTrue(self.done)
-
+        self.assertEquals(None, timeout.deadline)
+        timeout.check(time.time() + 10)
 
 if __name__ == "__main__":
     unittest.main()
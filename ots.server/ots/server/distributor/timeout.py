@@ -19,15 +19,29 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
 # 02110-1301 USA
 # ***** END LICENCE BLOCK *****
-
-
 """
 This module encapsulates handling of server side timeouts in ots distributor
+
+Every Task has its own deadlines in a heap based scheduler:
+
+ - The queue deadline runs from the dispatch until the Task starts
+ - The execution deadline runs from the start until the Task finishes.
+   It allows for the preparation of the device by the controller
+   as well as for the execution of the tests.
+
+A worker may run the Tasks of a testrun one after another, 
+so when a Task starts the queue deadlines of the Tasks still
+waiting are extended to cover the run of the started Task.
+The extension is applied lazily as a queue deadline reaches the top
+of the heap, so a start costs O(log n) however many Tasks wait.
+
+No signals are used. The owner waits at most until `deadline` 
+and calls `check` which raises the error of an expired Task.
 """
 
 
+import time
 import logging
-import signal
 
 
 #Disable spurious pylint warnings
@@ -38,16 +52,25 @@ import signal
 
 from ots.server.distributor.exceptions import OtsExecutionTimeoutError
 from ots.server.distributor.exceptions import OtsQueueTimeoutError
+from ots.server.distributor.deadline_scheduler import DeadlineScheduler
 
 LOGGER = logging.getLogger(__name__)
 
+#Deadline kinds
+QUEUE = "queue"
+EXECUTION = "execution"
+
+#The key of the queue deadline of a testrun without task ids
+TESTRUN = "testrun"
+
 class Timeout(object):
     """
-    Implements ots distributor server side timeouts by using signals.
+    Implements ots distributor server side timeouts per Task.
     
-    Raises OtsExecutionTimeoutError if timed out during execution
-    Raises OtsQueueTimeoutError if timed out before any tasks started
+    Raises OtsExecutionTimeoutError if a Task is not finished in time
+    Raises OtsQueueTimeoutError if a Task is not started in time
 
+    The `task_id` attribute of the error names the Task.
     """
 
 
@@ -58,7 +81,7 @@ class Timeout(object):
         @param execution_timeout: The timeout for remote command execution
 
         @type queue_timeout :C{int} 
-        @param queue_timeout: The queue timeout for the start of the first task
+        @param queue_timeout: The queue timeout for the start of a task
 
         @type controller_timeout : C{int}
         @param controller_timeout : controller_timeout 
@@ -66,56 +89,106 @@ class Timeout(object):
         self.execution_timeout = execution_timeout
         self.queue_timeout = queue_timeout
         self.controller_timeout = controller_timeout
+        self._scheduler = DeadlineScheduler()
+        #No queue deadline expires before this
+        self._queue_extension = None
 
-    def __del__(self):
-        self.stop()
-    
+    @property
+    def deadline(self):
+        """
+        @rtype: C{float} or None
+        @return: The earliest deadline of all the Tasks
+        """
+        self._extend_queue_deadlines()
+        return self._scheduler.next_deadline
 
-    def start_queue_timeout(self):
+    def start_queue_timeout(self, task_ids = None):
         """
         Starts queue timeout. This should be called when task messages are
         sent to queue
-        """
-        def queue_timeout_handler(signum, frame):
-            """
-            A callback that raises OtsQueueTimeoutError
-            """
-
-            # Disabling "unused argument" warning. Arguments are defined
-            # by the signal module
-            #
-            #pylint: disable=W0613
-
-            raise OtsQueueTimeoutError(self.queue_timeout)
 
+        @type task_ids : C{list} of C{str}
+        @param task_ids : The ids of the dispatched Tasks
+        """
         LOGGER.info("Setting queue timeout to %s minutes" \
                         % (self.queue_timeout/60))
-        signal.signal(signal.SIGALRM, queue_timeout_handler)
-        signal.alarm(self.queue_timeout)
-
-    def task_started(self):
-        """sets timeout. Previous timeout will be overwritten."""
-        def execution_timeout_handler(signum, frame):
-            """
-            A callback that raises OtsExecutionTimeoutError
-            """
-            # Disabling "unused argument" warning. Arguments are defined
-            # by the signal module
-            #
-            #pylint: disable=W0613
-
-            raise OtsExecutionTimeoutError
+        if not task_ids:
+            task_ids = [TESTRUN]
+        deadline = time.time() + self.queue_timeout
+        for task_id in task_ids:
+            self._scheduler.schedule((task_id, QUEUE), deadline)
+
+    def task_started(self, task_id = TESTRUN):
+        """
+        Replace the queue deadline of the Task with an execution deadline.
+        Extend the queue deadlines of the Tasks still waiting
 
+        @type task_id : C{str}
+        @param task_id : The id of the started Task
+        """
         timeout = self._calculate_new_timeout()
         LOGGER.info("Setting server side execution timeout to %s minutes" \
                           % (timeout/60))
-        signal.signal(signal.SIGALRM, execution_timeout_handler)
-        signal.alarm(timeout)
+        now = time.time()
+        self._scheduler.cancel((task_id, QUEUE))
+        self._scheduler.cancel((TESTRUN, QUEUE))
+        self._scheduler.schedule((task_id, EXECUTION), 
+                                 now + self.execution_timeout \
+                                     + self.controller_timeout)
+        self._queue_extension = now + timeout
+
+    def task_finished(self, task_id):
+        """
+        Remove the deadlines of the Task
+
+        @type task_id : C{str}
+        @param task_id : The id of the finished Task
+        """
+        self._scheduler.cancel((task_id, QUEUE))
+        self._scheduler.cancel((task_id, EXECUTION))
 
-    @staticmethod
-    def stop():
+    def stop(self):
         """Stops all timeouts."""
-        signal.alarm(0)
+        self._scheduler.clear()
+        self._queue_extension = None
+
+    def check(self, now = None):
+        """
+        Raises the timeout error of the Task that expired first
+
+        @type now : C{float}
+        @param now : The current time, defaults to time.time()
+        """
+        if now is None:
+            now = time.time()
+        next_deadline = self.deadline
+        if next_deadline is None or now < next_deadline:
+            return
+        task_id, kind = self._scheduler.pop()[0]
+        self._scheduler.cancel((task_id, QUEUE))
+        self._scheduler.cancel((task_id, EXECUTION))
+        if kind == QUEUE:
+            error = OtsQueueTimeoutError(self.queue_timeout)
+        else:
+            error = OtsExecutionTimeoutError()
+        error.task_id = task_id
+        LOGGER.error("Task '%s' %s timeout" % (task_id, kind))
+        raise error
+
+    def _extend_queue_deadlines(self):
+        """
+        Move the earliest queue deadlines up to the extension 
+        given by the last start of a Task
+        """
+        extension = self._queue_extension
+        while extension is not None:
+            next_deadline = self._scheduler.next_deadline
+            if next_deadline is None or next_deadline >= extension:
+                break
+            key = self._scheduler.peek()
+            if key[1] != QUEUE:
+                break
+            self._scheduler.schedule(key, extension)
 
     def _calculate_new_timeout(self):
         """
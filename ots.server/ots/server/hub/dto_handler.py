@@ -31,7 +31,7 @@ import logging
 from logging import LogRecord
 
 from ots.common.dto.api import Packages, Results, Monitor
-from ots.server.distributor.api import DTO_SIGNAL
+from ots.server.distributor.api import DTO_SIGNAL, is_for_testrun
 
 LOG = logging.getLogger(__name__)
 
@@ -50,7 +50,12 @@ class DTOHandler(object):
     """
 
 
-    def __init__(self):
+    def __init__(self, testrun_id = None):
+        """
+        @type testrun_id: C{str} or None
+        @param testrun_id: Collect only the DTOs of this testrun
+        """
+        self.testrun_id = testrun_id
         self.results = []
         self.tested_packages = {}
         self.expected_packages = {}
@@ -108,6 +113,8 @@ class DTOHandler(object):
         Multimethod that delegates
         data to the handler depending on <type>
         """
+        if not is_for_testrun(self.testrun_id, kwargs):
+            return
         if isinstance(dto, Exception):
             logger = logging.getLogger(__name__)
             logger.error(dto)
@@ -52,6 +52,7 @@ import sys
 import os
 import logging
 import logging.config
+import thread
 import uuid
 import datetime
 import configobj
@@ -71,15 +72,19 @@ from ots.server.hub.options_factory import OptionsFactory
 from ots.server.hub.options import Options
 from ots.server.server_config_filename import server_config_filename
 from ots.server.distributor.dto_signal import send_monitor_event
+from ots.server.distributor.exceptions import OtsTestrunCancelledError
 from ots.common.dto.api import MonitorType
 
 LOG = logging.getLogger()
 
 #TODO: move to somewhere else or implement default models as plugins
-DEFAULT_DISTRIBUTION_MODELS = ["default", "perpackage"]
+DEFAULT_DISTRIBUTION_MODELS = ["default", "perpackage", "adaptive"]
 
 DEBUG = False
 
+#The result of a testrun cancelled while it was running
+CANCELLED = "CANCELLED"
+
 #####################################
 # 'ESSENTIAL' PARAMETERS DEFAULTS
 #####################################
@@ -98,10 +103,35 @@ DEFAULT_EXTENDED_OPTIONS_DICT = {"email": "on",
 # Default log directory
 LOG_DIR = "/var/log/ots/"
 
+#The threads of the process running a Hub
+_HUB_THREADS = set()
+
 class HubException(Exception):
     """Error in Hub"""
     pass
 
+
+class _HubThreadFilter(logging.Filter):
+    """
+    Keeps the records of the other Hubs in the process 
+    out of the testrun log
+    """
+
+    def __init__(self):
+        logging.Filter.__init__(self)
+        self.thread = thread.get_ident()
+
+    def filter(self, record):
+        """
+        @type record: C{logging.LogRecord}
+        @param record: The log record
+
+        @rtype: C{bool}
+        @return: Whether the record belongs to the testrun log
+        """
+        return record.thread == self.thread or \
+            record.thread not in _HUB_THREADS
+
 ######################################
 # HUB
 ######################################
@@ -131,10 +161,12 @@ class Hub(object):
 
         self._options_factory = OptionsFactory(self.sw_product, kwargs)
         self._taskrunner = None
+        self._is_cancelled = False
 
         self._options = None
         
         self._filehandler = None
+        self._log_filter = None
         self._initialize_logger()
 
         LOG.debug(Options.format_dict(self._options_factory.all_options_dict))
@@ -162,7 +194,8 @@ class Hub(object):
                             notify_list,
                             incoming_options))
             # Send first monitor event
-            send_monitor_event(MonitorType.TESTRUN_REQUESTED, __name__)
+            send_monitor_event(MonitorType.TESTRUN_REQUESTED, __name__,
+                               testrun_id = self.testrun_uuid)
         except ValueError:
             pass
     
@@ -173,6 +206,7 @@ class Hub(object):
         if self._filehandler is not None:
             root_logger = logging.getLogger('')
             root_logger.removeHandler(self._filehandler)
+            _HUB_THREADS.discard(self._log_filter.thread)
 
     #############################################
     # Sandboxed Properties
@@ -345,6 +379,9 @@ class Hub(object):
             self._filehandler = logging.FileHandler(log_file)
             self._filehandler.setLevel(logging.DEBUG)
             self._filehandler.setFormatter(logging.Formatter(l_format))
+            self._log_filter = _HubThreadFilter()
+            self._filehandler.addFilter(self._log_filter)
+            _HUB_THREADS.add(self._log_filter.thread)
             root_logger.addHandler(self._filehandler)
         except IOError:
             root_logger.error("IOError, no permission to write %s?" % log_dir,
@@ -365,7 +402,8 @@ class Hub(object):
             publishers = self._publishers
             testrun = Testrun(self.is_hw_enabled,
                               self.is_host_enabled,
-                              self.is_chroot_enabled)
+                              self.is_chroot_enabled,
+                              testrun_id = self.testrun_uuid)
             taskrunner = self.taskrunner
 
             #FIXME: Cheap hack to make testable
@@ -375,6 +413,7 @@ class Hub(object):
         except Exception, err:
             er_type, value, traceback = sys.exc_info()
             LOG.error(str(value) or "Testrun Error", exc_info=err)
+            self._is_cancelled = isinstance(value, OtsTestrunCancelledError)
             publishers.set_exception(value)
             testrun_result.addError(TestCase, (er_type, value, traceback))
             if DEBUG:
@@ -415,9 +454,13 @@ class Hub(object):
         else:
             testrun_result = self._testrun()
         result_string = result_to_string(testrun_result)
+        if self._is_cancelled:
+            result_string = CANCELLED
         LOG.info("Result set to %s"%(result_string))
         self._publishers.set_testrun_result(result_string)
         self._publishers.publish()
+        if self._taskrunner is not None:
+            self._taskrunner.clean_up()
         LOG.info("Testrun finished with result: %s" % result_string)
         return testrun_result
 
@@ -27,6 +27,7 @@ as provided by OTS clients.
 """
 
 from ots.server.hub.parameters_parser import string_2_list, string_2_dict
+from ots.common.testplan_store import TestPlanReference, parse_reference
 from StringIO import StringIO
 from copy import deepcopy
 
@@ -48,6 +49,20 @@ BENCHMARK = "-benchmark"
 
 VALID_PKG_SUFFIXES = [TESTS, TEST, BENCHMARK]
 
+#################################
+# TEST PLANS
+#################################
+
+#The options with (name, data or reference) pairs of test plans
+TESTPLAN_OPTIONS = ("hw_testplans", "host_testplans")
+
+def _is_converted(test_plan):
+    """
+    @rtype: C{bool}
+    @return: Whether the test plan is already a StringIO or a reference
+    """
+    return isinstance(test_plan, (StringIO, TestPlanReference))
+
 ###################################
 # Options
 ###################################
@@ -195,7 +210,7 @@ class Options(object):
         @rtype: C{list} of C{str}
         """
         if len(self._hw_testplans) > 0:
-            if not isinstance(self._hw_testplans[0], StringIO):
+            if not _is_converted(self._hw_testplans[0]):
                 self._hw_testplans = self._convert_testplans(self._hw_testplans)
         return self._hw_testplans
 
@@ -206,7 +221,7 @@ class Options(object):
         @rtype: C{list} of C{str}
         """
         if len(self._host_testplans) > 0:
-            if not isinstance(self._host_testplans[0], StringIO):
+            if not _is_converted(self._host_testplans[0]):
                 self._host_testplans = \
                     self._convert_testplans(self._host_testplans)
         return self._host_testplans
@@ -358,17 +373,22 @@ class Options(object):
     
     def _convert_testplans(self, test_plans):
         """
-        Converts list of test plans to StringIO.
+        Converts list of test plans to StringIO. 
+        Test plans uploaded to the server are kept as references.
         
         @type test_plans: C{list} of C{tuple}
         @param test_plans: List of test plans
         
-        @rtype: C{List} of C{StringIO}
+        @rtype: C{List} of C{StringIO} or C{TestPlanReference}
         @return: List of test plans as StringIO
         
         """
         ret_list = []
         for (plan_name, plan_data) in test_plans:
+            digest = parse_reference(plan_data)
+            if digest is not None:
+                ret_list.append(TestPlanReference(plan_name, digest))
+                continue
             data = StringIO(plan_data)
             data.name = plan_name
             ret_list.append(data)
@@ -387,19 +407,14 @@ class Options(object):
         @return: Returns nice dictionary
         """
         
-        format_options = deepcopy(options_dict)
-        if "host_testplans" in format_options:
-            test_plans_data = format_options.get("host_testplans")
-            test_plans = []
-            for plan_name, plan_data in test_plans_data:
-                test_plans.append(plan_name)
-            format_options["host_testplans"] = test_plans
-        if "hw_testplans" in format_options:
-            test_plans_data = format_options.get("hw_testplans")
-            test_plans = []
-            for plan_name, plan_data in test_plans_data:
-                test_plans.append(plan_name)
-            format_options["hw_testplans"] = test_plans
+        #The test plans are not copied, only their names are kept
+        format_options = {}
+        for key, value in options_dict.items():
+            if key in TESTPLAN_OPTIONS:
+                format_options[key] = [plan_name 
+                                       for plan_name, plan_data in value]
+            else:
+                format_options[key] = deepcopy(value)
         return format_options
 
     @staticmethod
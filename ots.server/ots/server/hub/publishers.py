@@ -39,7 +39,7 @@ from ots.common.framework.api import PublisherPluginBase
 from ots.common.framework.api import plugins_iter
 from ots.common.framework.api import plugin_exception_policy
 from ots.common.dto.api import Monitor
-from ots.server.distributor.api import DTO_SIGNAL
+from ots.server.distributor.api import DTO_SIGNAL, is_for_testrun
 
 
 LOG = logging.getLogger(__name__)
@@ -94,6 +94,7 @@ class Publishers(PublisherPluginBase):
                 self._publishers.append(publisher)
         self._share_uris(testrun_uuid)
         
+        self._testrun_uuid = testrun_uuid
         DTO_SIGNAL.connect(self._callback)
 
     
@@ -142,6 +143,8 @@ class Publishers(PublisherPluginBase):
         Multimethod that delegates
         data to the handler depending on <type>
         """
+        if not is_for_testrun(self._testrun_uuid, kwargs):
+            return
         # Forward all monitor events to plugins
         if isinstance(dto, Monitor):
             # Make received timestamp if not defined
@@ -26,11 +26,43 @@ sandbox decorator
 
 import sys
 import logging
+import threading
 
 LOG = logging.getLogger(__name__)
 
 LOG.info("Initialising sandbox")
 
+class _SandboxState(threading.local):
+    """
+    The switch and the cached exc_info of a thread
+    """
+    is_on = True
+    exc_info = (None, None, None)
+
+_STATE = _SandboxState()
+
+
+def _state_property(name):
+    """
+    @type name: C{str}
+    @param name: The name of the attribute in the thread's state
+
+    @rtype: C{property}
+    @return: The class attribute kept per thread
+    """
+    return property(lambda cls: getattr(_STATE, name),
+                    lambda cls, value: setattr(_STATE, name, value))
+
+
+class _SandboxType(type):
+    """
+    Keeps `is_on` and `exc_info` per thread 
+    so that Hubs running in threads don't see each others errors
+    """
+    is_on = _state_property("is_on")
+    exc_info = _state_property("exc_info")
+
+
 class sandbox(object):
     """
     Decorator that catches all 
@@ -39,8 +71,7 @@ class sandbox(object):
     Switchable with the `is_on` parameter
     """
 
-    is_on = True
-    exc_info = (None, None, None)
+    __metaclass__ = _SandboxType
 
     def __init__(self, ret_val):
         """
@@ -52,7 +52,8 @@ class Testrun(object):
     def __init__(self, is_hw_enabled = True,
                        is_host_enabled = False,
                        is_chroot_enabled = False,
-                       insignificant_tests_matter = True):
+                       insignificant_tests_matter = True,
+                       testrun_id = None):
         """"
         @type is_hw_enabled: C{bool} 
         @param is_hw_enabled: Flag
@@ -65,9 +66,12 @@ class Testrun(object):
 
         @type insignificant_tests_matter: C{bool} 
         @param insignificant_tests_matter: Flag
+
+        @type testrun_id: C{str} 
+        @param testrun_id: The testrun id 
         """
        
-        self._dto_handler = DTOHandler()
+        self._dto_handler = DTOHandler(testrun_id)
         #
         self.run_test = None
         #
@@ -135,7 +139,12 @@ class Testrun(object):
         """
         ret_val = TestrunResult.FAIL
         if self.run_test is not None:
-            self.run_test()
+            try:
+                self.run_test()
+            finally:
+                #The results of the Tasks that did finish are published
+                #even if the testrun fails
+                self.results = self._dto_handler.results
 
             # At this point distributor has already finished so it's safe to
             # re-raise the exceptions from worker side
@@ -27,6 +27,7 @@ from ots.common.dto.api import Results, Packages
 from ots.common.dto.api import OTSException
 from ots.server.distributor.api import DTO_SIGNAL
 from ots.server.distributor.api import OtsExecutionTimeoutError
+from ots.server.distributor.api import OtsTestrunCancelledError
 
 import ots.results
 
@@ -36,6 +37,9 @@ import ots.results
 
 class MockTaskRunnerResultsBase(object):
 
+    def clean_up(self):
+        pass
+
     @property
     def results_xml(self):
         results_dirname = os.path.dirname(
@@ -177,15 +181,29 @@ class MockTaskRunnerResultsPass(MockTaskRunnerResultsBase):
 
 class MockTaskRunnerTimeout(object):
 
+    def clean_up(self):
+        pass
+
     def run(self):
         raise OtsExecutionTimeoutError("Mock")
 
+class MockTaskRunnerCancelled(object):
+
+    def clean_up(self):
+        pass
+
+    def run(self):
+        raise OtsTestrunCancelledError("Mock")
+
 ####################################
 # Error Scenarios Mocks
 ####################################
 
 class MockTaskRunnerError(object):
 
+    def clean_up(self):
+        pass
+
     def run(self):
         pkgs = Packages("hardware_test", ["pkg1-tests"])
         DTO_SIGNAL.send(sender = "MockTaskRunner",
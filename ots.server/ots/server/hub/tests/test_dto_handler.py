@@ -94,6 +94,18 @@ class TestDTOHandler(unittest.TestCase):
         dto_handler = DTOHandler()
         dto_handler._callback(signal = None, dto = record)
         logger.removeHandler(log_handler)
+
+    def test_callback_other_testrun(self):
+        dto_handler = DTOHandler("testrun_1")
+        pkgs = Packages("env", ["pkg1"])
+        dto_handler._callback(signal = None, dto = pkgs, 
+                              testrun_id = "testrun_2")
+        self.assertFalse(dto_handler.expected_packages)
+        dto_handler._callback(signal = None, dto = pkgs, 
+                              testrun_id = "testrun_1")
+        dto_handler._callback(signal = None, dto = pkgs)
+        self.assertEquals(["pkg1", "pkg1"],
+                           dto_handler.expected_packages.packages("env"))
         
         
        
@@ -37,6 +37,8 @@ from ots.server.hub.tests.component.mock_taskrunner \
                          import MockTaskRunnerResultsFail
 from ots.server.hub.tests.component.mock_taskrunner \
                          import MockTaskRunnerError
+from ots.server.hub.tests.component.mock_taskrunner \
+                         import MockTaskRunnerCancelled
 
 
 from ots.server.hub.hub import Hub
@@ -112,6 +114,14 @@ class TestHubRun(unittest.TestCase):
         testrun_result = hub._publishers.testrun_result
         self.assertEquals(hub._publishers.testrun_result, "ERROR")
 
+    def test_cancelled(self):
+        hub = Hub("example_sw_product", 111, **options_dict)
+        hub._taskrunner = MockTaskRunnerCancelled()
+        hub._publishers = PublishersStub(None, None, None, None)
+        testrun_result = hub.run()
+        self.assertEquals(hub._publishers.testrun_result, "CANCELLED")
+        self.assertFalse(testrun_result.wasSuccessful())
+
     def test_server_faulty_error(self):
         mock_taskrunner = MockTaskRunnerError()
         mock_taskrunner.run
@@ -25,6 +25,8 @@ import unittest
 from ots.server.hub.options import Options, string_2_dict, string_2_list
 from StringIO import StringIO
 
+from ots.common.testplan_store import TestPlanReference
+
 class TestOptions(unittest.TestCase):
 
     def test_image(self):
@@ -72,6 +74,20 @@ class TestOptions(unittest.TestCase):
         self.assertEquals(len(options.host_testplans), 2)
         self.assertTrue(isinstance(options.host_testplans[0], StringIO))
 
+    def test_testplan_references(self):
+        reference = "sha1:" + "a" * 40
+        kwargs = {"image" : "www.nokia.com", "distribution_model": "default",
+                  "hw_testplans": [["plan1", reference], ["plan2", "bar"]]}
+        options = Options(**kwargs)
+        self.assertTrue(isinstance(options.hw_testplans[0], 
+                                   TestPlanReference))
+        self.assertEquals("plan1", options.hw_testplans[0].name)
+        self.assertEquals("a" * 40, options.hw_testplans[0].digest)
+        self.assertTrue(isinstance(options.hw_testplans[1], StringIO))
+        self.assertEquals({"hw_testplans" : ["plan1", "plan2"]},
+                          Options.format_dict({"hw_testplans" : 
+                                               kwargs["hw_testplans"]}))
+
     def test_chroot_packages(self):
         kwargs = {"image" : "www.nokia.com", "distribution_model": "default"}
         options = Options(**kwargs)
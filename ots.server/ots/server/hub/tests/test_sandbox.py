@@ -20,6 +20,7 @@
 # 02110-1301 USA
 # ***** END LICENCE BLOCK *****
 
+import threading
 import unittest
 
 from ots.server.hub.sandbox import sandbox
@@ -47,6 +48,18 @@ class TestSandbox(unittest.TestCase):
         sandbox.is_on = True
         self.assertEquals(8, self.stub.exception_func())
         
+    def test_exc_info_is_per_thread(self):
+        thread_exc_info = []
+        def run():
+            sandbox.is_on = True
+            self.stub.exception_func()
+            thread_exc_info.append(sandbox.exc_info)
+        thread = threading.Thread(target = run)
+        thread.start()
+        thread.join()
+        self.assertTrue(isinstance(thread_exc_info[0][1], ValueError))
+        self.assertEquals((None, None, None), sandbox.exc_info)
+
     #FIXME unexpected behaviour for class scope variables
     #under nose these tests work in the CL
 
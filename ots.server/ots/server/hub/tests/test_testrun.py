@@ -38,6 +38,15 @@ class TestTestrun(unittest.TestCase):
         tr.run_test = lambda : 1
         self.assertRaises(PackageException, tr.run)
 
+    def test_results_kept_on_error(self):
+        def run_test():
+            raise ValueError("timeout")
+        tr = Testrun()
+        tr._dto_handler.results = ["result"]
+        tr.run_test = run_test
+        self.assertRaises(ValueError, tr.run)
+        self.assertEquals(["result"], tr.results)
+
     def test_fail(self):
         pkgs = Packages("hardware", ["pkg1", "pkg2"])
         results_dir = os.path.dirname(os.path.abspath(ots.results.__file__))
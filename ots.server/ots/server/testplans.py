@@ -0,0 +1,72 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+The test plan store of the OTS server.
+
+Clients upload a test plan once and refer to it by its digest. 
+The Workers fetch the plans they need from the XML-RPC interface
+"""
+
+from socket import gethostname
+
+import configobj
+
+from ots.common.testplan_store import TestPlanStore
+
+from ots.server.server_config_filename import server_config_filename
+
+DEFAULT_DIRECTORY = "/var/cache/ots/testplans"
+
+def _config(config_file = None):
+    """
+    @type config_file: C{str}  
+    @param config_file: The fqname of the config file
+
+    @rtype: C{configobj.Section} or C{dict}
+    @return: The ots.server.testplans section of the config file
+    """
+    if not config_file:
+        config_file = server_config_filename()
+    return configobj.ConfigObj(config_file).get("ots.server.testplans") or {}
+
+def testplan_store(config_file = None):
+    """
+    @type config_file: C{str}  
+    @param config_file: The fqname of the config file
+
+    @rtype: L{TestPlanStore}  
+    @return: The test plan store of the server
+    """
+    return TestPlanStore(_config(config_file).get("directory") 
+                         or DEFAULT_DIRECTORY)
+
+def testplan_url(config_file = None):
+    """
+    @type config_file: C{str}  
+    @param config_file: The fqname of the config file
+
+    @rtype: C{str}  
+    @return: The XML-RPC URL the Workers fetch the test plans from
+    """
+    return _config(config_file).get("url") \
+        or "http://%s/xmlrpc/" % (gethostname())
@@ -24,16 +24,27 @@
 Module containing utilities for multiprocessing support
 """
 
+from threading import Thread
 from multiprocessing import Process
 
 
 class ProcessHandler(object):
     """
     Handles adding, starting joining of multiple processes.
+
+    With threads the children share the process, 
+    which is how testruns share a distributor Reactor.
     """
-    def __init__(self):
+    def __init__(self, use_threads = False):
+        """
+        @param use_threads: Run the children in threads, not processes
+        @type use_threads: C{bool}
+        """
         super(ProcessHandler, self).__init__()
         self.child_processes = []
+        self._child_class = Process
+        if use_threads:
+            self._child_class = Thread
 
     def add_process(self, target_func, *args):
         """
@@ -46,7 +57,7 @@ class ProcessHandler(object):
         @type args: C{args}
         """
 
-        self.child_processes.append(Process(target=target_func, \
+        self.child_processes.append(self._child_class(target=target_func, \
                                     args=(args[0])))
 
     def start_processes(self):
@@ -25,8 +25,12 @@ This module provides public interface for OTS server
 """
 
 import datetime
+import xmlrpclib
 
 from ots.server.xmlrpc.request_handler import RequestHandler
+from ots.server.distributor.api import cancel_testrun as _cancel_testrun
+from ots.server.testplans import testplan_store
+from ots.common.testplan_store import plan_reference
 from ots.plugin.logger.models import LogMessage
 
 #############################
@@ -56,6 +60,60 @@ def request_sync(sw_product, request_id, notify_list, options_dict):
     req_handler = RequestHandler(sw_product, request_id, **options_dict)
     return req_handler.run()
 
+def cancel_testrun(testrun_id):
+    """
+    Cancel a running testrun. The queued tasks are dropped, 
+    the running ones killed and the testrun ends as CANCELLED
+
+    @type testrun_id: C{int}
+    @param testrun_id: The id of the testrun
+
+    @rtype: C{bool}
+    @return: Whether the testrun was running
+    """
+    return _cancel_testrun(testrun_id)
+
+#############################
+# TEST PLANS
+#############################
+
+def has_testplan(digest):
+    """
+    @type digest: C{str}
+    @param digest: The SHA-1 of the test plan
+
+    @rtype: C{bool}
+    @return: Whether the test plan has already been uploaded
+    """
+    return digest in testplan_store()
+
+def upload_testplan(data):
+    """
+    Store a test plan. The reference returned can be used 
+    in place of the test plan data in the request options
+
+    @type data: C{xmlrpclib.Binary} or C{str}
+    @param data: The test plan
+
+    @rtype: C{str}
+    @return: The reference to the test plan
+    """
+    if isinstance(data, xmlrpclib.Binary):
+        data = data.data
+    return plan_reference(testplan_store().put(data))
+
+def get_testplan(digest):
+    """
+    Used by the Workers to fetch the test plans of their Tasks
+
+    @type digest: C{str}
+    @param digest: The SHA-1 of the test plan
+
+    @rtype: C{xmlrpclib.Binary}
+    @return: The test plan
+    """
+    return xmlrpclib.Binary(testplan_store().get(digest))
+
 def latest_logs(seconds):
     """
     @param seconds: return logs from this many seconds ago to now
@@ -28,6 +28,7 @@ import copy
 from multiprocessing import Queue
 
 from ots.server.hub.api import Hub
+from ots.server.distributor.api import is_reactor_mode
 from ots.server.xmlrpc.process_handler import ProcessHandler
 
 
@@ -46,7 +47,7 @@ class RequestHandler(object):
         self.request_id = request_id
         self.options_dict = options_dict
         
-        self.process_handler = ProcessHandler()
+        self.process_handler = ProcessHandler(use_threads = is_reactor_mode())
         
         self.hubs_params = []
         self.process_queues = []
@@ -21,7 +21,9 @@
 # ***** END LICENCE BLOCK *****
 
 """
-A simple forking xmlrpc server for serving the ots public interface
+A simple forking xmlrpc server for serving the ots public interface.
+In the reactor mode of the distributor the requests are served in threads 
+so that all the testruns share the Reactor of the server process
 """
 
 import sys
@@ -29,9 +31,12 @@ import configobj
 import logging
 
 from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
-from SocketServer import ForkingMixIn
+from SocketServer import ForkingMixIn, ThreadingMixIn
 from ots.server.server_config_filename import server_config_filename
-from ots.server.xmlrpc.public import request_sync
+from ots.server.distributor.api import is_reactor_mode
+from ots.server.xmlrpc.public import request_sync, cancel_testrun
+from ots.server.xmlrpc.public import has_testplan, upload_testplan
+from ots.server.xmlrpc.public import get_testplan
 
 ###########################
 # OTS FORKING SERVER
@@ -41,6 +46,22 @@ class OtsForkingServer(ForkingMixIn, SimpleXMLRPCServer):
     """ Fork class for XMLRPC server """
     pass
 
+class OtsThreadingServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """ Threading class for XMLRPC server """
+    daemon_threads = True
+
+def _server_class(config_file = None):
+    """
+    @type config_file: C{str}
+    @param config_file: The fully qualified path of the server.conf
+
+    @rtype: C{class}
+    @return: The XMLRPC server class for the distributor mode
+    """
+    if is_reactor_mode(config_file):
+        return OtsThreadingServer
+    return OtsForkingServer
+
 def _config():
     """
     @rtype: C{tuple} of C{str} and C{int}
@@ -55,8 +76,12 @@ def main(is_logging = False):
     """
     Top level script for XMLRPC interface
     """
-    server = OtsForkingServer(_config(), SimpleXMLRPCRequestHandler)
+    server = _server_class()(_config(), SimpleXMLRPCRequestHandler)
     server.register_function(request_sync)
+    server.register_function(cancel_testrun)
+    server.register_function(has_testplan)
+    server.register_function(upload_testplan)
+    server.register_function(get_testplan)
     print "Starting OTS xmlrpc server..."
     print
     print "Host: %s, Port: %s" % _config()
@@ -20,9 +20,12 @@
 # 02110-1301 USA
 # ***** END LICENCE BLOCK *****
 
+import os
+import tempfile
 import unittest 
 
-from ots.server.xmlrpc.server import _config
+from ots.server.xmlrpc.server import _config, _server_class
+from ots.server.xmlrpc.server import OtsForkingServer, OtsThreadingServer
 
 class TestServer(unittest.TestCase):
 
@@ -30,5 +33,17 @@ class TestServer(unittest.TestCase):
         self.assertEquals(('localhost', 8080),
                           _config())
 
+    def test_server_class(self):
+        self.assertEquals(OtsForkingServer, _server_class())
+
+    def test_server_class_reactor_mode(self):
+        fd, config_file = tempfile.mkstemp()
+        os.write(fd, "[ots.server.distributor]\nmode = reactor\n")
+        os.close(fd)
+        try:
+            self.assertEquals(OtsThreadingServer, _server_class(config_file))
+        finally:
+            os.remove(config_file)
+
 if __name__ == "__main__":
     unittest.main()
@@ -20,7 +20,7 @@
 # 02110-1301 USA
 # ***** END LICENCE BLOCK *****
 
-from amqplib import client_0_8 as amqp
+from ots.common.amqp.api import CONNECTION_POOL
 
 port = 5672
 userid = "guest"
@@ -33,13 +33,13 @@ class QueueProcessor:
 
     def process_queue(self, host, queue_name):
         print "Processing queue '%s' on host '%s'..." % (queue_name, host)
-        connection = amqp.Connection(
-            host = ("%s:%s" %(host,port)),
-            userid = userid,
-            password = password,
-            virtual_host = virtual_host,
-            insist = False)
-        self.process_channel(connection.channel(), queue_name)
+        channel = CONNECTION_POOL.acquire("%s:%s" %(host,port), userid,
+                                          password, virtual_host)
+        try:
+            self.process_channel(channel, queue_name)
+        finally:
+            CONNECTION_POOL.release(channel)
+            CONNECTION_POOL.close()
         print "Done."
 
 class EmptyQueue(QueueProcessor):
@@ -32,6 +32,8 @@ import sys
 import os
 import exceptions
 
+from ots.common.testplan_store import plan_digest, plan_reference
+
 
 def read_test_plan(filepath):
     """
@@ -45,6 +47,37 @@ def read_test_plan(filepath):
 
     return testplan_data
 
+def upload_plans(ots_interface, filepaths):
+    """
+    Uploads the test plans the server does not have yet. 
+    Servers without a test plan store get the test plans inline.
+
+    @type ots_interface: C{xmlrpclib.ServerProxy}
+    @param ots_interface: The OTS server
+
+    @type filepaths: C{list} of C{str}
+    @param filepaths: Paths to the test plans
+
+    @rtype: C{list} of C{tuple}
+    @return: (name, reference or data) of each test plan
+    """
+    testplans = list()
+    for filepath in filepaths:
+        testplan_data = read_test_plan(filepath)
+        value = testplan_data
+        if testplan_data is not None:
+            digest = plan_digest(testplan_data)
+            try:
+                if not ots_interface.has_testplan(digest):
+                    ots_interface.upload_testplan(
+                        xmlrpclib.Binary(testplan_data))
+                value = plan_reference(digest)
+            except xmlrpclib.Fault:
+                logging.debug("No test plan store, sending %s inline" \
+                                  % filepath)
+        testplans.append((os.path.basename(filepath), value))
+    return testplans
+
 def _parse_configuration_file(configfile, section):
     """
     Read settings from the configuration file
@@ -160,20 +193,14 @@ def ots_trigger(options):
     if server:
         del options['server']
 
+    ots_interface = xmlrpclib.Server("http://%s/" % server)
+
     if options.get('hw_testplans'):
-        testplans = list()
-        for testplan in options.get('hw_testplans'):
-            testplan_data = read_test_plan(testplan)
-            testplans.append((os.path.basename(testplan), testplan_data))
-        options['hw_testplans'] = testplans
+        options['hw_testplans'] = \
+            upload_plans(ots_interface, options.get('hw_testplans'))
     if options.get('host_testplans'):
-        testplans = list()
-        for testplan in options.get('host_testplans'):
-            testplan_data = read_test_plan(testplan)
-            testplans.append((os.path.basename(testplan), testplan_data))
-        options['host_testplans'] = testplans
-
-    ots_interface = xmlrpclib.Server("http://%s/" % server)
+        options['host_testplans'] = \
+            upload_plans(ots_interface, options.get('host_testplans'))
     
     return ots_interface.request_sync(sw_product,
                                       build_id,
@@ -23,7 +23,27 @@
 import unittest 
 import os
 
+import hashlib
+import tempfile
+import xmlrpclib
+
 from ots.tools.trigger.ots_trigger import parse_commandline_arguments, _parameter_validator, _parse_configuration_file
+from ots.tools.trigger.ots_trigger import upload_plans
+
+class ServerStub(object):
+
+    def __init__(self, is_store = True):
+        self.is_store = is_store
+        self.uploaded = []
+
+    def has_testplan(self, digest):
+        if not self.is_store:
+            raise xmlrpclib.Fault(1, "method has_testplan not supported")
+        return digest in [hashlib.sha1(data).hexdigest() 
+                          for data in self.uploaded]
+
+    def upload_testplan(self, data):
+        self.uploaded.append(data.data)
 
 class TestTrigger(unittest.TestCase):
     
@@ -324,6 +344,26 @@ class TestTrigger(unittest.TestCase):
         expected_dict['device'] ='devicegroup:netbook'
         
         self.assertEqual(config_params_with_section, expected_dict)        
+
+    def test_upload_plans(self):
+        fd, path = tempfile.mkstemp(suffix = ".xml")
+        os.write(fd, "<testdefinition/>")
+        os.close(fd)
+        try:
+            server = ServerStub()
+            testplans = upload_plans(server, [path, path])
+            #Uploaded once
+            self.assertEquals(["<testdefinition/>"], server.uploaded)
+            name, reference = testplans[0]
+            self.assertEquals(os.path.basename(path), name)
+            self.assertEquals("sha1:" + hashlib.sha1("<testdefinition/>")\
+                                  .hexdigest(), reference)
+            #Old servers get the test plan inline
+            testplans = upload_plans(ServerStub(False), [path])
+            self.assertEquals([(os.path.basename(path), "<testdefinition/>")],
+                              testplans)
+        finally:
+            os.remove(path)
         
 
 if __name__ == "__main__":
@@ -29,20 +29,77 @@ import logging
 from amqplib.client_0_8 import AMQPChannelException
 
 from ots.common.amqp.api import pack_message
+from ots.worker.batch_publisher import BatchPublisher
 
 
 class AMQPLogHandler(logging.Handler):
     """
     CustomHandler for AMQP
+
+    LogRecords are batched if the server unpacks batches. 
+    The batch goes out when it is full, when the latency deadline 
+    expires or when the handler is flushed.
+
+    A timer thread flushes expired batches, so the other messages 
+    on the channel of the handler must be sent with `publish`
     """
     
     exchange = None
     queue = None
-    channel = None
+    #The encoding the server decodes
+    content_type = None
 
     def __init__(self):
         logging.Handler.__init__(self)
-       
+        self._publisher = BatchPublisher(use_timer = True)
+
+    def _get_channel(self):
+        """The AMQP channel"""
+        return self._publisher.channel
+
+    def _set_channel(self, channel):
+        """Set the AMQP channel"""
+        self._publisher.channel = channel
+
+    channel = property(_get_channel, _set_channel)
+
+    def _get_compression_threshold(self):
+        """The compression threshold of the batches"""
+        return self._publisher.compression_threshold
+
+    def _set_compression_threshold(self, compression_threshold):
+        """Set the compression threshold of the batches"""
+        self._publisher.compression_threshold = compression_threshold
+
+    compression_threshold = property(_get_compression_threshold, 
+                                     _set_compression_threshold)
+
+    def _get_batching(self):
+        """Whether the records are batched"""
+        return self._publisher.batching
+
+    def _set_batching(self, batching):
+        """Set whether the records are batched"""
+        self._publisher.batching = batching
+
+    batching = property(_get_batching, _set_batching)
+
+    def publish(self, message, exchange, routing_key):
+        """
+        Send a message on the channel after the batched LogRecords
+
+        @type message: C{amqplib.client_0_8.basic_message.Message}
+        @param message: A packed message
+
+        @type exchange: C{str}
+        @param exchange: The exchange
+
+        @type routing_key: C{str}
+        @param routing_key: The routing key
+        """
+        self._publisher.publish(message, exchange, routing_key, 
+                                batch = False)
+
     def emit(self, record):
         """
         @type record : C{logging.LogRecord}
@@ -55,11 +112,20 @@ class AMQPLogHandler(logging.Handler):
             #as Python can't pickle the traceback
             record.exc_info = None
             #
-            message = pack_message(record)
+            message = pack_message(record, self.content_type)
+            try:
+                self._publisher.publish(message,
+                                        exchange = self.exchange,
+                                        routing_key = self.queue)
+            except AMQPChannelException:
+                print "Can't log to %s" % (self.queue)
+
+    def flush(self):
+        """
+        Send the batched LogRecords
+        """
+        if self.channel is not None and self._publisher.pending:
             try:
-                self.channel.basic_publish(message,
-                                           mandatory = True,
-                                           exchange = self.exchange,
-                                           routing_key = self.queue)
+                self._publisher.flush()
             except AMQPChannelException:
                 print "Can't log to %s" % (self.queue)
@@ -0,0 +1,210 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Coalesces small messages into batch messages to cut 
+the per message overhead on the broker.
+
+A batch is flushed when it reaches the count or the size limit, 
+when the oldest message has waited for `max_latency` seconds,
+when the destination changes or when `flush` is called.
+With batching off, for receivers that can't unpack batches, 
+every message is sent on its own.
+"""
+
+import time
+import threading
+
+from ots.common.amqp.api import pack_batch
+
+MAX_COUNT = 50
+MAX_SIZE = 64 * 1024
+MAX_LATENCY = 0.5
+
+class BatchPublisher(object):
+    """
+    Batches packed AMQP messages for a channel
+
+    Without a timer the latency deadline is checked when messages are 
+    published, so the owner should call `flush` at the points 
+    where the pending messages must go out.
+    With a timer a background thread flushes expired batches.
+    The channel is then only used under the lock of the publisher. 
+    """
+
+    def __init__(self, channel = None,
+                       max_count = MAX_COUNT, 
+                       max_size = MAX_SIZE, 
+                       max_latency = MAX_LATENCY,
+                       use_timer = False,
+                       compression_threshold = None,
+                       batching = True):
+        """
+        @type channel: C{amqplib.client_0_8.channel.Channel}  
+        @param channel: The AMQP channel
+
+        @type max_count: C{int}  
+        @param max_count: The maximum number of messages in a batch
+
+        @type max_size: C{int}  
+        @param max_size: The maximum size of a batch in bytes
+
+        @type max_latency: C{float}  
+        @param max_latency: The maximum time in seconds a message waits
+
+        @type use_timer: C{bool}  
+        @param use_timer: Flush expired batches from a timer thread
+
+        @type compression_threshold: C{int} or None
+        @param compression_threshold: Compress batches of at least this 
+                                      many bytes. None if the receiver 
+                                      doesn't accept compression
+
+        @type batching: C{bool}
+        @param batching: False if the receiver can't unpack batches
+        """
+        self.channel = channel
+        self.max_count = max_count
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self._use_timer = use_timer
+        self.compression_threshold = compression_threshold
+        self.batching = batching
+        self._lock = threading.RLock()
+        self._timer = None
+        self._messages = []
+        self._size = 0
+        self._destination = None
+        self._deadline = None
+
+    @property
+    def pending(self):
+        """
+        The number of messages waiting in the batch
+        @rtype: C{int}
+        """
+        return len(self._messages)
+
+    def publish(self, message, exchange, routing_key, batch = True):
+        """
+        Add the message to the batch. 
+
+        @type message: C{amqplib.client_0_8.basic_message.Message}
+        @param message: A packed message
+
+        @type exchange: C{str}
+        @param exchange: The exchange
+
+        @type routing_key: C{str}
+        @param routing_key: The routing key
+
+        @type batch: C{bool}
+        @param batch: If False the pending batch and the message 
+                      are sent immediately
+        """
+        self._lock.acquire()
+        try:
+            batch = batch and self.batching
+            destination = (exchange, routing_key)
+            if not batch or destination != self._destination or \
+                    (self._deadline is not None and 
+                     time.time() >= self._deadline):
+                self._flush()
+            if not batch:
+                self._basic_publish(message, exchange, routing_key)
+                return
+            if not self._messages:
+                self._destination = destination
+                self._deadline = time.time() + self.max_latency
+                self._start_timer()
+            self._messages.append(message)
+            self._size += len(message.body)
+            if len(self._messages) >= self.max_count or \
+                    self._size >= self.max_size:
+                self._flush()
+        finally:
+            self._lock.release()
+
+    def flush(self):
+        """
+        Send the pending messages
+        """
+        self._lock.acquire()
+        try:
+            self._flush()
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """
+        Send the pending messages and stop the timer
+        """
+        self.flush()
+        self._cancel_timer()
+
+    #################################
+    # HELPERS
+    #################################
+
+    def _flush(self):
+        """
+        Send the pending messages. The lock must be held
+        """
+        messages = self._messages
+        exchange, routing_key = self._destination or (None, None)
+        self._messages = []
+        self._size = 0
+        self._deadline = None
+        self._cancel_timer()
+        if len(messages) == 1:
+            self._basic_publish(messages[0], exchange, routing_key)
+        elif messages:
+            self._basic_publish(pack_batch(messages, 
+                                           self.compression_threshold),
+                                exchange, routing_key)
+
+    def _basic_publish(self, message, exchange, routing_key):
+        """
+        Publish on the channel
+        """
+        self.channel.basic_publish(message,
+                                   mandatory = True,
+                                   exchange = exchange,
+                                   routing_key = routing_key)
+
+    def _start_timer(self):
+        """
+        Start the flush timer for a new batch
+        """
+        if self._use_timer:
+            self._timer = threading.Timer(self.max_latency, self.flush)
+            self._timer.setDaemon(True)
+            self._timer.start()
+
+    def _cancel_timer(self):
+        """
+        Cancel the flush timer
+        """
+        if self._timer is not None:
+            if self._timer is not threading.currentThread():
+                self._timer.cancel()
+            self._timer = None
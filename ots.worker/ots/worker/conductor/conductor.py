@@ -521,6 +521,9 @@ def main():
     else:
         LOG.info("Testing in %s done. No errors." % executor.env)
 
+    if not stand_alone:
+        responseclient.flush()
+
 
 if __name__ == '__main__':
     main()
@@ -607,10 +607,9 @@ class Executor(object):
         self.log.debug("Storing %s test result file %s" % (self.env, name))
 
         try:
-            result_file = open(os.path.expanduser(path))
-            self.responseclient.add_result(name, result_file.read(), origin,
-                                           test_package, self.env)
-            result_file.close()
+            self.responseclient.add_result_file(os.path.expanduser(path), 
+                                                name, origin,
+                                                test_package, self.env)
         except IOError:
             error_info = "Result file %s not available (test package %s, "\
                          "environment %s)" % (name, test_package, self.env)
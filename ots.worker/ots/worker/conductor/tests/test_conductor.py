@@ -222,6 +222,9 @@ class Stub_ResponseClient(object):
     def add_result(self, filename, content, origin="Unknown",
                          test_package="Unknown", environment="Unknown"):
         pass
+    def add_result_file(self, path, filename=None, origin="Unknown",
+                              test_package="Unknown", environment="Unknown"):
+        pass
     def set_state(self, state, status_info):
         pass
     def set_error(self, error_info, error_code):
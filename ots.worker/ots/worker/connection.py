@@ -82,6 +82,17 @@ class Connection(object):
                             insist=False)
         self.channel = self.connection.channel()
 
+    def clone(self):
+        """
+        A new connection with the same parameters, for a thread of its own.
+        amqplib channels must not be shared between threads.
+
+        @rtype: L{Connection}
+        @return: The connected copy
+        """
+        return Connection(self._vhost, self._host, self._port, 
+                          self._username, self._password)
+
     def clean_up(self):
         """
         Cleans up after ourselves, closing connections etc.
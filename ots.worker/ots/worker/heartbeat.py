@@ -0,0 +1,71 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+Periodic heartbeats from a background thread
+
+The Task Broker blocks while a Task runs. The heartbeats
+tell the server that the Worker is still alive meanwhile.
+"""
+
+import logging
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+class Heartbeat(threading.Thread):
+    """
+    Calls `beat` every `interval` seconds until stopped.
+    The first beat is immediate 
+    """
+
+    def __init__(self, beat, interval):
+        """
+        @type beat: C{callable}
+        @param beat: Sends one heartbeat
+
+        @type interval: C{float}
+        @param interval: The time in seconds between the heartbeats
+        """
+        threading.Thread.__init__(self, name = "heartbeat")
+        self.setDaemon(True)
+        self._beat = beat
+        self._interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.isSet():
+            try:
+                self._beat()
+            except Exception:
+                #A missed beat is better than a dead thread
+                LOGGER.exception("Heartbeat failed")
+            self._stopped.wait(self._interval)
+
+    def stop(self):
+        """
+        Stop the heartbeats. 
+        Returns once the thread has finished 
+        """
+        self._stopped.set()
+        if self.isAlive():
+            self.join()
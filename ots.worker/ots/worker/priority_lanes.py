@@ -0,0 +1,80 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+The order in which a Worker takes Tasks from its priority lanes
+
+The lanes are polled from the highest priority down. 
+A lane that has been passed over `max_skips` times in a row
+is polled first once, so a steady stream of urgent Tasks 
+cannot starve the lower priorities.
+"""
+
+MAX_SKIPS = 5
+
+class PriorityLanes(object):
+    """
+    Keeps count of how often each lane has been passed over
+    """
+
+    def __init__(self, priorities, max_skips = MAX_SKIPS):
+        """
+        @type priorities: C{list} of C{str}
+        @param priorities: The priorities, highest first
+
+        @type max_skips: C{int}
+        @param max_skips: Times a lane is passed over before it goes first
+        """
+        self._priorities = list(priorities)
+        self.max_skips = max_skips
+        self._skips = dict([(priority, 0) for priority in priorities])
+
+    def order(self):
+        """
+        @rtype: C{list} of C{str}
+        @return: The priorities in the order to poll them
+        """
+        starving = [priority for priority in self._priorities 
+                    if self._skips[priority] >= self.max_skips]
+        return starving + [priority for priority in self._priorities
+                           if priority not in starving]
+
+    def served(self, priority):
+        """
+        A Task was taken from the lane. The lower lanes were passed over 
+
+        @type priority: C{str}
+        @param priority: The priority of the lane
+        """
+        index = self._priorities.index(priority)
+        for lower in self._priorities[index + 1:]:
+            self._skips[lower] += 1
+        self._skips[priority] = 0
+
+    def empty(self, priority):
+        """
+        The lane had no Tasks, so it isn't waiting
+
+        @type priority: C{str}
+        @param priority: The priority of the lane
+        """
+        self._skips[priority] = 0
@@ -23,16 +23,41 @@
 """
 Client that sends response messages back to server over amqp
 """
+import os
+import uuid
+import hashlib
 import logging
 
 from amqplib import client_0_8 as amqp
 from socket import gethostname
 
-from ots.common.amqp.api import pack_message
+from ots.common.amqp.api import pack_message, compression_threshold_for
+from ots.common.amqp.api import content_type_for, accepts_batches
 from ots.common.amqp.api import testrun_queue_name
-from ots.common.dto.api import Results, Packages, Monitor
+from ots.common.dto.api import Results, ResultsChunk, Packages, Monitor
 from ots.common.dto.ots_exception import OTSException
 from ots.common.helpers import get_logger_adapter
+from ots.worker.batch_publisher import BatchPublisher
+
+#Files bigger than this (bytes) are sent in chunks of this size 
+CHUNK_SIZE = 512 * 1024
+
+#The Worker passes the id of the Task to the conductor 
+#in this environment variable
+TASK_ID_VARIABLE = "OTS_TASK_ID"
+#and the comma separated content encodings and types the server accepts
+CONTENT_ENCODINGS_VARIABLE = "OTS_CONTENT_ENCODINGS"
+CONTENT_TYPES_VARIABLE = "OTS_CONTENT_TYPES"
+
+def _environment_list(name):
+    """
+    @type name: C{str}
+    @param name: The name of an environment variable
+
+    @rtype: C{list} of C{str}
+    @return: The comma separated values of the variable
+    """
+    return os.environ.get(name, "").split(",")
 
 
 class ResponseClient(object):
@@ -40,12 +65,28 @@ class ResponseClient(object):
     Client that sends response messages back to server over amqp
     """
 
-    def __init__(self, server_host, testrun_id, response_queue=None):
+    def __init__(self, server_host, testrun_id, response_queue=None,
+                       task_id=None, content_encodings=None,
+                       content_types=None):
         self.log = get_logger_adapter(__name__)
         self.host = server_host
         self.testrun_id = testrun_id
+        #Tells the server which copy of a speculated Task sent the results
+        if task_id is None:
+            task_id = os.environ.get(TASK_ID_VARIABLE)
+        self.task_id = task_id
+        #Older servers can't take compressed or DTO encoded messages
+        if content_encodings is None:
+            content_encodings = _environment_list(CONTENT_ENCODINGS_VARIABLE)
+        self.compression_threshold = \
+            compression_threshold_for(content_encodings)
+        if content_types is None:
+            content_types = _environment_list(CONTENT_TYPES_VARIABLE)
+        self.content_type = content_type_for(content_types)
         self.conn = None
-        self.channel = None
+        self._publisher = BatchPublisher(use_timer = True,
+                            compression_threshold = self.compression_threshold,
+                            batching = accepts_batches(content_types))
 
         if response_queue:
             self.response_queue = response_queue
@@ -56,12 +97,23 @@ class ResponseClient(object):
         """Close amqp connection if they are still open"""
 
         try:
+            self._publisher.close()
             self.channel.close()
             self.conn.close()
 
         except:
             pass
 
+    def _get_channel(self):
+        """The AMQP channel"""
+        return self._publisher.channel
+
+    def _set_channel(self, channel):
+        """Set the AMQP channel"""
+        self._publisher.channel = channel
+
+    channel = property(_get_channel, _set_channel)
+
 #
 # Public methods:
 #
@@ -78,12 +130,52 @@ class ResponseClient(object):
 
     def add_result(self, filename, content, origin="Unknown",
                          test_package="Unknown", environment="Unknown"):
-        """Calls OTSMessageIO to create result object message"""
+        """
+        Calls OTSMessageIO to create result object message.
+        Large result files are compressed if the server accepts it
+        """
         results = Results(filename, content,
                           package=test_package,
                           hostname=origin,
-                          environment=environment)
-        self._send_message(pack_message(results))
+                          environment=environment,
+                          task_id=self.task_id)
+        self._send_message(self._pack(results, compress=True))
+
+    def add_result_file(self, path, filename=None, origin="Unknown",
+                              test_package="Unknown", environment="Unknown"):
+        """
+        Sends the result file at path. 
+        Files larger than CHUNK_SIZE are streamed as ResultsChunks 
+        so that the file is never held in memory as a whole
+        """
+        if filename is None:
+            filename = os.path.basename(path)
+        result_file = open(path, "rb")
+        try:
+            data = result_file.read(CHUNK_SIZE)
+            next_data = result_file.read(CHUNK_SIZE)
+            if not next_data:
+                self.add_result(filename, data, origin,
+                                test_package, environment)
+                return
+            transfer_id = uuid.uuid1().hex
+            checksum = hashlib.md5()
+            sequence = 0
+            while data:
+                checksum.update(data)
+                chunk = ResultsChunk(transfer_id, sequence, data, filename,
+                                     package=test_package,
+                                     hostname=origin,
+                                     environment=environment,
+                                     task_id=self.task_id)
+                if not next_data:
+                    chunk.checksum = checksum.hexdigest()
+                self._send_message(self._pack(chunk, compress=True))
+                sequence += 1
+                data, next_data = next_data, result_file.read(CHUNK_SIZE)
+            self.log.debug("Sent %s in %s chunks" % (filename, sequence))
+        finally:
+            result_file.close()
 
     def set_state(self, event_type, description):
         """Calls Monitor DTO to create testrun state change message"""
@@ -91,28 +183,44 @@ class ResponseClient(object):
         monitor_event = Monitor(event_type = event_type,
                                 sender = gethostname(),
                                 description = description)
-        self._send_message(pack_message(monitor_event))
+        self._send_message(self._pack(monitor_event), batch = True)
 
     def set_error(self, error_info, error_code):
         """Calls OTSMessageIO to cerate testrun error message"""
         
         exception = OTSException(error_code, error_info)
-        self._send_message(pack_message(exception))
+        self._send_message(self._pack(exception))
 
     def add_executed_packages(self, environment, packages):
         """Calls OTSMessageIO to create test package list"""
-        packages = Packages(environment, packages)
-        self._send_message(pack_message(packages))
+        packages = Packages(environment, packages, task_id=self.task_id)
+        self._send_message(self._pack(packages))
+
+    def flush(self):
+        """Sends the state change messages waiting in the batch"""
+        self._publisher.flush()
 
 #
 # Private methods:
 #
 
-    def _send_message(self, msg):
+    def _pack(self, dto, compress=False):
+        """
+        Packs the DTO in the encoding the server accepts.
+        Large bodies are compressed if compress is set
+        """
+        compression_threshold = None
+        if compress:
+            compression_threshold = self.compression_threshold
+        return pack_message(dto, self.content_type, compression_threshold)
+
+    def _send_message(self, msg, batch=False):
         """
-        Sends a message to server
+        Sends a message to server.
+        State changes are batched, other messages flush the batch 
+        and go out immediately so the ordering is kept
         """
-        self.channel.basic_publish(msg,
-                                   mandatory=True,
-                                   exchange=self.response_queue,
-                                   routing_key=self.response_queue)
+        self._publisher.publish(msg,
+                                exchange=self.response_queue,
+                                routing_key=self.response_queue,
+                                batch=batch)
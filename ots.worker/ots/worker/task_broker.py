@@ -42,20 +42,32 @@ the following assumptions holding true:
 #pylint: disable=F0401
 
 import os
+import signal
+import shutil
 from time import sleep
 import logging
 from socket import gethostname
 from itertools import cycle
 
 from ots.common.amqp.api import unpack_message, pack_message
+from ots.common.amqp.api import task_control_queue_name
+from ots.common.amqp.api import compression_threshold_for
+from ots.common.amqp.api import content_type_for, accepts_batches
 from ots.common.dto.api import StateChangeMessage, TaskCondition, Monitor
 from ots.common.dto.api import MonitorType
-from ots.common.routing.api import get_queues
+from ots.common.routing.api import get_priority_queues
 
 from ots.worker.version import __VERSION__
+from ots.worker.heartbeat import Heartbeat
+from ots.worker.priority_lanes import PriorityLanes
+from ots.worker.testplan_cache import TestPlanCache, TestPlanFetchError
+from ots.worker.responseclient import TASK_ID_VARIABLE
+from ots.worker.responseclient import CONTENT_ENCODINGS_VARIABLE
+from ots.worker.responseclient import CONTENT_TYPES_VARIABLE
 from ots.common.command import Command
 from ots.common.command import CommandFailed
 from ots.common.dto.ots_exception import OTSException
+from ots.common.testplan_store import TestPlanReference
 from ots.common.helpers import get_logger_adapter
 
 STOP_SIGNAL_FILE = "/tmp/stop_ots_worker"
@@ -63,24 +75,14 @@ STOP_SIGNAL_FILE = "/tmp/stop_ots_worker"
 TASK_CONDITION_RESPONSES = [TaskCondition.START,
                             TaskCondition.FINISH]
 
+#Seconds between the checks of the control queue 
+#if the server doesn't want heartbeats
+CONTROL_INTERVAL = 10
+
 class NotConnectedError(Exception):
     """Exception raised if not connected to amqp"""
     pass
 
-########################################
-# Command Class to Function
-########################################
-
-def _start_process(command):
-    """
-    Starts the specified process
-
-    @type command: C{str}
-    @param command: The CL params for the Process to be run as a Task 
-    """
-    task = Command(command)
-    task.execute_in_shell()
-
 
 ##############################
 # TASK_BROKER
@@ -91,8 +93,13 @@ class TaskBroker(object):
     Listens to a Queue of the given Routing Key.
     Pulls messages containing Tasks from AMQP 
     Dispatch the Tasks as a process
+
+    Each queue has a sub-queue for each priority. 
+    When the Worker is free it takes the next Task from the 
+    highest priority lane that has one. Only when all the lanes 
+    are empty does it consume from all the queues and wait.
     """   
-    def __init__(self, connection, device_properties):
+    def __init__(self, connection, device_properties, testplan_cache = None):
         """
         device_properties have magic keys that
         are dependent on the rules set out 
@@ -103,16 +110,33 @@ class TaskBroker(object):
 
         @type device_properties : C{dict}
         @param device_properties : The device_properties
+
+        @type testplan_cache : L{TestPlanCache} 
+        @param testplan_cache : The cache of the referenced test plans
         """
         self._log = get_logger_adapter(__name__)
         self._connection = connection
-        self._queues = get_queues(device_properties)
+        self._lanes = get_priority_queues(device_properties)
+        self._queues = [queue for priority, queues in self._lanes 
+                        for queue in queues]
+        self._lane_order = PriorityLanes([priority for priority, queues 
+                                          in self._lanes])
+        self._queue_lanes = dict([(queue, priority) 
+                                  for priority, queues in self._lanes
+                                  for queue in queues])
         self._keep_looping = True
+        self._consuming = False
         self._consumer_tags = dict()
 
         self._task_state = cycle(TASK_CONDITION_RESPONSES)
         self._amqp_log_handler = None
         self._xml_file = None
+        self._testplan_cache = testplan_cache or TestPlanCache()
+        #The running command and whether the server has cancelled it
+        self._command = None
+        self._is_cancelled = False
+        #The encoding of the responses to the server of the Task
+        self._content_type = None
 
     ############################################
     # LOG HANDLER
@@ -152,7 +176,8 @@ class TaskBroker(object):
         for queue in self._queues:
             self._log.info("start consume on queue: %s" % queue)
             self._consumer_tags[queue] = basic_consume(queue = queue,
-                                              callback = self._on_message)
+                                              callback = self._on_delivery)
+        self._consuming = True
             
     def _stop_consume(self):
         """
@@ -160,6 +185,9 @@ class TaskBroker(object):
         Otherwise the server will push next task to the consumer as soon as the
         ongoing is acked.
         """
+        if not self._consuming:
+            return
+        self._consuming = False
         for queue in self._queues:
             self.channel.basic_cancel(self._consumer_tags[queue])
             self._log.info("stop consume on queue: %s" % queue)
@@ -197,14 +225,62 @@ class TaskBroker(object):
         while self._keep_looping:
             try:
                 if not self._stop_file_exists():
-                    self.channel.wait()
+                    self._poll()
                 else:
                     self._keep_looping = False
             except Exception:
                 self._log.exception("_loop() failed")
                 self._try_reconnect()
         self._clean_up()
+
+    def _poll(self):
+        """
+        Run the next Task by priority.
+        If there is none wait for a message on any of the queues
+        """
+        message = self._next_message()
+        if message is not None:
+            self._on_message(message)
+        else:
+            if not self._consuming:
+                self._start_consume()
+            self.channel.wait()
+
+    def _next_message(self):
+        """
+        Take the first message from the lanes in the order of 
+        L{PriorityLanes}. In a lane the more specific queues go first
+
+        @rtype: C{amqplib.client_0_8.basic_message.Message} or None
+        @return: The message or None if all the queues are empty
+        """
+        queues = dict(self._lanes)
+        for priority in self._lane_order.order():
+            for queue in queues[priority]:
+                message = self.channel.basic_get(queue = queue)
+                if message is not None:
+                    self._log.debug("Took a task from queue: %s" % queue)
+                    self._lane_order.served(priority)
+                    return message
+            self._lane_order.empty(priority)
+        return None
     
+    def _on_delivery(self, message):
+        """
+        The callback of the consumers. 
+        A delivered Task counts for its lane like a polled one
+
+        @type message: amqplib.client_0_8.basic_message.Message 
+        @param message: A message containing a pickled dictionary
+        """
+        consumer_tag = message.delivery_info.get("consumer_tag")
+        for queue, tag in self._consumer_tags.items():
+            if tag == consumer_tag:
+                self._log.debug("Delivered a task from queue: %s" % queue)
+                self._lane_order.served(self._queue_lanes[queue])
+                break
+        self._on_message(message)
+
     def _handle_message(self, message):
         """
         The Message Handler. 
@@ -212,8 +288,8 @@ class TaskBroker(object):
         @type message: amqplib.client_0_8.basic_message.Message 
         @param message: A message containing a pickled dictionary
 
-        This turns off the connection on receipt of a message.
-        Once the Task has run the connection is reestablished.
+        This turns off the consumers on receipt of a message.
+        Once the Task has run the main loop polls the queues again.
 
         Response Queue is kept informed of the status
         """
@@ -224,13 +300,16 @@ class TaskBroker(object):
         cmd_msg = unpack_message(message)
         task_id = cmd_msg.task_id
         response_queue = cmd_msg.response_queue
-        self._set_log_handler(response_queue)
+        self._content_type = content_type_for(cmd_msg.content_types)
+        self._set_log_handler(response_queue, cmd_msg)
         self._publish_task_state_change(task_id, response_queue)
         #
         try:
             self._dispatch(cmd_msg)
         except CommandFailed, exc:
             error_msg = "Command %s failed" % cmd_msg.command
+            if self._is_cancelled:
+                error_msg = "Command %s cancelled" % cmd_msg.command
             self._log.error(error_msg)
 
             # We need to send pure OTSException because server does not know
@@ -240,11 +319,16 @@ class TaskBroker(object):
             self._publish_exception(task_id,
                                     response_queue,
                                     exception)
+        except TestPlanFetchError, exc:
+            self._log.error(exc.strerror)
+            exception = OTSException(exc.errno, exc.strerror)
+            exception.task_id = task_id
+            self._publish_exception(task_id,
+                                    response_queue,
+                                    exception)
         finally:
             self._set_log_handler(None)
             self._publish_task_state_change(task_id, response_queue)
-            if self._keep_looping:
-                self._start_consume()
 
     def _on_message(self, message):
         """
@@ -280,11 +364,114 @@ class TaskBroker(object):
             self._xml_file = None
             
             if cmd_msg.xml_file is not None:
-                self._save_xml_file(cmd_msg.xml_file)
+                self._save_xml_file(cmd_msg.xml_file, cmd_msg.testplan_url)
             
-            self._log.debug("Running command: '%s'"%(command))
-            _start_process(command = command)
+            self._log.debug("Running command: '%s', attempt %s" \
+                                % (command, cmd_msg.attempt))
+            self._command = Command(command)
+            self._is_cancelled = False
+            #The main thread keeps using self.channel for logging
+            control_connection = self._connection.clone()
+            try:
+                control_queue = self._declare_control_queue(
+                    control_connection.channel, cmd_msg.task_id)
+                heartbeat = self._start_heartbeat(control_connection.channel,
+                                                  cmd_msg, control_queue)
+                #The conductor stamps its results with the Task id
+                #and encodes them as the server accepts
+                environment = {TASK_ID_VARIABLE : str(cmd_msg.task_id),
+                               CONTENT_ENCODINGS_VARIABLE : 
+                                 ",".join(cmd_msg.content_encodings or []),
+                               CONTENT_TYPES_VARIABLE : 
+                                 ",".join(cmd_msg.content_types or [])}
+                os.environ.update(environment)
+                try:
+                    self._command.execute_in_shell()
+                finally:
+                    for name in environment:
+                        del os.environ[name]
+                    heartbeat.stop()
+                    self._command = None
+                    control_connection.channel.queue_delete(
+                        queue = control_queue)
+            finally:
+                control_connection.clean_up()
             self._remove_xml_file()
+
+    def _start_heartbeat(self, channel, cmd_msg, control_queue):
+        """
+        Start the background thread that sends the heartbeats of the 
+        Task, if the server asked for them, and checks the control queue. 
+        The thread gets a channel of its own, the main thread keeps 
+        publishing log records on self.channel while the command runs
+
+        @type channel: C{amqplib.client_0_8.channel.Channel}
+        @param channel: The channel of the heartbeat thread
+
+        @type cmd_msg: C{ots.common.amqp.messages.CommandMessage}
+        @param cmd_msg: The command of the Task
+
+        @type control_queue: C{str}
+        @param control_queue: The name of the control queue of the Task
+
+        @rtype: L{Heartbeat}
+        @return: The running Heartbeat
+        """
+        task_id = cmd_msg.task_id
+        response_queue = cmd_msg.response_queue
+        interval = cmd_msg.heartbeat_interval
+        def beat():
+            if interval:
+                self._publish_heartbeat(channel, task_id, response_queue)
+            self._check_control_queue(channel, control_queue)
+        heartbeat = Heartbeat(beat, interval or CONTROL_INTERVAL)
+        heartbeat.start()
+        return heartbeat
+
+    def _declare_control_queue(self, channel, task_id):
+        """
+        Declare the queue on which the server can cancel the Task.
+        It is exclusive so it goes if the Worker dies
+
+        @type channel: C{amqplib.client_0_8.channel.Channel}
+        @param channel: The channel of the heartbeat thread
+
+        @type task_id: C{str}
+        @param task_id: The Task ID
+
+        @rtype: C{str}
+        @return: The name of the control queue
+        """
+        queue = task_control_queue_name(task_id)
+        channel.queue_declare(queue = queue,
+                              durable = False,
+                              exclusive = True,
+                              auto_delete = False)
+        return queue
+
+    def _check_control_queue(self, channel, control_queue):
+        """
+        Kill the process group of the command once the 
+        server has cancelled the Task
+
+        @type channel: C{amqplib.client_0_8.channel.Channel}
+        @param channel: The channel of the heartbeat thread
+
+        @type control_queue: C{str}
+        @param control_queue: The name of the control queue of the Task
+        """
+        if not self._is_cancelled:
+            if channel.basic_get(queue = control_queue, 
+                                 no_ack = True) is None:
+                return
+            self._log.warning("The Task was cancelled")
+            self._is_cancelled = True
+        command = self._command
+        #The process may not have been started yet
+        if command is not None and command.pid > 0:
+            self._log.info("Killing the cancelled command")
+            command.send_signal(signal.SIGTERM)
+            self._command = None
     
     ########################################
     # MESSAGE PUBLISHING
@@ -309,20 +496,33 @@ class TaskBroker(object):
                                 gethostname(),
                                 task_id)
 
-        amqp_message = pack_message(monitor_event)
-        self.channel.basic_publish(amqp_message,
-                                   mandatory = True,
-                                   exchange = response_queue,
-                                   routing_key = response_queue)
+        amqp_message = pack_message(monitor_event, self._content_type)
+        self._basic_publish(amqp_message, response_queue)
 
         state_msg = StateChangeMessage(task_id, state)
-        amqp_message = pack_message(state_msg) 
-        self.channel.basic_publish(amqp_message,
-                                   mandatory = True,
-                                   exchange = response_queue,
-                                   routing_key = response_queue)
+        amqp_message = pack_message(state_msg, self._content_type) 
+        self._basic_publish(amqp_message, response_queue)
         
         
+    def _publish_heartbeat(self, channel, task_id, response_queue):
+        """
+        Tell the response queue that the Task is still running
+
+        @type channel: C{amqplib.client_0_8.channel.Channel}
+        @param channel: The channel of the heartbeat thread
+
+        @type task_id: C{str}
+        @param task_id: The Task ID
+
+        @type response_queue: C{str}
+        @param response_queue: The name of the response queue 
+        """
+        state_msg = StateChangeMessage(task_id, TaskCondition.HEARTBEAT)
+        channel.basic_publish(pack_message(state_msg, self._content_type),
+                              mandatory = True,
+                              exchange = response_queue,
+                              routing_key = response_queue)
+
     def _publish_exception(self, task_id, response_queue, exception):
         """
         Put an Exception on the response queue 
@@ -336,14 +536,33 @@ class TaskBroker(object):
 
         """
         self._log.debug("publishing exception")
-        message = pack_message(exception)
+        message = pack_message(exception, self._content_type)
         try:
+            self._basic_publish(message, response_queue)
+        except AMQPChannelException:
+            self._log.error("Can't publish exception")
+
+    def _basic_publish(self, message, response_queue):
+        """
+        Publish on self.channel. The AMQP log handler flushes its 
+        records from a timer thread, so it sends the message 
+        after the records it holds
+
+        @type message: C{amqplib.client_0_8.basic_message.Message}
+        @param message: A packed message
+
+        @type response_queue: C{str}
+        @param response_queue: The name of the response queue 
+        """
+        if self._amqp_log_handler is not None:
+            self._amqp_log_handler.publish(message, 
+                                           exchange = response_queue,
+                                           routing_key = response_queue)
+        else:
             self.channel.basic_publish(message,
                                        mandatory = True,
                                        exchange = response_queue,
                                        routing_key = response_queue)
-        except AMQPChannelException:
-            self._log.error("Can't publish exception")
 
     #######################################
     # HELPERS
@@ -371,17 +590,34 @@ class TaskBroker(object):
             ret_val = float(major_version) >= float(min_worker_version)
         return ret_val
 
-    def _set_log_handler(self, queue):
+    def _set_log_handler(self, queue, cmd_msg = None):
         """
         Set the AMQP Log Handler to use the queue
         or None to stop it logging
 
         @type queue : C{str} or None
         @param queue : The name of the queue 
+
+        @type cmd_msg : C{ots.common.amqp.messages.CommandMessage} or None
+        @param cmd_msg : The command telling the encodings the server accepts
         """
         if self._amqp_log_handler is not None:
+            self._amqp_log_handler.flush()
+            if queue is not None:
+                #The connection may have been opened again
+                self._amqp_log_handler.channel = self.channel
             self._amqp_log_handler.queue = queue
             self._amqp_log_handler.exchange = queue
+            content_encodings = None
+            content_types = None
+            if cmd_msg is not None:
+                content_encodings = cmd_msg.content_encodings
+                content_types = cmd_msg.content_types
+            self._amqp_log_handler.compression_threshold = \
+                compression_threshold_for(content_encodings)
+            self._amqp_log_handler.content_type = \
+                content_type_for(content_types)
+            self._amqp_log_handler.batching = accepts_batches(content_types)
         
     def _try_reconnect(self):
         """
@@ -394,7 +630,8 @@ class TaskBroker(object):
             self._log.info("Trying to reconnect...")
             self._connection.connect()
             self._init_connection()
-            self._start_consume()
+            #The consumers went with the old connection
+            self._consuming = False
         except Exception:
             #If rabbit is still down, we expect this to fail
             self._log.exception("Reconnecting failed...")
@@ -431,18 +668,29 @@ class TaskBroker(object):
             stop = True
         return stop
     
-    def _save_xml_file(self, xml_io):
+    def _save_xml_file(self, xml_io, testplan_url = None):
         """
-        Store the xml file to the system
-        @type xml_io: C{StringIO} 
+        Store the xml file to the system. 
+        A referenced test plan is copied from the cache
+
+        @type xml_io: C{StringIO} or L{TestPlanReference}
         @param xml_io: XML file
+
+        @type testplan_url: C{str}
+        @param testplan_url: The URL to fetch a referenced test plan from
         """
         
         if xml_io is not None:
-            self._xml_file = os.path.join("/tmp/", xml_io.name)
-            xml_fb = open(self._xml_file, 'w')
-            xml_fb.write(xml_io.getvalue())
-            xml_fb.close()
+            xml_file = os.path.join("/tmp/", xml_io.name)
+            if isinstance(xml_io, TestPlanReference):
+                shutil.copyfile(
+                    self._testplan_cache.path(xml_io.digest, testplan_url),
+                    xml_file)
+            else:
+                xml_fb = open(xml_file, 'w')
+                xml_fb.write(xml_io.getvalue())
+                xml_fb.close()
+            self._xml_file = xml_file
             
             return self._xml_file
             
@@ -469,5 +717,4 @@ class TaskBroker(object):
         Initialises the AMQP connections and run the forever loop.
         """
         self._init_connection()
-        self._start_consume()
         self._loop()
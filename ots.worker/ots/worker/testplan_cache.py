@@ -0,0 +1,108 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""
+A local cache of the test plans referenced by the commands.
+
+A plan is fetched from the OTS server once and then 
+served from the cache for every Task that refers to it
+"""
+
+import os
+import logging
+import tempfile
+import xmlrpclib
+
+from ots.common.dto.api import OTSException
+from ots.common.testplan_store import TestPlanStore, plan_digest
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "ots_testplans")
+
+class TestPlanFetchError(OTSException):
+    """The test plan of a Task could not be fetched"""
+    errno = 6003
+
+def fetch_testplan(url, digest):
+    """
+    Fetch a test plan over the XML-RPC interface of the OTS server
+
+    @type url: C{str}
+    @param url: The XML-RPC URL of the OTS server
+
+    @type digest: C{str}
+    @param digest: The digest of the test plan
+
+    @rtype: C{str}
+    @return: The content of the test plan
+    """
+    return xmlrpclib.ServerProxy(url).get_testplan(digest).data
+
+
+class TestPlanCache(object):
+    """
+    Content addressed test plans fetched on demand
+    """
+
+    def __init__(self, directory = None, fetch = fetch_testplan):
+        """
+        @type directory: C{str}
+        @param directory: The cache directory
+
+        @type fetch: C{callable}
+        @param fetch: Returns the content of a test plan for (url, digest)
+        """
+        self._store = TestPlanStore(directory or DEFAULT_DIRECTORY)
+        self._fetch = fetch
+
+    def path(self, digest, url):
+        """
+        The path of the cached test plan, fetching it if needed
+
+        @type digest: C{str}
+        @param digest: The digest of the test plan
+
+        @type url: C{str}
+        @param url: The XML-RPC URL of the OTS server
+
+        @rtype: C{str}
+        @return: The path of the test plan file
+        """
+        if digest in self._store:
+            LOGGER.debug("Test plan %s found in the cache" % (digest))
+            return self._store.path(digest)
+        if not url:
+            raise TestPlanFetchError(TestPlanFetchError.errno,
+                                     "No URL for test plan %s" % (digest))
+        LOGGER.info("Fetching test plan %s from %s" % (digest, url))
+        try:
+            data = self._fetch(url, digest)
+        except Exception, error:
+            raise TestPlanFetchError(TestPlanFetchError.errno,
+                                     "Fetching test plan %s failed: %s" \
+                                         % (digest, error))
+        if plan_digest(data) != digest:
+            raise TestPlanFetchError(TestPlanFetchError.errno,
+                                     "Test plan %s is corrupted" % (digest))
+        self._store.put(data)
+        return self._store.path(digest)
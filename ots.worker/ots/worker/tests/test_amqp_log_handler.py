@@ -20,6 +20,7 @@
 # 02110-1301 USA
 # ***** END LICENCE BLOCK *****
 
+import time
 import unittest 
 
 import logging
@@ -27,7 +28,8 @@ import logging.handlers
 
 from amqplib import client_0_8 as amqp
 
-from ots.common.amqp.api import unpack_message
+from ots.common.amqp.api import unpack_messages, pack_message
+from ots.common.dto.api import Monitor, MonitorType
 from ots.worker.amqp_log_handler import AMQPLogHandler
 
 def _init_queue(channel, queue, exchange, routing_key):
@@ -67,6 +69,15 @@ def _queue_delete(queue):
 QUEUE_NAME = "test_log"
 
 
+class ChannelStub(object):
+
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, msg, mandatory, exchange, routing_key):
+        self.published.extend(unpack_messages(msg))
+
+
 class TestAMQPLogHandler(unittest.TestCase):
 
     def tearDown(self):
@@ -115,14 +126,15 @@ class TestAMQPLogHandler(unittest.TestCase):
             raise ValueError
         except ValueError:
             logger.exception("exception")
+        handler.flush()
 
         #Consume
         records = []
         def cb(message):
             channel.basic_ack(delivery_tag = message.delivery_tag)
-            records.append(unpack_message(message))
+            records.extend(unpack_messages(message))
         channel.basic_consume(QUEUE_NAME, callback = cb)
-        for i in range(5):
+        while len(records) < 5:
             channel.wait()
         
         #Validate
@@ -132,5 +144,43 @@ class TestAMQPLogHandler(unittest.TestCase):
         logger.removeHandler(handler)
 
 
+class TestAMQPLogHandlerBatching(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = ChannelStub()
+        self.handler = AMQPLogHandler()
+        self.handler.channel = self.channel
+        self.handler.exchange = QUEUE_NAME
+        self.handler.queue = QUEUE_NAME
+        self.handler.batching = True
+        self.logger = logging.getLogger("test_amqp_log_handler")
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.handler._publisher.close()
+
+    def test_timer_flushes_batch(self):
+        self.handler._publisher.max_latency = 0.01
+        self.logger.warning("quiet")
+        time.sleep(0.2)
+        self.assertEquals(["quiet"], 
+                          [record.msg for record in self.channel.published])
+
+    def test_publish_after_records(self):
+        self.logger.warning("record")
+        monitor = Monitor(MonitorType.TASK_ENDED, description = "1")
+        self.handler.publish(pack_message(monitor), QUEUE_NAME, QUEUE_NAME)
+        self.assertEquals(["record", "1"], 
+                          [getattr(dto, "msg", None) or dto.description
+                           for dto in self.channel.published])
+
+    def test_batching_off(self):
+        self.handler.batching = False
+        self.logger.warning("record")
+        self.assertEquals(1, len(self.channel.published))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,145 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""Unit tests for ots.worker.batch_publisher"""
+
+import time
+import unittest
+
+from ots.common.dto.api import Monitor, MonitorType
+from ots.common.amqp.api import pack_message, unpack_messages
+
+from ots.worker.batch_publisher import BatchPublisher
+
+class ChannelStub(object):
+
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, msg, mandatory, exchange, routing_key):
+        self.published.append((msg, exchange, routing_key))
+
+
+def _message(description):
+    return pack_message(Monitor(MonitorType.TASK_ONGOING, 
+                                description = description))
+
+def _descriptions(published):
+    descriptions = []
+    for msg, exchange, routing_key in published:
+        descriptions.extend([monitor.description 
+                             for monitor in unpack_messages(msg)])
+    return descriptions
+
+
+class TestBatchPublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = ChannelStub()
+        self.publisher = BatchPublisher(self.channel, max_count = 3)
+
+    def test_publish_batches(self):
+        for i in range(2):
+            self.publisher.publish(_message(str(i)), "foo", "foo")
+        self.assertEquals(0, len(self.channel.published))
+        self.assertEquals(2, self.publisher.pending)
+        self.publisher.flush()
+        self.assertEquals(1, len(self.channel.published))
+        self.assertEquals(["0", "1"], _descriptions(self.channel.published))
+        self.assertEquals(0, self.publisher.pending)
+
+    def test_flush_single_message_is_not_wrapped(self):
+        msg = _message("0")
+        self.publisher.publish(msg, "foo", "foo")
+        self.publisher.flush()
+        self.assertEquals([(msg, "foo", "foo")], self.channel.published)
+
+    def test_max_count(self):
+        for i in range(7):
+            self.publisher.publish(_message(str(i)), "foo", "foo")
+        self.assertEquals(2, len(self.channel.published))
+        self.assertEquals(1, self.publisher.pending)
+        self.publisher.flush()
+        self.assertEquals([str(i) for i in range(7)], 
+                          _descriptions(self.channel.published))
+
+    def test_max_size(self):
+        msg = _message("0")
+        self.publisher.max_size = len(msg.body) * 2 
+        self.publisher.publish(msg, "foo", "foo")
+        self.publisher.publish(_message("1"), "foo", "foo")
+        self.assertEquals(1, len(self.channel.published))
+        self.assertEquals(0, self.publisher.pending)
+
+    def test_destination_change_flushes(self):
+        self.publisher.publish(_message("0"), "foo", "foo")
+        self.publisher.publish(_message("1"), "bar", "bar")
+        self.publisher.flush()
+        self.assertEquals(["foo", "bar"], 
+                          [exchange for msg, exchange, routing_key 
+                           in self.channel.published])
+
+    def test_no_batch_keeps_order(self):
+        self.publisher.publish(_message("0"), "foo", "foo")
+        self.publisher.publish(_message("1"), "foo", "foo", batch = False)
+        self.assertEquals(2, len(self.channel.published))
+        self.assertEquals(["0", "1"], _descriptions(self.channel.published))
+
+    def test_batching_off(self):
+        self.publisher.batching = False
+        for i in range(2):
+            self.publisher.publish(_message(str(i)), "foo", "foo")
+        self.assertEquals(0, self.publisher.pending)
+        self.assertEquals(2, len(self.channel.published))
+        self.assertEquals(["0", "1"], _descriptions(self.channel.published))
+
+    def test_latency(self):
+        self.publisher.max_latency = 0
+        self.publisher.publish(_message("0"), "foo", "foo")
+        self.publisher.publish(_message("1"), "foo", "foo")
+        self.assertEquals(1, len(self.channel.published))
+        self.assertEquals(1, self.publisher.pending)
+
+    def test_timer(self):
+        publisher = BatchPublisher(self.channel, max_latency = 0.01, 
+                                   use_timer = True)
+        publisher.publish(_message("0"), "foo", "foo")
+        publisher.publish(_message("1"), "foo", "foo")
+        time.sleep(0.2)
+        self.assertEquals(["0", "1"], _descriptions(self.channel.published))
+        publisher.close()
+
+    def test_compression(self):
+        for i in range(3):
+            self.publisher.publish(_message("0" * 100), "foo", "foo")
+        self.publisher.compression_threshold = 100
+        for i in range(3):
+            self.publisher.publish(_message("1" * 100), "foo", "foo")
+        encodings = [msg.properties.get("content_encoding") 
+                     for msg, exchange, routing_key in self.channel.published]
+        self.assertEquals([None, "deflate"], encodings)
+        self.assertEquals(["0" * 100] * 3 + ["1" * 100] * 3,
+                          _descriptions(self.channel.published))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""Unit tests for ots.worker.heartbeat"""
+
+import time
+import threading
+import unittest
+
+from ots.common.amqp.api import unpack_message
+from ots.common.dto.api import CommandMessage, CancelMessage
+from ots.common.command import CommandFailed
+from ots.common.routing.routing import DEVICE_GROUP
+
+from ots.worker.heartbeat import Heartbeat
+from ots.worker.task_broker import TaskBroker
+
+class ChannelStub(object):
+
+    def __init__(self):
+        self.msgs = []
+        self.control_msgs = []
+        self.queues = []
+
+    def basic_publish(self, msg, mandatory, exchange, routing_key):
+        self.msgs.append(msg)
+
+    def queue_declare(self, queue, durable, exclusive, auto_delete):
+        self.queues.append(queue)
+
+    def queue_delete(self, queue):
+        self.queues.remove(queue)
+
+    def basic_get(self, queue, no_ack):
+        if self.control_msgs:
+            return self.control_msgs.pop(0)
+        return None
+
+class ConnectionStub(object):
+
+    def __init__(self):
+        self.channel = ChannelStub()
+        self.clones = []
+        self.cleaned_up = False
+
+    def clone(self):
+        connection = ConnectionStub()
+        self.clones.append(connection)
+        return connection
+
+    def clean_up(self):
+        self.cleaned_up = True
+
+class TestHeartbeat(unittest.TestCase):
+
+    def test_beats_until_stopped(self):
+        beats = []
+        heartbeat = Heartbeat(lambda : beats.append(time.time()), 0.05)
+        heartbeat.start()
+        time.sleep(0.2)
+        heartbeat.stop()
+        count = len(beats)
+        self.assertTrue(count >= 2)
+        self.assertFalse(heartbeat.isAlive())
+        time.sleep(0.1)
+        self.assertEquals(count, len(beats))
+
+    def test_first_beat_is_immediate(self):
+        event = threading.Event()
+        heartbeat = Heartbeat(event.set, 60)
+        heartbeat.start()
+        event.wait(5)
+        heartbeat.stop()
+        self.assertTrue(event.isSet())
+        
+    def test_failing_beat(self):
+        beats = []
+        def beat():
+            beats.append(1)
+            raise ValueError("no channel")
+        heartbeat = Heartbeat(beat, 0.02)
+        heartbeat.start()
+        time.sleep(0.1)
+        heartbeat.stop()
+        self.assertTrue(len(beats) >= 2)
+
+    def test_stop_before_start(self):
+        heartbeat = Heartbeat(lambda : None, 1)
+        heartbeat.stop()
+        self.assertFalse(heartbeat.isAlive())
+
+class TestTaskBrokerHeartbeat(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = ConnectionStub()
+        self.task_broker = TaskBroker(self.connection, {DEVICE_GROUP : "test"})
+
+    def test_heartbeats_while_running(self):
+        cmd_msg = CommandMessage(["sleep 0.3"], "r1", "t1", 
+                                 heartbeat_interval = 0.1)
+        self.task_broker._dispatch(cmd_msg)
+        control_connection = self.connection.clones[0]
+        channel = control_connection.channel
+        beats = [unpack_message(msg) for msg in channel.msgs]
+        self.assertTrue(len(beats) >= 2)
+        for beat in beats:
+            self.assertEquals("t1", beat.task_id)
+            self.assertTrue(beat.is_heartbeat)
+        #Stopped with the command
+        time.sleep(0.2)
+        self.assertEquals(len(beats), len(channel.msgs))
+        #The channel of the main thread is left alone
+        self.assertEquals([], self.connection.channel.msgs)
+        self.assertEquals([], self.connection.channel.queues)
+        self.assertTrue(control_connection.cleaned_up)
+        self.assertFalse(self.connection.cleaned_up)
+
+    def test_no_heartbeats_by_default(self):
+        self.task_broker._dispatch(CommandMessage(["true"], "r1", "t1"))
+        channel = self.connection.clones[0].channel
+        self.assertEquals([], channel.msgs)
+        self.assertEquals([], channel.queues)
+
+    def test_cancel_kills_the_command(self):
+        #The clone for the Task gets the cancel message
+        clone = self.connection.clone
+        def clone_with_cancel():
+            connection = clone()
+            connection.channel.control_msgs.append(CancelMessage("r1"))
+            return connection
+        self.connection.clone = clone_with_cancel
+        cmd_msg = CommandMessage(["sleep 5"], "r1", "t1", 
+                                 heartbeat_interval = 0.1)
+        start = time.time()
+        self.assertRaises(CommandFailed, 
+                          self.task_broker._dispatch, cmd_msg)
+        self.assertTrue(time.time() - start < 4)
+        self.assertTrue(self.task_broker._is_cancelled)
+        self.assertEquals([], self.connection.clones[0].channel.queues)
+
+
+if __name__ == "__main__":
+    unittest.main()
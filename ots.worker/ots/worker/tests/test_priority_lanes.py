@@ -0,0 +1,120 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""Unit tests for ots.worker.priority_lanes"""
+
+import unittest
+
+from ots.common.routing.routing import DEVICE_GROUP, DEVICE_NAME
+
+from ots.worker.priority_lanes import PriorityLanes
+from ots.worker.task_broker import TaskBroker
+
+class ChannelStub(object):
+
+    def __init__(self, queues):
+        self.queues = queues
+
+    def basic_get(self, queue):
+        messages = self.queues.get(queue)
+        if messages:
+            return messages.pop(0)
+        return None
+
+class MessageStub(object):
+
+    def __init__(self, consumer_tag):
+        self.delivery_info = {"consumer_tag" : consumer_tag}
+
+class ConnectionStub(object):
+
+    def __init__(self, queues):
+        self.channel = ChannelStub(queues)
+
+    def clean_up(self):
+        pass
+
+class TestPriorityLanes(unittest.TestCase):
+
+    def test_priority_order(self):
+        lanes = PriorityLanes(["high", "normal", "low"])
+        self.assertEquals(["high", "normal", "low"], lanes.order())
+        lanes.served("high")
+        self.assertEquals(["high", "normal", "low"], lanes.order())
+
+    def test_starvation(self):
+        lanes = PriorityLanes(["high", "normal", "low"], max_skips = 2)
+        lanes.served("high")
+        self.assertEquals(["high", "normal", "low"], lanes.order())
+        lanes.served("normal")
+        self.assertEquals(["low", "high", "normal"], lanes.order())
+        lanes.served("low")
+        self.assertEquals(["high", "normal", "low"], lanes.order())
+
+    def test_empty_lane_is_not_starving(self):
+        lanes = PriorityLanes(["high", "low"], max_skips = 1)
+        lanes.served("high")
+        self.assertEquals(["low", "high"], lanes.order())
+        lanes.empty("low")
+        self.assertEquals(["high", "low"], lanes.order())
+
+class TestTaskBrokerLanes(unittest.TestCase):
+
+    def test_next_message(self):
+        queues = {"test.testname:high" : ["h1"],
+                  "test:high" : ["h2"],
+                  "test.testname" : ["n1"],
+                  "test:low" : ["l1"]}
+        task_broker = TaskBroker(ConnectionStub(queues), 
+                                 {DEVICE_GROUP : "test",
+                                  DEVICE_NAME : "testname"})
+        messages = [task_broker._next_message() for i in range(5)]
+        self.assertEquals(["h1", "h2", "n1", "l1", None], messages)
+
+    def test_starving_lane_goes_first(self):
+        queues = {"test:high" : ["h1", "h2", "h3"],
+                  "test:low" : ["l1"]}
+        task_broker = TaskBroker(ConnectionStub(queues), 
+                                 {DEVICE_GROUP : "test"})
+        task_broker._lane_order.max_skips = 2
+        messages = [task_broker._next_message() for i in range(4)]
+        self.assertEquals(["h1", "h2", "l1", "h3"], messages)
+
+    def test_delivered_message_is_served(self):
+        queues = {"test:high" : [],
+                  "test:low" : ["l1"]}
+        task_broker = TaskBroker(ConnectionStub(queues), 
+                                 {DEVICE_GROUP : "test"})
+        task_broker._lane_order.max_skips = 2
+        delivered = []
+        task_broker._on_message = delivered.append
+        task_broker._consumer_tags = {"test:high" : "tag_high",
+                                      "test:low" : "tag_low"}
+        for i in range(2):
+            task_broker._on_delivery(MessageStub("tag_high"))
+        self.assertEquals(2, len(delivered))
+        queues["test:high"].append("h1")
+        self.assertEquals("l1", task_broker._next_message())
+
+
+if __name__ == "__main__":
+    unittest.main()
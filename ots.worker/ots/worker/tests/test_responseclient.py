@@ -21,12 +21,19 @@
 # ***** END LICENCE BLOCK *****
 
 """Unit tests for ots.worker.responseclient"""
+import os
+import hashlib
 import unittest
+import tempfile
 
 from pickle import dumps, loads
 
 from ots.common.dto.api import Environment, OTSException 
+from ots.common.amqp.api import unpack_message, COMPRESSION_THRESHOLD
+from ots.common.amqp.api import DTO_CONTENT_TYPE, BATCH_CONTENT_TYPE
+from ots.common.amqp.api import unpack_messages
 
+from ots.worker import responseclient
 from ots.worker.responseclient import ResponseClient
 
 class ChannelStub(object):
@@ -34,6 +41,7 @@ class ChannelStub(object):
     def __init__(self):
         self.close_called = False
         self.msg = None
+        self.msgs = []
         self.exchange = None
         self.routing_key = None
 
@@ -45,6 +53,7 @@ class ChannelStub(object):
                       exchange,
                       routing_key):
         self.msg = msg
+        self.msgs.append(msg)
         self.exchange = exchange
         self.routing_key = routing_key
 
@@ -68,9 +77,11 @@ class TestResponseClient(unittest.TestCase):
         self.channel = ChannelStub()
         self.client.conn = self.conn
         self.client.channel = self.channel
+        self.paths = []
     
     def tearDown(self):
-        pass
+        for path in self.paths:
+            os.remove(path)
 
     def test_init(self):
         self.assertEquals(self.client.testrun_id, self.testrun_id)
@@ -96,6 +107,31 @@ class TestResponseClient(unittest.TestCase):
         self.assertEquals(content.errno, error_code)
         self.assertEquals(content.strerror, error_info)
 
+    def test_set_state_is_batched(self):
+        os.environ[responseclient.CONTENT_TYPES_VARIABLE] = BATCH_CONTENT_TYPE
+        try:
+            client = ResponseClient("localhost", 666)
+        finally:
+            del os.environ[responseclient.CONTENT_TYPES_VARIABLE]
+        client.channel = self.channel
+        client.set_state("foo", "started")
+        client.set_state("foo", "ongoing")
+        self.assertEquals(0, len(self.channel.msgs))
+        client.set_error("Flashing failed", "666")
+        self.assertEquals(2, len(self.channel.msgs))
+        dtos = unpack_messages(self.channel.msgs[0])
+        self.assertEquals(["started", "ongoing"], 
+                          [dto.description for dto in dtos])
+        self.assertTrue(isinstance(loads(self.channel.msg.body), 
+                                   OTSException))
+
+    def test_set_state_not_batched(self):
+        #The server has not told it unpacks batches
+        self.client.set_state("foo", "started")
+        self.client.set_state("foo", "ongoing")
+        self.assertEquals(["started", "ongoing"],
+                          [loads(msg.body).description 
+                           for msg in self.channel.msgs])
 
 
     def test_add_executed_packages(self):
@@ -129,6 +165,51 @@ class TestResponseClient(unittest.TestCase):
         self.assertEquals(result.hostname, origin)
         self.assertEquals(result.package, test_package)
         self.assertEquals(result.environment, Environment(environment))
+
+    def test_task_id_from_environment(self):
+        os.environ[responseclient.TASK_ID_VARIABLE] = "1"
+        try:
+            client = ResponseClient("localhost", 666)
+        finally:
+            del os.environ[responseclient.TASK_ID_VARIABLE]
+        client.channel = self.channel
+        client.add_result("result.xml", "<xml/>")
+        self.assertEquals("1", loads(self.channel.msg.body).task_id)
+        client.add_executed_packages("hardware", ["pkg1-tests"])
+        self.assertEquals("1", loads(self.channel.msg.body).task_id)
+        self.assertEquals(None, self.client.task_id)
+
+    def test_add_result_not_compressed(self):
+        #The server has not told it takes compressed messages
+        file_content = "<xml>foo</xml>\n" * COMPRESSION_THRESHOLD
+        self.client.add_result("result.xml", file_content)
+        msg = self.channel.msg
+        self.assertFalse("content_encoding" in msg.properties)
+        self.assertEquals(file_content, loads(msg.body).content)
+
+    def test_dto_content_type(self):
+        client = ResponseClient("localhost", 666, 
+                                content_types = [DTO_CONTENT_TYPE])
+        client.channel = self.channel
+        client.add_result("result.xml", "<xml/>")
+        msg = self.channel.msg
+        self.assertEquals(DTO_CONTENT_TYPE, msg.properties["content_type"])
+        self.assertEquals("<xml/>", unpack_message(msg).content)
+
+    def test_add_result_compressed(self):
+        file_content = "<xml>foo</xml>\n" * COMPRESSION_THRESHOLD
+        os.environ[responseclient.CONTENT_ENCODINGS_VARIABLE] = "deflate"
+        try:
+            client = ResponseClient("localhost", 666)
+        finally:
+            del os.environ[responseclient.CONTENT_ENCODINGS_VARIABLE]
+        client.channel = self.channel
+        client.add_result("result.xml", file_content)
+        msg = self.channel.msg
+        self.assertEquals("deflate", msg.properties["content_encoding"])
+        self.assertTrue(len(msg.body) < len(file_content))
+        result = unpack_message(msg)
+        self.assertEquals(result.content, file_content)
         
 
 
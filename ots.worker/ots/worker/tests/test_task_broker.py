@@ -160,11 +160,10 @@ class TestTaskBroker(unittest.TestCase):
                               routing_key = "test")
        
         self.assertEquals(2, _queue_size("test"))
-        task_broker._start_consume()
         self.expected_size = 1
-        channel.wait()
+        task_broker._poll()
         self.expected_size = 0
-        channel.wait()
+        task_broker._poll()
         time.sleep(5)
 
     def test_consume_from_2_queues(self):
@@ -221,11 +220,8 @@ class TestTaskBroker(unittest.TestCase):
                                   exchange = queue,
                                   routing_key = queue)
             
-        #Set to Consume
-        task_broker._start_consume()
-
         while self.counter < 6: # Process all messages
-            channel.wait()
+            task_broker._poll()
         
         for queue in queues: # Make sure all queues are empty
             self.assertEquals(_queue_size(queue), 0)
@@ -293,11 +289,9 @@ class TestTaskBroker(unittest.TestCase):
                                   exchange = "test",
                                   routing_key = "test")
 
-        #Set to Consume
-        task_broker._start_consume()
-        channel.wait()
+        task_broker._poll()
         time.sleep(1)
-        channel.wait()
+        task_broker._poll()
         time.sleep(1)
 	    # We should have 0 tasks in the queue and STARTED and FINISHED for both
         # tasks in response queue
@@ -325,11 +319,9 @@ class TestTaskBroker(unittest.TestCase):
                                   exchange = "test",
                                   routing_key = "test")
 
-        #Set to Consume
-        task_broker._start_consume()
-        channel.wait()
+        task_broker._poll()
         time.sleep(1)
-        channel.wait()
+        task_broker._poll()
         time.sleep(1)
 
 
@@ -0,0 +1,88 @@
+# ***** BEGIN LICENCE BLOCK *****
+# This file is part of OTS
+#
+# Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+#
+# Contact: meego-qa@lists.meego.com
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# version 2.1 as published by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA
+# 02110-1301 USA
+# ***** END LICENCE BLOCK *****
+
+"""Unit tests for ots.worker.testplan_cache"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ots.common import testplan_store
+from ots.common.testplan_store import TestPlanReference
+from ots.common.routing.routing import DEVICE_GROUP
+
+from ots.worker.testplan_cache import TestPlanCache, TestPlanFetchError
+from ots.worker.task_broker import TaskBroker
+
+PLAN = "<testdefinition/>"
+URL = "http://ots/xmlrpc/"
+DIGEST = testplan_store.plan_digest(PLAN)
+
+class TestTestPlanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fetched = []
+        self.cache = TestPlanCache(self.directory, self._fetch)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _fetch(self, url, digest):
+        self.fetched.append((url, digest))
+        return PLAN
+
+    def test_fetched_once(self):
+        path = self.cache.path(DIGEST, URL)
+        self.assertEquals(PLAN, open(path).read())
+        self.assertEquals(path, self.cache.path(DIGEST, URL))
+        self.assertEquals([(URL, DIGEST)], self.fetched)
+
+    def test_corrupted(self):
+        self.assertRaises(TestPlanFetchError, self.cache.path, "a" * 40, URL)
+        self.assertFalse(os.listdir(self.directory))
+
+    def test_fetch_fails(self):
+        def fetch(url, digest):
+            raise IOError("Connection refused")
+        cache = TestPlanCache(self.directory, fetch)
+        self.assertRaises(TestPlanFetchError, cache.path, DIGEST, URL)
+
+    def test_no_url(self):
+        self.assertRaises(TestPlanFetchError, 
+                          self.cache.path, DIGEST, None)
+
+    def test_task_broker_saves_referenced_plan(self):
+        task_broker = TaskBroker(None, {DEVICE_GROUP : "test"}, 
+                                 testplan_cache = self.cache)
+        reference = TestPlanReference("test_plan_cache.xml", DIGEST)
+        xml_file = task_broker._save_xml_file(reference, URL)
+        try:
+            self.assertEquals("/tmp/test_plan_cache.xml", xml_file)
+            self.assertEquals(PLAN, open(xml_file).read())
+        finally:
+            task_broker._remove_xml_file()
+        self.assertFalse(os.path.exists(xml_file))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -39,6 +39,7 @@ from optparse import OptionParser
 
 from ots.worker.connection import Connection
 from ots.worker.task_broker import TaskBroker
+from ots.worker.testplan_cache import TestPlanCache
 from ots.common.helpers import get_logger_adapter
 
 
@@ -57,9 +58,13 @@ class Worker(object):
                        username,
                        password,
                        properties,
-                       device_n=0):
+                       device_n=0,
+                       testplan_cache=None):
         """
         Initialise the class, read config, set up logging
+
+        The test plans referenced by the commands are cached 
+        in the `testplan_cache` directory
         """
         self._vhost = vhost
         self._host = host
@@ -69,6 +74,7 @@ class Worker(object):
         self._properties = properties
         self._timeout = None
         self._device_n = device_n
+        self._testplan_cache = testplan_cache
         self.log = get_logger_adapter(__name__)
 
     ###########################
@@ -89,7 +95,8 @@ class Worker(object):
                                       self._username,
                                       self._password)
         self._task_broker = TaskBroker(self._connection, 
-                                       self._properties)
+                                       self._properties,
+                                       TestPlanCache(self._testplan_cache))
         self.log.info("Starting the worker " + \
                         "%d. server: %s:%s, device_properties: %s" % 
                     (self._device_n,
@@ -152,6 +159,9 @@ def worker_factory(config_filename, device_n = 0):
     port = config.getint('Worker','port')
     username = config.get('Worker','username')
     password = config.get('Worker','password')
+    testplan_cache = None
+    if config.has_option('Worker', 'testplan_cache'):
+        testplan_cache = config.get('Worker', 'testplan_cache')
 
     properties = dict(config.items("Device"))
 
@@ -161,7 +171,8 @@ def worker_factory(config_filename, device_n = 0):
                   username = username,
                   password = password,
                   properties = properties,
-                  device_n = device_n)
+                  device_n = device_n,
+                  testplan_cache = testplan_cache)
 
 
 def main():